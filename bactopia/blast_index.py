@@ -0,0 +1,190 @@
+"""
+A cross-sample index of BLAST hits, for finding which samples hit a subject or query.
+
+Example: update_blast_index("blast-index.db", [[path, name]]); find_hits("blast-index.db", subject="NZ_CP012345.1")
+"""
+import logging
+import os
+import sqlite3
+from bactopia.cache import get_journal_mode
+
+INDEX_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS files ("
+    "file_id INTEGER PRIMARY KEY, filename TEXT UNIQUE, sample TEXT, result_name TEXT, fingerprint TEXT)",
+    "CREATE TABLE IF NOT EXISTS hits ("
+    "file_id INTEGER, sample TEXT, result_name TEXT, query_id TEXT, query_len INTEGER, subject_title TEXT, "
+    "subject_len INTEGER, bit_score REAL, evalue REAL, identity REAL, query_coverage REAL, total_hsps INTEGER)",
+    "CREATE INDEX IF NOT EXISTS hits_subject ON hits (subject_title, identity)",
+    "CREATE INDEX IF NOT EXISTS hits_query ON hits (query_id, identity)",
+    "CREATE INDEX IF NOT EXISTS hits_file ON hits (file_id)",
+    "CREATE INDEX IF NOT EXISTS files_sample ON files (sample)"
+]
+HIT_FIELDS = [
+    'sample', 'result_name', 'query_id', 'query_len', 'subject_title', 'subject_len', 'bit_score', 'evalue',
+    'identity', 'query_coverage', 'total_hsps'
+]
+
+
+def open_blast_index(index: str) -> sqlite3.Connection:
+    """
+    Open (creating if needed) a BLAST hit index.
+
+    Args:
+        index (str): the SQLite file of the index
+
+    Returns:
+        sqlite3.Connection: a connection to the index
+    """
+    index = os.path.abspath(os.path.expanduser(os.path.expandvars(index)))
+    os.makedirs(os.path.dirname(index), exist_ok=True)
+    connection = sqlite3.connect(index, timeout=60)
+    connection.execute(f"PRAGMA journal_mode={get_journal_mode(index)}")
+    for statement in INDEX_SCHEMA:
+        connection.execute(statement)
+    connection.commit()
+    return connection
+
+
+def _get_fingerprint(inventory: dict, filename: str) -> str:
+    """
+    Summarize the size and mtime of a file, to detect changes.
+
+    Args:
+        inventory (dict): the inventory of the sample the file belongs to
+        filename (str): the file to fingerprint
+
+    Returns:
+        str: the size and mtime of the file
+    """
+    from bactopia.inventory import get_file_stats
+    stats = get_file_stats(inventory, filename)
+    return f"{stats['size']}:{stats['mtime']}"
+
+
+def update_blast_index(index: str, samples: list) -> dict:
+    """
+    Add the BLAST results of samples to an index, only reading new or changed files.
+
+    Args:
+        index (str): the SQLite file of the index
+        samples (list): [path, name] for each sample to add
+
+    Returns:
+        dict: the number of files which were added, updated, unchanged and removed
+    """
+    from bactopia.inventory import get_inventory
+    from bactopia.parsers.blast import get_parsable_list, iter_hit_summaries
+
+    counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+    connection = open_blast_index(index)
+    for path, name in samples:
+        inventory = get_inventory(path, name)
+        # Match on the sample directory, samples with the same name may be in different runs. Paths under
+        # root sort between 'root/' and 'root0' ('0' follows '/'), so the range uses the filename index
+        indexed = dict(connection.execute(
+            "SELECT filename, fingerprint FROM files WHERE filename >= ? AND filename < ?",
+            (f"{inventory['root']}/", f"{inventory['root']}0")
+        ).fetchall())
+        seen = set()
+        for result in get_parsable_list(path, name, inventory=inventory):
+            if result['missing']:
+                continue
+            filename = os.path.abspath(os.path.expanduser(os.path.expandvars(result['files'][0])))
+            fingerprint = _get_fingerprint(inventory, filename)
+            seen.add(filename)
+            if indexed.get(filename) == fingerprint:
+                counts['unchanged'] += 1
+                continue
+
+            # One transaction per file, so an interrupted update never leaves partial results
+            with connection:
+                file_id = _replace_file(connection, filename, name, result['result_name'], fingerprint)
+                connection.executemany(
+                    f"INSERT INTO hits (file_id, {', '.join(HIT_FIELDS)}) VALUES ({', '.join(['?'] * (len(HIT_FIELDS) + 1))})",
+                    (
+                        [file_id, name, result['result_name'], query_id, query_len, hit['subject_title'],
+                         hit['subject_len'], hit['bit_score'], hit['evalue'], hit['identity'],
+                         hit['query_coverage'], hit['total_hsps']]
+                        for query_id, query_len, hit in iter_hit_summaries(filename)
+                    )
+                )
+            counts['updated' if filename in indexed else 'added'] += 1
+
+        for filename in set(indexed) - seen:
+            with connection:
+                _replace_file(connection, filename, name, None, None, remove=True)
+            counts['removed'] += 1
+        logging.debug(f"Indexed BLAST results of {name}")
+
+    connection.close()
+    return counts
+
+
+def _replace_file(connection: sqlite3.Connection, filename: str, sample: str, result_name: str,
+                  fingerprint: str, remove: bool = False) -> int:
+    """
+    Remove any existing hits of a file, and record its new fingerprint.
+
+    Args:
+        connection (sqlite3.Connection): a connection to the index
+        filename (str): the BLAST results file
+        sample (str): the name of the sample
+        result_name (str): the name of the BLAST result (e.g. plsdb, genes-gene.json)
+        fingerprint (str): the fingerprint of the file
+        remove (bool, optional): only remove the file from the index. Defaults to False.
+
+    Returns:
+        int: the file_id of the file, None if it was removed
+    """
+    row = connection.execute("SELECT file_id FROM files WHERE filename = ?", (filename,)).fetchone()
+    if row:
+        connection.execute("DELETE FROM hits WHERE file_id = ?", (row[0],))
+        connection.execute("DELETE FROM files WHERE file_id = ?", (row[0],))
+
+    if remove:
+        return None
+    return connection.execute(
+        "INSERT INTO files (filename, sample, result_name, fingerprint) VALUES (?, ?, ?, ?)",
+        (filename, sample, result_name, fingerprint)
+    ).lastrowid
+
+
+def find_hits(index: str, subject: str = None, query: str = None, min_identity: float = None,
+              min_coverage: float = None, max_evalue: float = None) -> list:
+    """
+    Find the samples with hits to a subject and/or query.
+
+    Args:
+        index (str): the SQLite file of the index
+        subject (str, optional): the subject title (e.g. a PLSDB accession) to look up. Defaults to None.
+        query (str, optional): the query_id (e.g. a gene or primer) to look up. Defaults to None.
+        min_identity (float, optional): minimum percent identity of the hit. Defaults to None.
+        min_coverage (float, optional): minimum percent of the query covered by the hit. Defaults to None.
+        max_evalue (float, optional): maximum evalue of the hit. Defaults to None.
+
+    Raises:
+        ValueError: neither a subject nor a query was given
+
+    Returns:
+        list: a dict of HIT_FIELDS for each matching hit
+    """
+    if not subject and not query:
+        raise ValueError("A subject and/or query is required to look up hits")
+
+    where = []
+    values = []
+    for column, operator, value in [
+        ['subject_title', '=', subject], ['query_id', '=', query], ['identity', '>=', min_identity],
+        ['query_coverage', '>=', min_coverage], ['evalue', '<=', max_evalue]
+    ]:
+        if value is not None:
+            where.append(f"{column} {operator} ?")
+            values.append(value)
+
+    connection = open_blast_index(index)
+    rows = connection.execute(
+        f"SELECT {', '.join(HIT_FIELDS)} FROM hits WHERE {' AND '.join(where)} ORDER BY sample, identity DESC",
+        values
+    ).fetchall()
+    connection.close()
+    return [dict(zip(HIT_FIELDS, row)) for row in rows]
@@ -0,0 +1,290 @@
+"""
+A persistent, size capped, cache of parsed results.
+
+Example: bactopia.cache.enable_cache("~/.cache/bactopia/parse-cache.db")
+"""
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Union
+
+if TYPE_CHECKING:
+    import sqlite3
+
+DEFAULT_CACHE = f"{os.environ.get('XDG_CACHE_HOME', '~/.cache')}/bactopia/parse-cache.db"
+DEFAULT_CACHE_SIZE = 1024
+EVICT_EVERY = 100
+TOUCH_EVERY = 500
+NETWORK_FILESYSTEMS = [
+    'afs', 'beegfs', 'ceph', 'cifs', 'fuse.glusterfs', 'fuse.sshfs', 'gpfs', 'lustre', 'nfs', 'nfs4', 'panfs',
+    'smb3', 'smbfs'
+]
+CACHE = {
+    'path': None,
+    'max_size': DEFAULT_CACHE_SIZE * 1024 * 1024,
+    'local': threading.local(),
+    'lock': threading.Lock(),
+    'pid': None,
+    'touched': [],
+    'writes': 0
+}
+
+
+def enable_cache(path: str = DEFAULT_CACHE, max_size: int = DEFAULT_CACHE_SIZE, rebuild: bool = False) -> None:
+    """
+    Enable the persistent cache used by bactopia.parse.parse, which is off until this is called.
+
+    Args:
+        path (str, optional): the SQLite file to store results in. Defaults to DEFAULT_CACHE.
+        max_size (int, optional): maximum size (in MB) of the cached results. Defaults to DEFAULT_CACHE_SIZE.
+        rebuild (bool, optional): remove all existing entries before use. Defaults to False.
+    """
+    disable_cache()
+    CACHE['path'] = os.path.abspath(os.path.expanduser(os.path.expandvars(path)))
+    CACHE['max_size'] = max_size * 1024 * 1024
+    CACHE['pid'] = os.getpid()
+    os.makedirs(os.path.dirname(CACHE['path']), exist_ok=True)
+    if rebuild:
+        connection = _get_connection()
+        connection.execute("DELETE FROM cache")
+        connection.commit()
+
+
+def disable_cache() -> None:
+    """
+    Evict entries over the size cap, close the cache and stop using it.
+    """
+    if CACHE['path'] and CACHE['pid'] == os.getpid():
+        # Includes the access times queued by other threads (e.g. --threads or daemon requests)
+        flush_touched()
+    local = CACHE['local']
+    if getattr(local, 'connection', None) and local.pid == os.getpid():
+        _evict(local.connection)
+        local.connection.close()
+    CACHE['path'] = None
+    CACHE['local'] = threading.local()
+    # A forked process may have inherited the lock while it was held
+    CACHE['lock'] = threading.Lock()
+    CACHE['pid'] = None
+    CACHE['touched'] = []
+    CACHE['writes'] = 0
+
+
+def is_enabled() -> bool:
+    """
+    Check if the persistent cache is in use.
+
+    Returns:
+        bool: True if the cache is enabled, otherwise False
+    """
+    return True if CACHE['path'] else False
+
+
+def get_filesystem(path: str) -> str:
+    """
+    Find the filesystem type of the mount a path is on (Linux only).
+
+    Args:
+        path (str): the file or directory to look up
+
+    Returns:
+        str: the filesystem type (e.g. ext4, nfs4), None if it could not be determined
+    """
+    path = os.path.realpath(path)
+    filesystem = None
+    longest = -1
+    try:
+        with open('/proc/mounts', 'rt') as fh:
+            for line in fh:
+                cols = line.split()
+                if len(cols) < 3:
+                    continue
+                mount_point = cols[1].replace('\\040', ' ')
+                prefix = mount_point.rstrip('/') + '/'
+                if (path == mount_point or path.startswith(prefix)) and len(mount_point) > longest:
+                    filesystem = cols[2]
+                    longest = len(mount_point)
+    except OSError:
+        return None
+    return filesystem
+
+
+def get_journal_mode(path: str) -> str:
+    """
+    Select the SQLite journal mode for a database, WAL requires shared memory which network filesystems lack.
+
+    Args:
+        path (str): the SQLite database
+
+    Returns:
+        str: 'DELETE' on network filesystems (see NETWORK_FILESYSTEMS), otherwise 'WAL'
+    """
+    return 'DELETE' if get_filesystem(os.path.dirname(path)) in NETWORK_FILESYSTEMS else 'WAL'
+
+
+def get_settings() -> dict:
+    """
+    Get the settings of the enabled cache, to enable it again in another process (e.g. a spawned worker).
+
+    Returns:
+        dict: the path and max_size (in MB) arguments of enable_cache, None if the cache is disabled
+    """
+    if not CACHE['path']:
+        return None
+    return {'path': CACHE['path'], 'max_size': CACHE['max_size'] // (1024 * 1024)}
+
+
+def _get_connection() -> 'sqlite3.Connection':
+    """
+    Open (once per process and thread) a connection to the cache.
+
+    Returns:
+        sqlite3.Connection: a connection to the cache database
+    """
+    import sqlite3
+    local = CACHE['local']
+    if getattr(local, 'connection', None) is None or local.pid != os.getpid():
+        # Connections are not shared with forked workers or threads, each opens its own
+        connection = sqlite3.connect(CACHE['path'], timeout=60)
+        connection.execute(f"PRAGMA journal_mode={get_journal_mode(CACHE['path'])}")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT, result BLOB, size INTEGER, accessed REAL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        connection.commit()
+        local.connection = connection
+        local.pid = os.getpid()
+    return local.connection
+
+
+def _take_touched() -> list:
+    """
+    Remove and return the access times queued by every thread since the last flush.
+
+    Returns:
+        list: (accessed, key) for each cached result read
+    """
+    with CACHE['lock']:
+        touched = CACHE['touched']
+        CACHE['touched'] = []
+    return touched
+
+
+def flush_touched() -> None:
+    """
+    Record the last access time of the cached results read since the last flush, in a single transaction.
+
+    Access times are queued by every thread of a process, call this once a unit of work (e.g. a sample)
+    is done so they are not lost when worker threads or processes exit.
+    """
+    if not CACHE['path']:
+        return None
+    touched = _take_touched()
+    if touched:
+        connection = _get_connection()
+        connection.executemany("UPDATE cache SET accessed = ? WHERE key = ?", touched)
+        connection.commit()
+
+
+def get_cache_keys(result_type: str, *files: str, options: dict = None) -> list:
+    """
+    Build the key and fingerprint used to store parsed results.
+
+    Args:
+        result_type (str): the type of results (e.g. assembly, mlst, qc, etc...)
+        *files (str): one or more input files to be parsed
+        options (dict, optional): parser specific options, part of the key. Defaults to None.
+
+    Raises:
+        FileNotFoundError: the input file could not be found
+
+    Returns:
+        list: 0 (str): key based on the absolute paths and options, 1 (str): fingerprint of sizes, mtimes,
+              package and parser versions (see bactopia.const.PARSER_VERSION)
+    """
+    from bactopia import __version__
+    from bactopia.const import PARSER_VERSION
+    paths = []
+    stats = [f"{__version__}:{PARSER_VERSION}"]
+    for f in files:
+        stat = os.stat(f)
+        paths.append(os.path.abspath(f))
+        stats.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+    key = [result_type] + paths
+    if options:
+        key.append(",".join(f"{k}={v}" for k, v in sorted(options.items())))
+    return ["\t".join(key), "\t".join(stats)]
+
+
+def get_result(key: str, fingerprint: str) -> Union[list, dict, None]:
+    """
+    Retrieve a cached result, if the input files are unchanged.
+
+    Args:
+        key (str): the key of the cached result
+        fingerprint (str): the expected fingerprint of the input files
+
+    Returns:
+        Union[list, dict, None]: the cached result, None if nothing is cached or the inputs changed
+    """
+    import pickle
+    connection = _get_connection()
+    row = connection.execute("SELECT fingerprint, result FROM cache WHERE key = ?", (key,)).fetchone()
+    if row and row[0] == fingerprint:
+        # Access times only order evictions, so they are written in batches rather than once per hit
+        with CACHE['lock']:
+            CACHE['touched'].append((time.time(), key))
+            full = len(CACHE['touched']) >= TOUCH_EVERY
+        if full:
+            flush_touched()
+        return pickle.loads(row[1])
+    return None
+
+
+def set_result(key: str, fingerprint: str, result: Union[list, dict]) -> None:
+    """
+    Store a parsed result, replacing any stale entry.
+
+    Args:
+        key (str): the key of the cached result
+        fingerprint (str): the fingerprint of the input files
+        result (Union[list, dict]): the parsed result to store
+    """
+    import pickle
+    connection = _get_connection()
+    touched = _take_touched()
+    if touched:
+        connection.executemany("UPDATE cache SET accessed = ? WHERE key = ?", touched)
+    blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    connection.execute(
+        "INSERT OR REPLACE INTO cache (key, fingerprint, result, size, accessed) VALUES (?, ?, ?, ?, ?)",
+        (key, fingerprint, blob, len(blob), time.time())
+    )
+    connection.commit()
+    with CACHE['lock']:
+        CACHE['writes'] += 1
+        evict = CACHE['writes'] % EVICT_EVERY == 0
+    if evict:
+        _evict(connection)
+
+
+def _evict(connection: 'sqlite3.Connection') -> None:
+    """
+    Remove the least recently used entries until the cache is under its size cap.
+
+    Args:
+        connection (sqlite3.Connection): a connection to the cache database
+    """
+    total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+    if total <= CACHE['max_size']:
+        return None
+
+    evict = []
+    for key, size in connection.execute("SELECT key, size FROM cache ORDER BY accessed"):
+        if total <= CACHE['max_size']:
+            break
+        evict.append((key,))
+        total -= size
+    connection.executemany("DELETE FROM cache WHERE key = ?", evict)
+    connection.commit()
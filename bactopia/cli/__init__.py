@@ -1,9 +1,4 @@
-import os
-import glob
-modules = glob.glob(os.path.join(os.path.dirname(__file__), "*.py"))
-__all__ = [os.path.basename(f)[:-3] for f in modules if os.path.isfile(f) and not f.endswith('__init__.py')]
-del modules
-del glob
-del os
-
-from . import *
+"""
+Command line entry points, each is only imported when it is run.
+"""
+__all__ = ['blast_index', 'json_benchmark', 'jsonify', 'parser', 'summary']
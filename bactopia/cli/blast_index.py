@@ -0,0 +1,114 @@
+import logging
+import os
+import bactopia
+from bactopia.blast_index import HIT_FIELDS, find_hits, update_blast_index
+from bactopia.parse import find_missing_samples, get_sample_names, read_manifest
+
+PROGRAM = 'bactopia blast-index'
+VERSION = bactopia.__version__
+
+
+def main():
+    import argparse as ap
+    import sys
+    import textwrap
+
+    parser = ap.ArgumentParser(
+        prog=PROGRAM,
+        conflict_handler='resolve',
+        description=f'{PROGRAM} (v{VERSION}) - Index the BLAST hits of Bactopia samples, and look them up',
+        formatter_class=ap.RawDescriptionHelpFormatter,
+        epilog=textwrap.dedent(f'''
+            example usage:
+              {PROGRAM} --index blast-index.db --bactopia BACTOPIA_DIRECTORY
+              {PROGRAM} --index blast-index.db --subject NZ_CP012345.1 --min_identity 95
+        ''')
+    )
+
+    parser.add_argument(
+        '--index', metavar="FILE", type=str, required=True,
+        help='SQLite file of the BLAST hit index.'
+    )
+
+    group1 = parser.add_argument_group('Build')
+    group1.add_argument(
+        '--bactopia', metavar="BACTOPIA_DIRECTORY", type=str,
+        help='Add (or update) the BLAST results of samples in this directory.'
+    )
+    group1.add_argument(
+        '--manifest', metavar="FILE", type=str,
+        help='Only index the samples in this file, instead of scanning BACTOPIA_DIRECTORY.'
+    )
+
+    group2 = parser.add_argument_group('Look Up')
+    group2.add_argument(
+        '--subject', metavar="STR", type=str,
+        help='Report samples with hits to this subject (e.g. PLSDB accession).'
+    )
+    group2.add_argument(
+        '--query', metavar="STR", type=str,
+        help='Report samples with hits from this query (e.g. gene or primer).'
+    )
+    group2.add_argument(
+        '--min_identity', metavar="FLOAT", type=float,
+        help='Minimum percent identity of reported hits.'
+    )
+    group2.add_argument(
+        '--min_coverage', metavar="FLOAT", type=float,
+        help='Minimum percent query coverage of reported hits.'
+    )
+    group2.add_argument(
+        '--max_evalue', metavar="FLOAT", type=float,
+        help='Maximum evalue of reported hits.'
+    )
+
+    group3 = parser.add_argument_group('Helpers')
+    group3.add_argument('--version', action='version',
+                        version=f'{PROGRAM} {VERSION}')
+    group3.add_argument('--verbose', action='store_true',
+                        help='Increase the verbosity of output.')
+    group3.add_argument('--silent', action='store_true',
+                        help='Only critical errors will be printed.')
+    if len(sys.argv) == 1:
+        parser.print_help()
+        sys.exit(0)
+
+    args = parser.parse_args()
+    if not args.bactopia and not args.subject and not args.query:
+        parser.error('at least one of --bactopia, --subject or --query is required')
+
+    # Setup logs
+    FORMAT = '%(asctime)s:%(name)s:%(levelname)s - %(message)s'
+    logging.basicConfig(format=FORMAT, datefmt='%Y-%m-%d %H:%M:%S',)
+    logging.getLogger().setLevel(logging.ERROR if args.silent else logging.DEBUG if args.verbose else logging.INFO)
+
+    if args.bactopia:
+        if args.manifest:
+            samples = read_manifest(args.manifest, path=args.bactopia)
+            missing = find_missing_samples(samples)
+            if missing:
+                logging.warning(
+                    f"{len(missing)} samples in {args.manifest} were not found on disk: "
+                    f"{', '.join(f'{path}/{name}' for path, name in missing)}"
+                )
+            # Samples with the same name may be in several runs, only drop the missing one
+            missing = set((path, name) for path, name in missing)
+            samples = [[path, name] for path, name in samples if (path, name) not in missing]
+        else:
+            samples = [[args.bactopia, name] for name in get_sample_names(args.bactopia)]
+
+        counts = update_blast_index(args.index, samples)
+        logging.info(
+            f"Indexed {len(samples)} samples in {os.path.abspath(args.index)} ({counts['added']} files added, "
+            f"{counts['updated']} updated, {counts['unchanged']} unchanged, {counts['removed']} removed)"
+        )
+
+    if args.subject or args.query:
+        print("\t".join(HIT_FIELDS))
+        for hit in find_hits(args.index, subject=args.subject, query=args.query, min_identity=args.min_identity,
+                             min_coverage=args.min_coverage, max_evalue=args.max_evalue):
+            print("\t".join('' if hit[field] is None else str(hit[field]) for field in HIT_FIELDS))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import logging
+import bactopia
+from bactopia.json_backend import BACKENDS, BENCHMARK_SIZES, DEFAULT_BENCHMARK, benchmark
+
+PROGRAM = 'bactopia json-benchmark'
+VERSION = bactopia.__version__
+
+
+def main():
+    import argparse as ap
+    import textwrap
+
+    parser = ap.ArgumentParser(
+        prog=PROGRAM,
+        conflict_handler='resolve',
+        description=f'{PROGRAM} (v{VERSION}) - Time the installed JSON backends, and save the fastest',
+        formatter_class=ap.RawDescriptionHelpFormatter,
+        epilog=textwrap.dedent(f'''
+            The saved winner is used by bactopia-jsonify and bactopia-summary, unless the
+            BACTOPIA_JSON_BACKEND environment variable selects one of: {', '.join(BACKENDS)}
+
+            example usage:
+              {PROGRAM}
+              {PROGRAM} --repeat 10 --no_save
+        ''')
+    )
+
+    parser.add_argument(
+        '--benchmark', metavar="FILE", type=str, default=DEFAULT_BENCHMARK,
+        help=f'Where to save the results. (Default: {DEFAULT_BENCHMARK})'
+    )
+    parser.add_argument(
+        '--sizes', metavar="INT", type=int, nargs='+', default=BENCHMARK_SIZES,
+        help=f'Document sizes (bytes) to time. (Default: {" ".join(str(s) for s in BENCHMARK_SIZES)})'
+    )
+    parser.add_argument(
+        '--repeat', metavar="INT", type=int, default=5,
+        help='The best of this many runs is kept. (Default: 5)'
+    )
+    parser.add_argument(
+        '--no_save', action='store_true',
+        help='Only print the results, do not save the winner.'
+    )
+
+    group1 = parser.add_argument_group('Helpers')
+    group1.add_argument('--version', action='version',
+                        version=f'{PROGRAM} {VERSION}')
+    group1.add_argument('--verbose', action='store_true',
+                        help='Increase the verbosity of output.')
+    group1.add_argument('--silent', action='store_true',
+                        help='Only critical errors will be printed.')
+
+    args = parser.parse_args()
+
+    # Setup logs
+    FORMAT = '%(asctime)s:%(name)s:%(levelname)s - %(message)s'
+    logging.basicConfig(format=FORMAT, datefmt='%Y-%m-%d %H:%M:%S',)
+    logging.getLogger().setLevel(logging.ERROR if args.silent else logging.DEBUG if args.verbose else logging.INFO)
+
+    results = benchmark(sizes=args.sizes, repeat=args.repeat, benchmark_file=None if args.no_save else args.benchmark)
+    if args.no_save:
+        logging.info(f"Fastest backend: {results['winner']}")
+    else:
+        logging.info(f"Fastest backend: {results['winner']} (saved to {args.benchmark})")
+
+    print("backend\tsize\tdecode_mb_per_sec\tencode_mb_per_sec")
+    for name, sizes in results['backends'].items():
+        for size, throughput in sizes.items():
+            print("\t".join([name, size] + [
+                '' if throughput[key] is None else f"{throughput[key]:.1f}"
+                for key in ['decode_mb_per_sec', 'encode_mb_per_sec']
+            ]))
+
+
+if __name__ == '__main__':
+    main()
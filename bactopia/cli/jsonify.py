@@ -1,15 +1,114 @@
 import bactopia
+from bactopia.client import DEFAULT_TIMEOUT
 PROGRAM = 'bactopia jsonify'
 VERSION = bactopia.__version__
 
 
+def get_options(args) -> dict:
+    """
+    Build the parser options (see parse_bactopia_files) from the command line arguments.
+
+    Args:
+        args (argparse.Namespace): the parsed command line arguments
+
+    Returns:
+        dict: parser options for each result type, None if there are none
+    """
+    options = {}
+    if args.passthrough:
+        from bactopia.const import PASSTHROUGH_OPTIONS
+        options.update(PASSTHROUGH_OPTIONS)
+    if args.blast_top_hits is not None:
+        options['blast'] = {'top_hits': args.blast_top_hits}
+    return options if options else None
+
+
+def batch(args) -> int:
+    """
+    Write the JSON of many samples in a single process, parsing them with a pool of workers.
+
+    Workers return already encoded JSON, and at most a few samples per worker are in flight,
+    so memory does not grow with the number of samples.
+
+    Args:
+        args (argparse.Namespace): the parsed command line arguments
+
+    Returns:
+        int: the exit code, 1 if any sample failed to parse, otherwise 0
+    """
+    import logging
+    import os
+    from bactopia.parse import find_missing_samples, get_sample_names, iter_bactopia_json, read_manifest
+
+    FORMAT = '%(asctime)s:%(name)s:%(levelname)s - %(message)s'
+    logging.basicConfig(format=FORMAT, datefmt='%Y-%m-%d %H:%M:%S',)
+    logging.getLogger().setLevel(logging.ERROR if args.silent else logging.DEBUG if args.verbose else logging.INFO)
+
+    if args.from_list:
+        samples = read_manifest(args.from_list, path=args.batch)
+    else:
+        samples = [[args.batch, name] for name in get_sample_names(args.batch)]
+    missing = find_missing_samples(samples)
+    if missing and args.from_list:
+        logging.warning(
+            f"{len(missing)} samples in {args.from_list} were not found on disk: "
+            f"{', '.join(f'{path}/{name}' for path, name in missing)}"
+        )
+    # Samples with the same name may be in several runs, only drop the missing one
+    missing = set((path, name) for path, name in missing)
+    samples = [[path, name] for path, name in samples if (path, name) not in missing]
+
+    os.makedirs(args.outdir, exist_ok=True)
+    if args.ndjson:
+        ndjson_file = f"{args.outdir}/{args.prefix}.ndjson{'.gz' if args.gzip else ''}"
+        if os.path.exists(ndjson_file) and not args.force:
+            logging.error(f"Existing {ndjson_file} found. Will not overwrite unless --force is used. Exiting.")
+            return 1
+    elif not args.force:
+        existing = [name for _, name in samples if os.path.exists(f'{args.outdir}/{name}.json')]
+        if existing:
+            logging.info(f"Skipping {len(existing)} samples with an existing JSON (use --force to overwrite)")
+            existing = set(existing)
+            samples = [[path, name] for path, name in samples if name not in existing]
+
+    options = get_options(args)
+    counts = {'ok': 0, 'ignored': 0, 'error': 0}
+    ndjson_fh = None
+    if args.ndjson:
+        if args.gzip:
+            import gzip
+            ndjson_fh = gzip.open(f'{ndjson_file}.tmp', 'wb', compresslevel=6)
+        else:
+            ndjson_fh = open(f'{ndjson_file}.tmp', 'wb')
+
+    try:
+        for name, status, data in iter_bactopia_json(samples, jobs=args.jobs, threads=args.threads, options=options):
+            counts[status] += 1
+            if status == 'error':
+                logging.error(f"Unable to parse {name}: {data}")
+            elif status == 'ignored':
+                logging.debug(f"Skipping {name}: {data}")
+            elif ndjson_fh:
+                ndjson_fh.write(data + b'\n')
+            else:
+                with open(f'{args.outdir}/{name}.json', 'wb') as fh:
+                    fh.write(data)
+    finally:
+        if ndjson_fh:
+            ndjson_fh.close()
+
+    if ndjson_fh:
+        # Only replace an existing file once every sample has been written
+        os.replace(f'{ndjson_file}.tmp', ndjson_file)
+    logging.info(f"Wrote JSON for {counts['ok']} samples ({counts['ignored']} ignored, {counts['error']} failed)")
+    return 1 if counts['error'] else 0
+
+
 def main():
     import argparse as ap
-    import json
     import os
     import sys
     import textwrap
-    from bactopia.parse import parse_bactopia_files
 
     parser = ap.ArgumentParser(
         prog=PROGRAM,
@@ -19,14 +118,32 @@ def main():
         epilog=textwrap.dedent(f'''
             example usage:
               {PROGRAM} SAMPLE_DIRECTORY
+              {PROGRAM} --batch BACTOPIA_DIRECTORY --jobs 8 --ndjson --gzip
         ''')
     )
 
     parser.add_argument(
-        'sample', metavar="SAMPLE_DIRECTORY", type=str,
+        'sample', metavar="SAMPLE_DIRECTORY", type=str, nargs='?',
         help='Sample directory containing Bactopia output.'
     )
 
+    parser.add_argument(
+        '--batch', metavar="BACTOPIA_DIRECTORY", type=str,
+        help='Process every sample in a Bactopia directory, instead of a single SAMPLE_DIRECTORY.'
+    )
+    parser.add_argument(
+        '--from-list', metavar="FILE", type=str,
+        help='Process the samples in this file (see bactopia-summary --manifest), paths default to --batch.'
+    )
+    parser.add_argument(
+        '--jobs', metavar="INT", type=int, default=1,
+        help='Number of processes used to parse samples in batch mode. (Default: 1)'
+    )
+    parser.add_argument('--ndjson', action='store_true',
+                        help='In batch mode, write one JSON object per line to PREFIX.ndjson instead of a file per sample.')
+    parser.add_argument('--gzip', action='store_true',
+                        help='Compress the --ndjson output (PREFIX.ndjson.gz).')
+
     parser.add_argument(
         '--outdir', metavar="OUTPUT_DIRECTORY", type=str, default="./",
         help='Directory to write output. (Default: ./)'
@@ -36,6 +153,28 @@ def main():
         '--prefix', metavar="STR", type=str, default="bactopia",
         help='Prefix to use for output files. (Default: bactopia)'
     )
+    parser.add_argument(
+        '--threads', metavar="INT", type=int, default=1,
+        help='Number of threads used to read and parse result files concurrently. (Default: 1)'
+    )
+    parser.add_argument(
+        '--blast_top_hits', metavar="INT", type=int,
+        help='Only keep the best N BLAST hits of each query, summarized by their best HSP. (Default: all hits)'
+    )
+    parser.add_argument('--passthrough', action='store_true',
+                        help='Copy JSON results (e.g. QC, assembly and MLST) into the output without decoding them.')
+    parser.add_argument(
+        '--socket', metavar="FILE", type=str,
+        help='Unix socket of a running "bactopia-parser serve" daemon. (Default: $BACTOPIA_PARSER_SOCKET or a per-user socket)'
+    )
+    parser.add_argument(
+        '--daemon', action='store_true',
+        help='Send the sample to a running "bactopia-parser serve" daemon, parse in this process if none is running.'
+    )
+    parser.add_argument(
+        '--daemon-timeout', metavar="INT", type=int, default=DEFAULT_TIMEOUT,
+        help=f'Seconds to wait for the daemon to parse the sample. (Default: {DEFAULT_TIMEOUT})'
+    )
     parser.add_argument('--force', action='store_true',
                         help='Overwrite existing reports.')
     parser.add_argument('--depends', action='store_true',
@@ -51,17 +190,30 @@ def main():
         sys.exit(0)
 
     args = parser.parse_args()
+    if args.batch or args.from_list:
+        if args.sample:
+            parser.error('SAMPLE_DIRECTORY can not be used with --batch or --from-list')
+        sys.exit(batch(args))
+    elif not args.sample:
+        parser.error('SAMPLE_DIRECTORY, --batch or --from-list is required')
 
     sample_name = os.path.basename(args.sample.rstrip("/"))
     sample_prefix = os.path.dirname(args.sample.rstrip("/"))
     json_file = f'{args.outdir}/{sample_name}.json'
-    if os.path.exists(f'{args.outdir}/{sample_name}.json') and not args.force:
+    if os.path.exists(json_file) and not args.force:
         print(f"Existing JSON for {sample_name} found in {args.outdir}. Will not overwirte unless --force is used. Exiting.",
               file=sys.stderr)
         sys.exit(1)
-    
-    with open(json_file, 'wt') as json_fh:
-        json.dump(parse_bactopia_files(sample_prefix, sample_name), json_fh)
+
+    options = get_options(args)
+    if args.daemon:
+        from bactopia.client import jsonify
+        jsonify(sample_prefix, sample_name, json_file, threads=args.threads, options=options, socket_path=args.socket,
+                timeout=args.daemon_timeout)
+    else:
+        from bactopia.json_backend import write_file
+        from bactopia.parse import parse_bactopia_files
+        write_file(json_file, parse_bactopia_files(sample_prefix, sample_name, threads=args.threads, options=options))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,93 @@
+import logging
+import bactopia
+from bactopia.client import DEFAULT_SOCKET, DaemonError, get_socket, request
+
+PROGRAM = 'bactopia parser'
+VERSION = bactopia.__version__
+
+
+def main():
+    import argparse as ap
+    import sys
+    import textwrap
+    from bactopia.cache import DEFAULT_CACHE, DEFAULT_CACHE_SIZE
+
+    parser = ap.ArgumentParser(
+        prog=PROGRAM,
+        conflict_handler='resolve',
+        description=f'{PROGRAM} (v{VERSION}) - Keep Bactopia parsers resident to answer jsonify and parse requests',
+        formatter_class=ap.RawDescriptionHelpFormatter,
+        epilog=textwrap.dedent(f'''
+            example usage:
+              {PROGRAM} serve &
+              bactopia-jsonify --daemon SAMPLE_DIRECTORY
+              {PROGRAM} stop
+        ''')
+    )
+
+    parser.add_argument(
+        'command', metavar="COMMAND", type=str, choices=['serve', 'status', 'stop'],
+        help='serve: start the daemon, status: check if the daemon is running, stop: stop the daemon'
+    )
+
+    parser.add_argument(
+        '--socket', metavar="FILE", type=str,
+        help=f'Unix socket of the daemon. (Default: $BACTOPIA_PARSER_SOCKET or {DEFAULT_SOCKET})'
+    )
+
+    group1 = parser.add_argument_group('Cache')
+    group1.add_argument(
+        '--cache', metavar="FILE", type=str, nargs='?', const=DEFAULT_CACHE,
+        help=f'Cache parsed results in a SQLite file, to reuse them in later runs. (Default: off, {DEFAULT_CACHE} if FILE is not given)'
+    )
+    group1.add_argument(
+        '--cache-size', metavar="INT", type=int, default=DEFAULT_CACHE_SIZE,
+        help=f'Maximum size (in MB) of the cache, least recently used results are evicted. (Default: {DEFAULT_CACHE_SIZE})'
+    )
+    group1.add_argument('--no-cache', action='store_true',
+                        help='Parse all results without using the cache, even if --cache is given.')
+
+    group2 = parser.add_argument_group('Helpers')
+    group2.add_argument('--version', action='version',
+                        version=f'{PROGRAM} {VERSION}')
+    group2.add_argument('--verbose', action='store_true',
+                        help='Increase the verbosity of output.')
+    group2.add_argument('--silent', action='store_true',
+                        help='Only critical errors will be printed.')
+    if len(sys.argv) == 1:
+        parser.print_help()
+        sys.exit(0)
+
+    args = parser.parse_args()
+
+    # Setup logs
+    FORMAT = '%(asctime)s:%(name)s:%(levelname)s - %(message)s'
+    logging.basicConfig(format=FORMAT, datefmt='%Y-%m-%d %H:%M:%S',)
+    logging.getLogger().setLevel(logging.ERROR if args.silent else logging.DEBUG if args.verbose else logging.INFO)
+
+    socket_path = get_socket(args.socket)
+    if args.command == 'serve':
+        from bactopia.server import serve
+        try:
+            serve(socket_path=socket_path, cache=None if args.no_cache else args.cache, cache_size=args.cache_size)
+        except OSError as e:
+            logging.error(e)
+            sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+    else:
+        try:
+            response = request({'command': 'ping' if args.command == 'status' else 'shutdown'}, socket_path=socket_path,
+                               timeout=30)
+        except (OSError, DaemonError):
+            print(f"No daemon is listening on {socket_path}", file=sys.stderr)
+            sys.exit(1)
+
+        if args.command == 'status':
+            print(f"Daemon (pid {response['pid']}, bactopia {response.get('version')}) is listening on {socket_path}")
+        else:
+            print(f"Stopped the daemon listening on {socket_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,13 @@
 import logging
 import os
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from typing import Iterator
 import bactopia
-from bactopia.summary import get_rank, gather_results, print_failed, print_cutoffs
-from bactopia.parse import parse_bactopia_files
-from bactopia.const import IGNORE_LIST
+from bactopia.cache import DEFAULT_CACHE, DEFAULT_CACHE_SIZE, disable_cache, enable_cache
+from bactopia.inventory import get_fingerprint, get_inventory
+from bactopia.summary import SUMMARY_RESULTS, ReportWriter, get_rank, write_sqlite, gather_results, print_failed, print_cutoffs
+from bactopia.parse import (SampleParseError, find_missing_samples, get_sample_names, iter_in_order,
+                            parse_bactopia_files, read_manifest)
 
 PROGRAM = 'bactopia summary'
 VERSION = bactopia.__version__
@@ -60,28 +63,302 @@ def process_sample(sample: dict, rank_cutoff: dict) -> dict:
     Returns:
         list: 0: the sample rank, [description]
     """
-    qc = sample['results']['quality-control']['final']['qc_stats']
-    assembly = sample['results']['assembly']['stats']
+    return process_row(gather_results(sample, None, None), rank_cutoff)
+
+
+def process_row(row: dict, rank_cutoff: dict) -> dict:
+    """
+    Rank a sample using the metrics in its aggregated results.
+
+    Args:
+        row (dict): the unnested results of a sample (see bactopia.summary.gather_results)
+        rank_cutoff (dict): the set of cutoffs for each rank
+
+    Returns:
+        dict: the unnested results with an updated rank and reason
+    """
     rank, reason = get_rank(
-        rank_cutoff, qc['coverage'], qc['qual_mean'], qc['read_mean'],
-        assembly['total_contig'], sample['genome_size'], sample['is_paired']
+        rank_cutoff, row['final_coverage'], row['final_qual_mean'], row['final_read_mean'],
+        row['total_contig'], row['estimated_genome_size'], row['is_paired']
     )
-    increment_and_append('processed', sample['sample'])
-    increment_and_append(rank, sample['sample'])
+    row['rank'] = rank
+    row['reason'] = reason
+    count_rank(row['sample'], rank, reason)
+    return row
+
+
+def count_rank(name: str, rank: str, reason: str) -> None:
+    """
+    Add a ranked sample to COUNTS, FAILED and CATEGORIES.
+
+    Args:
+        name (str): the sample name
+        rank (str): the rank of the sample
+        reason (str): the reason for the rank
+    """
+    increment_and_append('processed', name)
+    increment_and_append(rank, name)
 
     if rank == 'exclude':
         COUNTS['total-excluded'] += 1
-        FAILED['failed-cutoff'].append(sample['sample'])
-        CATEGORIES['failed'].append([sample['sample'], f'Failed to pass minimum cutoffs, reason: {reason}'])
+        FAILED['failed-cutoff'].append(name)
+        CATEGORIES['failed'].append([name, f'Failed to pass minimum cutoffs, reason: {reason}'])
     else:
         COUNTS['pass'] += 1
 
-    return gather_results(sample, rank, reason)
+
+def rerank_report(report_file: str, rank_cutoff: dict, exclusion_file: str = None, records: dict = None) -> list:
+    """
+    Recompute the rank of each sample in an existing report, without parsing any results.
+
+    The report only keeps 3 decimals, so a sample at a cutoff (e.g. 49.9951x against 50x) can rank
+    differently than in a full run. Stored records of the same run restore the full precision metrics.
+
+    Args:
+        report_file (str): a report (e.g. bactopia-report.txt) from a previous run
+        rank_cutoff (dict): the set of cutoffs for each rank
+        exclusion_file (str, optional): the exclusion report of the same run, to carry over samples
+            which failed QC or were missing. Defaults to None.
+        records (dict, optional): stored records keyed by sample name (see IncrementalWriter), only used for
+            samples whose metrics match the report. Defaults to None.
+
+    Returns:
+        list: 0 (list): the re-ranked rows, 1 (list): the report fields, 2 (dict): the names of processed samples
+    """
+    import csv
+    from bactopia.parsers.error import ERROR_DESCRIPTIONS
+    from bactopia.parsers.generic import read_table
+    from bactopia.summary import RANKS, format_reasons, get_ranks
+
+    table = read_table(report_file)
+    results = []
+    processed_samples = {}
+    if len(table):
+        columns = dict(zip(table.header, table.columns))
+        if records:
+            metrics = ['final_coverage', 'final_qual_mean', 'final_read_mean', 'total_contig', 'estimated_genome_size']
+            precise = {key: list(columns[key]) for key in metrics}
+            for i, name in enumerate(columns['sample']):
+                row = records.get(name, {}).get('row')
+                if row and all(_format_value(row[key]) == precise[key][i] for key in metrics):
+                    for key in metrics:
+                        precise[key][i] = row[key]
+            columns.update(precise)
+        ranks, reasons, values = get_ranks(
+            rank_cutoff, columns['final_coverage'], columns['final_qual_mean'], columns['final_read_mean'],
+            columns['total_contig'], columns['estimated_genome_size'], [v == 'True' for v in columns['is_paired']]
+        )
+        for i, row in enumerate(table):
+            row['rank'] = RANKS[ranks[i]]
+            row['reason'] = format_reasons(rank_cutoff, reasons[i], *[
+                values[key][i] for key in ['coverage', 'quality', 'length', 'contigs', 'genome_size']
+            ])
+            COUNTS['total'] += 1
+            count_rank(row['sample'], row['rank'], row['reason'])
+            results.append(row)
+            processed_samples[row['sample']] = True
+
+    if exclusion_file:
+        error_types = {description: error_type for error_type, description in ERROR_DESCRIPTIONS.items()}
+        with open(exclusion_file, 'rt') as fh:
+            for row in csv.DictReader(fh, delimiter='\t'):
+                if row['status'] == 'qc-fail':
+                    COUNTS['total'] += 1
+                    COUNTS['total-excluded'] += 1
+                    COUNTS['qc-failure'] += 1
+                    for description in row['reason'].split(': ', 1)[-1].split(';'):
+                        error_type = error_types.get(description, 'unknown-error')
+                        COUNTS[error_type] += 1
+                        FAILED[error_type].append(row['sample'])
+                    CATEGORIES['failed'].append([row['sample'], row['reason']])
+                elif row['status'] == 'missing':
+                    CATEGORIES['missing'].append([row['sample'], row['reason']])
+
+    return [results, table.header, processed_samples]
+
+
+def _format_value(value) -> str:
+    """
+    Format a value the way it is written to the report (see bactopia.summary.ReportWriter).
+
+    Args:
+        value (Any): the value to format
+
+    Returns:
+        str: the value as written to the report
+    """
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+def get_sample_record(sample: dict) -> dict:
+    """
+    Reduce the parsed results of a sample to what is needed for the reports.
+
+    Args:
+        sample (dict): all the parsed results associated with a sample
+
+    Returns:
+        dict: the sample name, status, errors and unnested results (if any)
+    """
+    row = None
+    if not sample['ignored'] and not sample['has_errors']:
+        row = gather_results(sample, None, None)
+
+    return {
+        'sample': sample['sample'],
+        'path': None,
+        'fingerprint': None,
+        'ignored': sample['ignored'],
+        'has_errors': sample['has_errors'],
+        'errors': sample['errors'],
+        'row': row
+    }
+
+
+def iter_sample_records(samples: list, jobs: int = 1, previous: dict = None, include: dict = SUMMARY_RESULTS,
+                        options: dict = None) -> Iterator[dict]:
+    """
+    Parse samples, reusing previous records of unchanged samples.
+
+    Args:
+        samples (list): [path, name] for each sample to parse
+        jobs (int, optional): the number of processes to parse samples with. Defaults to 1.
+        previous (dict, optional): records from a previous run, keyed by sample name. If
+            provided, samples are fingerprinted and only new or changed samples (or samples
+            now found in another directory) are parsed. Defaults to None.
+        include (dict, optional): the results to parse (see parse_bactopia_files). Defaults to SUMMARY_RESULTS.
+        options (dict, optional): parser options for each result type (see parse_bactopia_files). Defaults to None.
+
+    Yields:
+        Iterator[dict]: the record of each sample, in the order of samples
+    """
+    incremental = previous is not None
+    previous = previous if previous else {}
+    # A stored record is only reused for the same directory, manifests may list samples from several runs
+    tasks = (
+        [path, name, previous[name]['fingerprint']
+         if name in previous and previous[name].get('path') == os.path.abspath(path) else None]
+        for path, name in samples
+    )
+    reused = 0
+    for record in iter_in_order(_parse_sample_record, tasks, jobs, incremental, include, options, jobs > 1):
+        if record.pop('unchanged', False):
+            reused += 1
+            record = previous[record['sample']]
+        yield record
+
+    if incremental:
+        logging.info(f"Reused {reused} unchanged samples")
+
+
+def _parse_sample_record(path: str, name: str, previous_fingerprint: str, incremental: bool, include: dict,
+                         options: dict, wrap_errors: bool) -> dict:
+    """
+    Parse a sample into its record, unless it is unchanged (run in worker processes when jobs > 1).
+
+    The sample is inventoried once, for both its fingerprint and parsing, and only the
+    reduced record is returned to the parent process.
+
+    Args:
+        path (str): a path to expected Bactopia results
+        name (str): the name of sample to parse
+        previous_fingerprint (str): the fingerprint of the sample's stored record, None if there is none
+        incremental (bool): fingerprint the sample, and skip parsing if it matches previous_fingerprint
+        include (dict): the results to parse (see parse_bactopia_files)
+        options (dict): parser options for each result type (see parse_bactopia_files)
+        wrap_errors (bool): raise SampleParseError (with the sample name) instead of the original exception
+
+    Raises:
+        SampleParseError: the sample could not be parsed (only if wrap_errors)
+
+    Returns:
+        dict: the record of the sample (see get_sample_record), only its name and fingerprint if it is unchanged
+    """
+    try:
+        inventory = get_inventory(path, name)
+        fingerprint = get_fingerprint(inventory) if incremental else None
+        if incremental and fingerprint == previous_fingerprint:
+            return {'sample': name, 'fingerprint': fingerprint, 'unchanged': True}
+
+        record = get_sample_record(
+            parse_bactopia_files(path, name, include=include, options=options, inventory=inventory)
+        )
+        record['path'] = os.path.abspath(path)
+        record['fingerprint'] = fingerprint
+        return record
+    except Exception as e:
+        if wrap_errors:
+            raise SampleParseError(name, f"{type(e).__name__}: {e}", path=path) from e
+        raise
+
+
+def read_incremental(incremental_file: str, path: str, settings: dict = None) -> dict:
+    """
+    Read the sample records stored by a previous incremental run.
+
+    Args:
+        incremental_file (str): the JSON file of stored records
+        path (str): the Bactopia directory being summarized
+        settings (dict, optional): options which change the stored records. Defaults to None.
+
+    Returns:
+        dict: the stored records keyed by sample name, empty if they are not reusable
+    """
+    import json
+    if os.path.exists(incremental_file):
+        with open(incremental_file, 'rt') as fh:
+            stored = json.load(fh)
+        if (stored['version'] == VERSION and stored['bactopia'] == os.path.abspath(path) and
+                stored.get('settings', {}) == (settings if settings else {})):
+            return stored['samples']
+        logging.info(
+            f"Stored records in {incremental_file} are from a different version, directory or settings, ignoring them"
+        )
+    return {}
+
+
+class IncrementalWriter:
+    """
+    Store sample records for the next incremental run, writing each record as it is added.
+
+    Records are written to a temporary file, which only replaces the stored records on close.
+    """
+    def __init__(self, incremental_file: str, path: str, settings: dict = None):
+        """
+        Args:
+            incremental_file (str): the JSON file to write records to
+            path (str): the Bactopia directory being summarized
+            settings (dict, optional): options which change the stored records. Defaults to None.
+        """
+        import json
+        self.incremental_file = incremental_file
+        self.total = 0
+        self._fh = open(f'{incremental_file}.tmp', 'wt')
+        header = json.dumps({'version': VERSION, 'bactopia': os.path.abspath(path), 'settings': settings if settings else {}})
+        self._fh.write(f'{header[:-1]}, "samples": {{')
+
+    def add(self, record: dict) -> None:
+        """
+        Write a sample record.
+
+        Args:
+            record (dict): the record of a sample (see get_sample_record)
+        """
+        import json
+        self._fh.write(f'{", " if self.total else ""}{json.dumps(record["sample"])}: {json.dumps(record)}')
+        self.total += 1
+
+    def close(self) -> None:
+        """
+        Finish the stored records, and replace any previous ones.
+        """
+        self._fh.write('}}')
+        self._fh.close()
+        os.replace(f'{self.incremental_file}.tmp', self.incremental_file)
 
 
 def main():
     import argparse as ap
-    import csv
     import json
     import sys
     import textwrap
@@ -94,14 +371,21 @@ def main():
         epilog=textwrap.dedent(f'''
             example usage:
               {PROGRAM} BACTOPIA_DIRECTORY
+              {PROGRAM} --rerank-from bactopia-report.txt --gold_coverage 80
         ''')
     )
 
     parser.add_argument(
-        'bactopia', metavar="BACTOPIA_DIRECTORY", type=str,
+        'bactopia', metavar="BACTOPIA_DIRECTORY", type=str, nargs='?',
         help='Directory containing Bactopia output.'
     )
 
+    parser.add_argument(
+        '--manifest', metavar="FILE", type=str,
+        help=('Only summarize the samples in this file (TSV of sample name and optional Bactopia directory, '
+              'or a samplesheet with a "sample" column) instead of scanning BACTOPIA_DIRECTORY.')
+    )
+
     group1 = parser.add_argument_group('Gold Cutoffs')
     group1.add_argument(
         '--gold_coverage', metavar="FLOAT", type=float, default=100,
@@ -172,6 +456,20 @@ def main():
         help='Maximum assembled genome size.'
     )
 
+    group4 = parser.add_argument_group('Cache')
+    group4.add_argument(
+        '--cache', metavar="FILE", type=str, nargs='?', const=DEFAULT_CACHE,
+        help=f'Cache parsed results in a SQLite file, to reuse them in later runs. (Default: off, {DEFAULT_CACHE} if FILE is not given)'
+    )
+    group4.add_argument(
+        '--cache-size', metavar="INT", type=int, default=DEFAULT_CACHE_SIZE,
+        help=f'Maximum size (in MB) of the cache, least recently used results are evicted. (Default: {DEFAULT_CACHE_SIZE})'
+    )
+    group4.add_argument('--no-cache', action='store_true',
+                        help='Parse all results without using the cache, even if --cache is given.')
+    group4.add_argument('--rebuild-cache', action='store_true',
+                        help='Clear the cache (see --cache) before parsing results.')
+
     group5 = parser.add_argument_group('Helpers')
     group5.add_argument(
         '--outdir', metavar="OUTPUT_DIRECTORY", type=str, default="./",
@@ -182,8 +480,25 @@ def main():
         '--prefix', metavar="STR", type=str, default="bactopia",
         help='Prefix to use for output files. (Default: bactopia)'
     )
+    group5.add_argument(
+        '--jobs', metavar="INT", type=int, default=1,
+        help='Number of processes to use for parsing samples. (Default: 1)'
+    )
+    group5.add_argument(
+        '--rerank-from', metavar="REPORT", type=str,
+        help=('Recompute ranks from an existing report (and its -exclude.txt) using the given cutoffs, '
+              'instead of parsing BACTOPIA_DIRECTORY. The report keeps 3 decimals, so samples at a cutoff '
+              'may rank differently than a full run, unless the run used --incremental and its '
+              '-incremental.json is next to the report.')
+    )
+    group5.add_argument('--sqlite', action='store_true',
+                        help='Also write the report, exclusions and failure categories to an indexed SQLite database.')
+    group5.add_argument('--mapping_stats', action='store_true',
+                        help='Include the depth and breadth of coverage against each mapped reference.')
     group5.add_argument('--force', action='store_true',
                         help='Overwrite existing reports.')
+    group5.add_argument('--incremental', action='store_true',
+                        help='Only parse new or changed samples, reusing the results stored by the previous run.')
     group5.add_argument('--depends', action='store_true',
                         help='Verify dependencies are installed.')
     group5.add_argument('--version', action='version',
@@ -197,8 +512,10 @@ def main():
         sys.exit(0)
 
     args = parser.parse_args()
+    if not args.bactopia and not args.rerank_from:
+        parser.error('BACTOPIA_DIRECTORY is required, unless --rerank-from is used')
 
-    if os.path.exists(f'{args.outdir}/{args.prefix}-exclude.txt') and not args.force:
+    if os.path.exists(f'{args.outdir}/{args.prefix}-exclude.txt') and not args.force and not args.incremental:
         print(f"Existing reports found in {args.outdir}. Will not overwirte unless --force is used. Exiting.",
               file=sys.stderr)
         sys.exit(1)
@@ -230,27 +547,80 @@ def main():
         'max-assembled-size': args.max_assembled_size
     }
 
-    processed_samples = {}
-    fields = []
-    results = []
-    logging.debug(f"Working on {args.bactopia}...")
-    with os.scandir(args.bactopia) as dirs:
-        for i, directory in enumerate(dirs):
-            if directory.name not in IGNORE_LIST:
-                logging.debug(f"Working on {directory.name} ({i+1})")
-                sample = parse_bactopia_files(args.bactopia, directory.name)
-                if sample['ignored']:
-                    logging.debug(f"\t{sample['sample']} is not a Bactopia directory, ignoring...")
-                    increment_and_append('ignore-unknown', sample['sample'])
+    report = ReportWriter(tmpdir=args.outdir if os.path.isdir(args.outdir) else None)
+    if args.rerank_from:
+        exclusion_file = args.rerank_from.replace('-report.txt', '-exclude.txt')
+        if exclusion_file == args.rerank_from or not os.path.exists(exclusion_file):
+            logging.warning(f"No exclusion report found for {args.rerank_from}, QC failures will not be included")
+            exclusion_file = None
+        records = None
+        incremental_file = args.rerank_from.replace('-report.txt', '-incremental.json')
+        if incremental_file != args.rerank_from and os.path.exists(incremental_file):
+            with open(incremental_file, 'rt') as fh:
+                records = json.load(fh)['samples']
+        else:
+            logging.info(f"No stored records found for {args.rerank_from}, ranking from the 3 decimal values in it")
+        rows, _, processed_samples = rerank_report(
+            args.rerank_from, RANK_CUTOFF, exclusion_file=exclusion_file, records=records
+        )
+        for row in rows:
+            report.add(row)
+    else:
+        if args.cache and not args.no_cache:
+            enable_cache(args.cache, max_size=args.cache_size, rebuild=args.rebuild_cache)
+
+        if args.manifest:
+            samples = read_manifest(args.manifest, path=args.bactopia)
+            missing = find_missing_samples(samples)
+            if missing:
+                logging.warning(
+                    f"{len(missing)} of {len(samples)} samples in {args.manifest} were not found on disk: "
+                    f"{', '.join(f'{path}/{name}' for path, name in missing)}"
+                )
+                for path, name in missing:
+                    CATEGORIES['missing'].append([name, f"Not found in {path}"])
+                # Samples with the same name may be in several runs, only drop the missing one
+                missing = set((path, name) for path, name in missing)
+                samples = [[path, name] for path, name in samples if (path, name) not in missing]
+        else:
+            samples = [[args.bactopia, name] for name in get_sample_names(args.bactopia)]
+
+        include = SUMMARY_RESULTS
+        options = None
+        settings = {}
+        if args.mapping_stats:
+            include = OrderedDict(SUMMARY_RESULTS, mapping=None)
+            options = {'mapping': {'stats': True}}
+            settings['mapping_stats'] = True
+
+        incremental_file = f'{args.outdir}/{args.prefix}-incremental.json'
+        previous = None
+        incremental = None
+        if args.incremental:
+            previous = read_incremental(incremental_file, args.bactopia, settings=settings)
+            os.makedirs(args.outdir, exist_ok=True)
+            incremental = IncrementalWriter(incremental_file, args.bactopia, settings=settings)
+        processed_samples = {}
+        logging.debug(f"Working on {args.bactopia}...")
+        parsed = iter_sample_records(samples, jobs=args.jobs, previous=previous, include=include, options=options)
+        for i, sample in enumerate(parsed):
+            logging.debug(f"Working on {sample['sample']} ({i+1})")
+            if incremental:
+                incremental.add(sample)
+
+            if sample['ignored']:
+                logging.debug(f"\t{sample['sample']} is not a Bactopia directory, ignoring...")
+                increment_and_append('ignore-unknown', sample['sample'])
+            else:
+                COUNTS['total'] += 1
+                if sample['has_errors']:
+                    process_errors(sample['sample'], sample['errors'])
                 else:
-                    COUNTS['total'] += 1
-                    if sample['has_errors']:
-                        process_errors(sample['sample'], sample['errors'])
-                    else:
-                        processed = process_sample(sample, RANK_CUTOFF)
-                        fields = list(dict.fromkeys(fields + list(processed.keys())))
-                        results.append(processed)
-                        processed_samples[sample['sample']] = True
+                    report.add(process_row(sample['row'], RANK_CUTOFF))
+                    processed_samples[sample['sample']] = True
+        disable_cache()
+        if incremental:
+            incremental.close()
 
     # Write outputs
     outdir = args.outdir
@@ -258,28 +628,12 @@ def main():
 
     # Tab-delimited report
     txt_report = f'{outdir}/{args.prefix}-report.txt'
-    with open(txt_report, 'w') as txt_fh:
-        outputs = []
-        for result in results:
-            output = {}
-            for field in fields:
-                if field in result:
-                    if isinstance(result[field], float):
-                        output[field] = f"{result[field]:.3f}"
-                    else:
-                        output[field] = result[field]
-                else:
-                    output[field] = ""
-            outputs.append(output)
-        if outputs:
-            writer = csv.DictWriter(txt_fh, fieldnames=outputs[0].keys(), delimiter='\t')
-            writer.writeheader()
-            for row in outputs:
-                writer.writerow(row)
+    report.write(txt_report)
 
     # Exclusion report
     exclusion_report = f'{outdir}/{args.prefix}-exclude.txt'
     cutoff_counts = defaultdict(int)
+    exclusions = []
     with open(exclusion_report, 'w') as exclude_fh:
         exclude_fh.write('sample\tstatus\treason\n')
         for name, reason in CATEGORIES['failed']:
@@ -289,9 +643,18 @@ def main():
                 for r in reasons:
                     cutoffs.append(r.split('(')[0].strip().title())
                 cutoff_counts[';'.join(sorted(cutoffs))] += 1
-                exclude_fh.write(f'{name}\texclude\t{reason}\n')
+                exclusions.append([name, 'exclude', reason])
             else:
-                exclude_fh.write(f'{name}\tqc-fail\t{reason}\n')
+                exclusions.append([name, 'qc-fail', reason])
+        for name, reason in CATEGORIES['missing']:
+            exclusions.append([name, 'missing', reason])
+        for name, status, reason in exclusions:
+            exclude_fh.write(f'{name}\t{status}\t{reason}\n')
+
+    # SQLite database
+    if args.sqlite:
+        write_sqlite(f'{outdir}/{args.prefix}-report.db', report, exclusions, COUNTS, FAILED)
+    report.close()
 
     # Screen report
     summary_report = f'{outdir}/{args.prefix}-summary.txt'
@@ -309,7 +672,10 @@ def main():
                 Failed Cutoff: {COUNTS["exclude"]}\n'''))
         summary_fh.write(print_cutoffs(cutoff_counts))
         summary_fh.write(f'    QC Failure: {COUNTS["qc-failure"]}\n')
-        summary_fh.write(print_failed(FAILED))
+        failed = print_failed(FAILED)
+        if CATEGORIES['missing']:
+            failed = "\n".join(filter(None, [failed, f'    Missing From Disk: {len(CATEGORIES["missing"])}']))
+        summary_fh.write(failed)
         summary_fh.write(textwrap.dedent(f'''
             Reports:
                 Full Report (txt): {txt_report}
@@ -0,0 +1,157 @@
+"""
+A thin client of the resident parser (see bactopia.server), which falls back to parsing in-process.
+
+Example: bactopia.client.jsonify(path, name, outfile)
+"""
+import os
+
+SOCKET_ENV = 'BACTOPIA_PARSER_SOCKET'
+DEFAULT_SOCKET = f"{os.environ.get('XDG_RUNTIME_DIR', '/tmp')}/bactopia-parser-{os.getuid()}.sock"
+DEFAULT_TIMEOUT = 600
+PING_TIMEOUT = 5
+
+
+class DaemonError(Exception):
+    """
+    Raised when the daemon was reached, but could not complete a request.
+    """
+    pass
+
+
+def get_socket(socket_path: str = None) -> str:
+    """
+    Get the socket used by the daemon.
+
+    Args:
+        socket_path (str, optional): use this socket. Defaults to None (BACTOPIA_PARSER_SOCKET or DEFAULT_SOCKET).
+
+    Returns:
+        str: the path to the socket
+    """
+    return socket_path if socket_path else os.environ.get(SOCKET_ENV, DEFAULT_SOCKET)
+
+
+def check_socket(socket_path: str) -> None:
+    """
+    Verify a socket belongs to the current user and only they can connect to it.
+
+    Args:
+        socket_path (str): the socket of the daemon
+
+    Raises:
+        FileNotFoundError: the socket does not exist
+        PermissionError: the socket is not a socket, is owned by another user or others can access it
+    """
+    import stat
+    socket_stat = os.stat(socket_path)
+    if not stat.S_ISSOCK(socket_stat.st_mode):
+        raise PermissionError(f"{socket_path} is not a socket")
+    elif socket_stat.st_uid != os.getuid():
+        raise PermissionError(f"{socket_path} is owned by another user (uid {socket_stat.st_uid})")
+    elif socket_stat.st_mode & 0o077:
+        raise PermissionError(f"{socket_path} can be accessed by other users (mode {oct(socket_stat.st_mode & 0o777)})")
+
+
+def request(message: dict, socket_path: str = None, timeout: float = None) -> dict:
+    """
+    Send a request to the daemon and wait for its response.
+
+    Args:
+        message (dict): the command and its arguments
+        socket_path (str, optional): the socket of the daemon. Defaults to None (see get_socket).
+        timeout (float, optional): seconds to wait for a response. Defaults to None (no limit).
+
+    Raises:
+        OSError: the daemon is not running (e.g. FileNotFoundError, ConnectionRefusedError), the socket is not
+            trusted (PermissionError, see check_socket) or the daemon did not respond in time (socket.timeout)
+        DaemonError: the daemon could not complete the request
+
+    Returns:
+        dict: the response of the daemon
+    """
+    import json
+    import socket
+    socket_path = get_socket(socket_path)
+    check_socket(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall(json.dumps(message).encode() + b'\n')
+        with client.makefile('rb') as fh:
+            line = fh.readline()
+
+    if not line:
+        raise DaemonError("The daemon closed the connection without a response")
+    response = json.loads(line)
+    if response['status'] != 'ok':
+        raise DaemonError(response['error'])
+    return response
+
+
+def is_running(socket_path: str = None) -> bool:
+    """
+    Check if a daemon is answering requests.
+
+    Args:
+        socket_path (str, optional): the socket of the daemon. Defaults to None (see get_socket).
+
+    Returns:
+        bool: True if the daemon responded, otherwise False
+    """
+    try:
+        request({'command': 'ping'}, socket_path=socket_path, timeout=PING_TIMEOUT)
+        return True
+    except (OSError, DaemonError):
+        return False
+
+
+def jsonify(path: str, name: str, outfile: str, threads: int = 1, options: dict = None,
+            socket_path: str = None, timeout: float = DEFAULT_TIMEOUT) -> str:
+    """
+    Write the parsed results of a sample to a JSON file, using the daemon if it is running.
+
+    The daemon is only used if it runs the same version of bactopia, otherwise the sample is parsed in
+    this process. If the daemon does not respond in time or drops the connection, the sample is also
+    parsed in this process.
+
+    Args:
+        path (str): a path to expected Bactopia results
+        name (str): the name of sample to parse
+        outfile (str): the JSON file to write
+        threads (int, optional): the number of threads used to parse result files. Defaults to 1.
+        options (dict, optional): parser options for each result type (see parse_bactopia_files). Defaults to None.
+        socket_path (str, optional): the socket of the daemon. Defaults to None (see get_socket).
+        timeout (float, optional): seconds to wait for the daemon to write the file. Defaults to DEFAULT_TIMEOUT.
+
+    Raises:
+        DaemonError: the daemon could not parse the sample
+
+    Returns:
+        str: 'daemon' if the daemon wrote the file, 'local' if it was parsed in this process
+    """
+    import logging
+    from bactopia import __version__
+    socket_path = get_socket(socket_path)
+    if os.path.exists(socket_path):
+        try:
+            version = request({'command': 'ping'}, socket_path=socket_path, timeout=PING_TIMEOUT).get('version')
+            if version == __version__:
+                request({
+                    'command': 'jsonify', 'path': os.path.abspath(path), 'name': name,
+                    'outfile': os.path.abspath(outfile), 'threads': threads, 'options': options
+                }, socket_path=socket_path, timeout=timeout)
+                return 'daemon'
+            logging.warning(f"The daemon on {socket_path} runs bactopia {version}, not {__version__}, parsing locally")
+        except (ConnectionRefusedError, FileNotFoundError):
+            # A stale socket, no daemon is listening
+            pass
+        except PermissionError as e:
+            logging.warning(f"Not using the daemon, {e}")
+        except OSError as e:
+            # e.g. the daemon timed out or reset the connection
+            logging.warning(f"The daemon on {socket_path} did not respond ({e!r}), parsing locally")
+
+    from bactopia.json_backend import write_file
+    from bactopia.parse import parse_bactopia_files
+    write_file(outfile, parse_bactopia_files(path, name, threads=threads, options=options))
+    return 'local'
@@ -19,3 +19,13 @@ RESULT_TYPES = [
 ]
 
 IGNORE_LIST = ['.nextflow', '.nextflow.log', 'bactopia-info', 'work', 'bactopia-tools']
+
+# Bump whenever the output of a parser changes, cached results of older versions are not reused
+PARSER_VERSION = 2
+
+# Parser options which keep JSON results undecoded (see bactopia.json_backend.RawJSON)
+PASSTHROUGH_OPTIONS = {
+    "assembly": {"raw": True},
+    "mlst": {"raw": True},
+    "quality-control": {"raw": True}
+}
@@ -0,0 +1,164 @@
+"""
+Single-pass inventory of the files associated with a sample.
+
+Example: inventory = get_inventory(path, name)
+"""
+import os
+
+
+def get_inventory(path: str, name: str) -> dict:
+    """
+    Walk a sample directory once and record every file and directory it contains.
+
+    Args:
+        path (str): a path to expected Bactopia results
+        name (str): the name of sample to inventory
+
+    Returns:
+        dict: the sample root, files (relative path: size and mtime) and directories (relative path: entries)
+    """
+    root = f"{os.path.abspath(os.path.expanduser(os.path.expandvars(path)))}/{name}"
+    inventory = {'root': root, 'files': {}, 'dirs': {}}
+    _walk_directory(inventory, root, '', set())
+    return inventory
+
+
+def _walk_directory(inventory: dict, dirname: str, relative: str, visited: set) -> None:
+    """
+    Recursively add the contents of a directory to an inventory.
+
+    Args:
+        inventory (dict): the inventory to update
+        dirname (str): the directory to scan
+        relative (str): the directory path relative to the inventory root
+        visited (set): (st_dev, st_ino) of the directories already scanned, so symlink loops are not followed
+    """
+    try:
+        stat = os.stat(dirname)
+        if (stat.st_dev, stat.st_ino) in visited:
+            return None
+        visited.add((stat.st_dev, stat.st_ino))
+        with os.scandir(dirname) as entries:
+            children = []
+            subdirs = []
+            for entry in entries:
+                children.append(entry.name)
+                entry_path = f"{relative}/{entry.name}" if relative else entry.name
+                if entry.is_dir():
+                    subdirs.append((entry.path, entry_path))
+                else:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        # Broken symlink, treat it like os.path.exists would
+                        continue
+                    inventory['files'][entry_path] = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return None
+
+    inventory['dirs'][relative] = children
+    for subdir, subdir_relative in subdirs:
+        _walk_directory(inventory, subdir, subdir_relative, visited)
+
+
+def _relative_path(inventory: dict, filename: str) -> str:
+    """
+    Convert a path to be relative to the inventory root.
+
+    Args:
+        inventory (dict): a sample inventory
+        filename (str): a path within the sample directory
+
+    Returns:
+        str: the path relative to the inventory root
+    """
+    root = inventory['root']
+    if filename.startswith(f"{root}/"):
+        relative = filename[len(root) + 1:].rstrip('/')
+        # Paths with '.', '..' or empty segments are normalized below
+        if '//' not in relative and '/.' not in f"/{relative}":
+            return relative
+    elif filename.rstrip('/') == root:
+        return ''
+
+    relative = os.path.relpath(os.path.abspath(filename), root)
+    return '' if relative == '.' else relative
+
+
+def has_file(inventory: dict, filename: str) -> bool:
+    """
+    Check if a file was found in the sample directory.
+
+    Args:
+        inventory (dict): a sample inventory
+        filename (str): the file to look for
+
+    Returns:
+        bool: True if the file exists, otherwise False
+    """
+    return _relative_path(inventory, filename) in inventory['files']
+
+
+def has_dir(inventory: dict, dirname: str) -> bool:
+    """
+    Check if a directory was found in the sample directory.
+
+    Args:
+        inventory (dict): a sample inventory
+        dirname (str): the directory to look for
+
+    Returns:
+        bool: True if the directory exists, otherwise False
+    """
+    return _relative_path(inventory, dirname) in inventory['dirs']
+
+
+def list_dir(inventory: dict, dirname: str, extension: str = None) -> list:
+    """
+    List the entries of a directory, in the order they were scanned.
+
+    Args:
+        inventory (dict): a sample inventory
+        dirname (str): the directory to list
+        extension (str, optional): only include files ending with the extension. Defaults to None.
+
+    Returns:
+        list: the names of the entries in the directory
+    """
+    relative = _relative_path(inventory, dirname)
+    entries = inventory['dirs'].get(relative, [])
+    if extension:
+        prefix = f"{relative}/" if relative else ''
+        return [e for e in entries if e.endswith(extension) and not e.startswith('.') and f"{prefix}{e}" in inventory['files']]
+    return list(entries)
+
+
+def get_file_stats(inventory: dict, filename: str) -> dict:
+    """
+    Get the size and modification time recorded for a file.
+
+    Args:
+        inventory (dict): a sample inventory
+        filename (str): the file to look up
+
+    Returns:
+        dict: the size and mtime of the file, None if the file does not exist
+    """
+    return inventory['files'].get(_relative_path(inventory, filename))
+
+
+def get_fingerprint(inventory: dict) -> str:
+    """
+    Summarize the paths, sizes and mtimes of an inventory, to detect changes to a sample.
+
+    Args:
+        inventory (dict): a sample inventory
+
+    Returns:
+        str: a SHA1 digest of the inventory's files
+    """
+    import hashlib
+    digest = hashlib.sha1()
+    for filename, stats in sorted(inventory['files'].items()):
+        digest.update(f"{filename}\t{stats['size']}\t{stats['mtime']}\n".encode())
+    return digest.hexdigest()
@@ -0,0 +1,371 @@
+"""
+Read and write JSON with the fastest installed backend (orjson, simdjson, ujson or the stdlib).
+
+Example: data = loads_file("sample.json"); write_file("sample.json", data)
+"""
+import os
+import time
+from typing import Callable
+
+BACKENDS = ['orjson', 'simdjson', 'ujson', 'json']
+BACKEND_ENV = 'BACTOPIA_JSON_BACKEND'
+DEFAULT_BENCHMARK = f"{os.environ.get('XDG_CACHE_HOME', '~/.cache')}/bactopia/json-benchmark.json"
+BENCHMARK_SIZES = [1024, 102400, 10485760]
+BACKEND = {}
+RAW_MARKER = f"@@bactopia-raw-json:{os.urandom(8).hex()}:"
+
+
+class RawJSON(bytes):
+    """
+    Already encoded JSON, which is written to the output as is instead of being decoded and re-encoded.
+    """
+    pass
+
+
+def _import_backend(name: str) -> dict:
+    """
+    Import a JSON backend, if it is installed.
+
+    Args:
+        name (str): the backend to import (see BACKENDS)
+
+    Returns:
+        dict: the name, loads (bytes -> object) and dumps (object -> bytes) of the backend, None if not installed
+    """
+    import json
+
+    def json_encode(data, default):
+        return json.dumps(data, default=default).encode()
+
+    try:
+        if name == 'orjson':
+            import orjson
+
+            def orjson_encode(data, default):
+                return orjson.dumps(_to_builtin(data), default=default, option=orjson.OPT_NON_STR_KEYS)
+
+            if hasattr(orjson, 'Fragment'):
+                # orjson (>= 3.9) splices RawJSON itself (see _orjson_default)
+                def dumps(data):
+                    return orjson_encode(data, _orjson_default)
+            else:
+                def dumps(data):
+                    return _splice_raw(orjson_encode, data, _default)
+            return {'name': name, 'loads': orjson.loads, 'dumps': dumps}
+        elif name == 'simdjson':
+            import simdjson
+            # simdjson only decodes, encoding uses the stdlib
+            loads = simdjson.loads
+            encode = json_encode
+        elif name == 'ujson':
+            import ujson
+            loads = ujson.loads
+
+            def encode(data, default):
+                return ujson.dumps(data, default=default).encode()
+        else:
+            loads = json.loads
+            encode = json_encode
+            name = 'json'
+    except ImportError:
+        return None
+
+    def dumps(data):
+        return _splice_raw(encode, data, _default)
+    return {'name': name, 'loads': loads, 'dumps': dumps}
+
+
+def _to_builtin(data):
+    """
+    Convert dict subclasses (e.g. bactopia.sample.LazyResults) to plain dicts, so orjson encodes them natively.
+
+    Converting once up front, through items() so pending results are loaded, avoids calling back into
+    Python for every OrderedDict during encoding.
+
+    Args:
+        data (Any): the values to convert
+
+    Returns:
+        Any: the values, with every nested dict and list rebuilt as a plain dict or list
+    """
+    if isinstance(data, dict):
+        return {key: _to_builtin(value) for key, value in data.items()}
+    elif isinstance(data, list) or type(data) is tuple:
+        return [_to_builtin(value) for value in data]
+    return data
+
+
+def _splice_raw(encode: Callable, data, default: Callable = None) -> bytes:
+    """
+    Encode values, replacing each RawJSON with its bytes, for backends which cannot embed encoded JSON.
+
+    Each RawJSON is first encoded as a unique marker string, which is then replaced in the output.
+
+    Args:
+        encode (Callable): encodes the values to bytes, called as encode(data, default)
+        data (Union[list, dict]): the values to encode
+        default (Callable, optional): converts other values the backend does not encode. Defaults to None.
+
+    Returns:
+        bytes: the UTF-8 encoded JSON
+    """
+    fragments = []
+
+    def _default(value):
+        if isinstance(value, RawJSON):
+            fragments.append(value)
+            return f"{RAW_MARKER}{len(fragments) - 1}"
+        elif default:
+            return default(value)
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+    encoded = encode(data, _default)
+    if not fragments:
+        return encoded
+
+    import re
+    return re.sub(
+        f'"{re.escape(RAW_MARKER)}([0-9]+)"'.encode(), lambda match: fragments[int(match.group(1))], encoded
+    )
+
+
+def _default(value):
+    """
+    Convert values the backends do not natively encode, shared so the output does not depend on the backend.
+
+    Args:
+        value (Any): the value to convert
+
+    Raises:
+        TypeError: the value cannot be encoded
+
+    Returns:
+        Union[dict, list, str, int, float]: the value as a builtin type
+    """
+    from array import array
+    if isinstance(value, dict):
+        return dict(value.items())
+    elif isinstance(value, (list, tuple, array)):
+        return list(value)
+    for builtin in [str, int, float]:
+        if isinstance(value, builtin):
+            return builtin(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _orjson_default(value):
+    """
+    Convert values orjson does not natively encode, embedding RawJSON as a Fragment.
+
+    Args:
+        value (Any): the value to convert
+
+    Raises:
+        TypeError: the value cannot be encoded
+
+    Returns:
+        Union[dict, list, str, int, float, orjson.Fragment]: the value as a type orjson encodes
+    """
+    if isinstance(value, RawJSON):
+        import orjson
+        return orjson.Fragment(value)
+    return _default(value)
+
+
+def get_backend(name: str = None) -> dict:
+    """
+    Select a JSON backend, once per process.
+
+    The backend is chosen by name, then the BACTOPIA_JSON_BACKEND environment variable, then the
+    winner of a saved benchmark, then the first installed backend in BACKENDS.
+
+    Args:
+        name (str, optional): use this backend, if it is installed. Defaults to None.
+
+    Returns:
+        dict: the name, loads (bytes -> object) and dumps (object -> bytes) of the backend
+    """
+    if name:
+        return _import_backend(name) or _import_backend('json')
+    elif not BACKEND:
+        preferred = [os.environ.get(BACKEND_ENV), read_benchmark().get('winner')] + BACKENDS
+        for backend_name in preferred:
+            backend = _import_backend(backend_name) if backend_name in BACKENDS else None
+            if backend:
+                BACKEND.update(backend)
+                break
+    return BACKEND
+
+
+def loads(data: bytes):
+    """
+    Decode JSON, falling back to the stdlib for input the backend rejects (e.g. NaN or Infinity).
+
+    Args:
+        data (bytes): the JSON to decode
+
+    Raises:
+        json.JSONDecodeError: the JSON is not valid
+
+    Returns:
+        Union[list, dict]: the decoded values
+    """
+    backend = get_backend()
+    try:
+        return backend['loads'](data)
+    except ValueError:
+        if backend['name'] == 'json':
+            raise
+    import json
+    return json.loads(data)
+
+
+def dumps(data) -> bytes:
+    """
+    Encode values as JSON, RawJSON values are written as is.
+
+    Args:
+        data (Union[list, dict]): the values to encode
+
+    Returns:
+        bytes: the UTF-8 encoded JSON
+    """
+    return get_backend()['dumps'](data)
+
+
+def loads_file(jsonfile: str):
+    """
+    Read a JSON file in a single read, and decode it.
+
+    Args:
+        jsonfile (str): input JSON file to be read
+
+    Returns:
+        Union[list, dict]: the values parsed from the JSON file
+    """
+    with open(jsonfile, 'rb') as fh:
+        return loads(fh.read())
+
+
+def read_raw(jsonfile: str) -> RawJSON:
+    """
+    Read a JSON file without decoding it, to be embedded as is by dumps.
+
+    Line breaks are removed, they can only be whitespace in valid JSON, so the
+    output stays a single line (e.g. for NDJSON).
+
+    Args:
+        jsonfile (str): input JSON file to be read
+
+    Returns:
+        RawJSON: the encoded contents of the JSON file
+    """
+    with open(jsonfile, 'rb') as fh:
+        return RawJSON(fh.read().strip().translate(None, b'\r\n'))
+
+
+def write_file(jsonfile: str, data) -> None:
+    """
+    Encode values and write them to a JSON file.
+
+    Args:
+        jsonfile (str): the JSON file to write
+        data (Union[list, dict]): the values to encode
+    """
+    with open(jsonfile, 'wb') as fh:
+        fh.write(dumps(data))
+
+
+def read_benchmark(benchmark_file: str = DEFAULT_BENCHMARK) -> dict:
+    """
+    Read the results of a saved benchmark.
+
+    Args:
+        benchmark_file (str, optional): the saved benchmark. Defaults to DEFAULT_BENCHMARK.
+
+    Returns:
+        dict: the winner and per-size throughput of each backend, empty if nothing is saved
+    """
+    import json
+    benchmark_file = os.path.expanduser(os.path.expandvars(benchmark_file))
+    if os.path.exists(benchmark_file):
+        try:
+            with open(benchmark_file, 'rt') as fh:
+                return json.load(fh)
+        except ValueError:
+            return {}
+    return {}
+
+
+def _benchmark_document(size: int) -> bytes:
+    """
+    Build a BLAST-like JSON document, of roughly the requested size.
+
+    Args:
+        size (int): the target size in bytes
+
+    Returns:
+        bytes: the encoded document
+    """
+    import json
+    hit = {
+        "num": 1, "description": [{"id": "NZ_CP012345.1", "title": "NZ_CP012345.1 Example plasmid"}], "len": 48231,
+        "hsps": [{"bit_score": 1234.5, "evalue": 1.2e-50, "identity": 987, "align_len": 1000, "gaps": 3}]
+    }
+    hit_size = len(json.dumps(hit)) + 2
+    return json.dumps({"hits": [hit] * max(1, size // hit_size)}).encode()
+
+
+def benchmark(sizes: list = BENCHMARK_SIZES, repeat: int = 5, benchmark_file: str = DEFAULT_BENCHMARK) -> dict:
+    """
+    Time decoding and encoding with each installed backend, and save the winner.
+
+    Args:
+        sizes (list, optional): document sizes (bytes) to time. Defaults to BENCHMARK_SIZES.
+        repeat (int, optional): the best of this many runs is kept. Defaults to 5.
+        benchmark_file (str, optional): where to save the results, None to not save. Defaults to DEFAULT_BENCHMARK.
+
+    Returns:
+        dict: the winner (fastest total time) and per-size decode/encode throughput (MB/s) of each backend
+    """
+    import json
+    results = {'winner': None, 'backends': {}}
+    best_time = None
+    for name in BACKENDS:
+        backend = _import_backend(name)
+        if not backend:
+            continue
+
+        results['backends'][name] = {}
+        total_time = 0
+        for size in sizes:
+            document = _benchmark_document(size)
+            data = json.loads(document)
+            timings = {'decode': [], 'encode': []}
+            for _ in range(repeat):
+                start = time.perf_counter()
+                backend['loads'](document)
+                timings['decode'].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                backend['dumps'](data)
+                timings['encode'].append(time.perf_counter() - start)
+
+            decode = min(timings['decode'])
+            encode = min(timings['encode'])
+            total_time += decode + encode
+            results['backends'][name][str(size)] = {
+                'decode_mb_per_sec': len(document) / decode / 1048576 if decode else None,
+                'encode_mb_per_sec': len(document) / encode / 1048576 if encode else None
+            }
+
+        if best_time is None or total_time < best_time:
+            best_time = total_time
+            results['winner'] = name
+
+    if benchmark_file:
+        benchmark_file = os.path.abspath(os.path.expanduser(os.path.expandvars(benchmark_file)))
+        os.makedirs(os.path.dirname(benchmark_file), exist_ok=True)
+        with open(f'{benchmark_file}.tmp', 'wt') as fh:
+            json.dump(results, fh, indent=4)
+        os.replace(f'{benchmark_file}.tmp', benchmark_file)
+    return results
@@ -6,18 +6,38 @@ Example: bactopia.parse(result_type, filename)
 import errno
 import os
 from collections import OrderedDict
-from typing import Union
-from . import parsers
+from typing import Iterator, Union
+from . import cache, parsers
 from .const import RESULT_TYPES, IGNORE_LIST
+from .inventory import get_inventory, has_file
+from .sample import LazyResults, SampleResult
 
 
-def parse(result_type: str, *files: str) -> Union[list, dict]:
+class SampleParseError(Exception):
     """
-    Use the result type to automatically select the appropriate parsing method for an input.
+    Raised when a sample could not be parsed, tagged with the sample name and path.
+    """
+    def __init__(self, sample: str, message: str, path: str = None):
+        # All arguments are passed on, so the exception can be pickled back from a worker process
+        super().__init__(sample, message, path)
+        self.sample = sample
+        self.message = message
+        self.path = path
+
+    def __str__(self):
+        sample = f"{self.path}/{self.sample}" if self.path else self.sample
+        return f"Unable to parse '{sample}': {self.message}"
+
+
+def parse(result_type: str, *files: str, **options) -> Union[list, dict]:
+    """
+    Use the result type to automatically select the appropriate parsing method for an input. If
+    the cache is enabled (see bactopia.cache), results of unchanged inputs are reused.
 
     Args:
         result_type (str): the type of results (e.g. assembly, mlst, qc, etc...)
         *files (str): one or more input files to be parsed
+        **options: parser specific options (e.g. compact=True for mapping)
 
     Raises:
         FileNotFoundError: the input file could not be found
@@ -27,11 +47,20 @@ def parse(result_type: str, *files: str) -> Union[list, dict]:
         Union[list, dict]: The results parsed for a given input.
     """
     if result_type in RESULT_TYPES:
+        if cache.is_enabled():
+            # os.stat raises FileNotFoundError for missing inputs
+            key, fingerprint = cache.get_cache_keys(result_type, *files, options=options)
+            result = cache.get_result(key, fingerprint)
+            if result is None:
+                result = parsers.get_parser(result_type).parse(*files, **options)
+                cache.set_result(key, fingerprint, result)
+            return result
+
         for f in files:
             if not os.path.exists(f):
                 raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), f)
         
-        return getattr(parsers, result_type).parse(*files)
+        return parsers.get_parser(result_type).parse(*files, **options)
     else:
         raise ValueError(f"'{result_type}' is not an accepted result type. Accepted types: {', '.join(RESULT_TYPES)}")
 
@@ -50,43 +79,47 @@ def parse_genome_size(gs_file: str) -> int:
         return int(gs_fh.readline().rstrip())
 
 
-def _is_bactopia_dir(path: str, name: str) -> list:
+def _is_bactopia_dir(path: str, name: str, inventory: dict) -> list:
     """
     Check if a directory contains Bactopia output and any errors.
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        inventory (dict): an inventory of the sample's files
 
     Returns:
         list: 0 (bool): path looks like Bactopia, 1 (list): any errors found
     """
     from .parsers.error import ERROR_TYPES
     errors = []
-    is_bactopia = os.path.exists(f"{path}/{name}/{name}-genome-size.txt")
+    is_bactopia = has_file(inventory, f"{path}/{name}/{name}-genome-size.txt")
 
     for error_type in ERROR_TYPES:
         filename = f"{path}/{name}/{name}-{error_type}-error.txt"
-        if os.path.exists(filename):
+        if has_file(inventory, filename):
             is_bactopia = True
             errors.append(parsers.error.parse(filename))
 
     return [is_bactopia, errors]
 
 
-def get_bactopia_files(path: str, name: str) -> dict:
+def get_bactopia_files(path: str, name: str, inventory: dict = None, include: dict = None) -> dict:
     """
     Build a list of all parsable Bactopia files.
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        inventory (dict, optional): a pre-built inventory of the sample's files. Defaults to None.
+        include (dict, optional): only list these result types and names (see parse_bactopia_files). Defaults to None.
 
     Returns:
         dict: path and info on all parsable Bactopia files
     """
     path = os.path.abspath(os.path.expanduser(os.path.expandvars(path)))
-    is_bactopia, errors = _is_bactopia_dir(path, name)
+    inventory = inventory if inventory else get_inventory(path, name)
+    is_bactopia, errors = _is_bactopia_dir(path, name, inventory)
     bactopia_files = OrderedDict()
     bactopia_files['has_errors'] = True if errors else False
     bactopia_files['errors'] = errors
@@ -104,8 +137,14 @@ def get_bactopia_files(path: str, name: str) -> dict:
                 elif result_type == "qc":
                     result_key = "quality-control"
 
+                if include is not None and result_key not in include:
+                    continue
+
                 if result_type not in ['error', 'generic', 'kmers']:
-                    bactopia_files['files'][result_key] = getattr(parsers, result_type).get_parsable_list(path, name)
+                    results = parsers.get_parser(result_type).get_parsable_list(path, name, inventory=inventory)
+                    if include is not None and include[result_key] is not None:
+                        results = [result for result in results if result['result_name'] in include[result_key]]
+                    bactopia_files['files'][result_key] = results
     else:
         bactopia_files['ignored'] = True
         if name not in IGNORE_LIST:
@@ -116,19 +155,30 @@ def get_bactopia_files(path: str, name: str) -> dict:
     return bactopia_files
 
 
-def parse_bactopia_files(path: str, name: str) -> dict:
+def parse_bactopia_files(path: str, name: str, threads: int = 1, lazy: bool = False, include: dict = None,
+                         options: dict = None, inventory: dict = None) -> dict:
     """
     Parse all results associated with an input sample.
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        threads (int, optional): the number of threads used to read and parse result files
+            concurrently, useful on high latency filesystems. Defaults to 1.
+        lazy (bool, optional): return a SampleResult, which only parses a result type when it
+            is first accessed. Defaults to False.
+        include (dict, optional): only the result types (keys) and result names (values, None
+            for all) to parse, e.g. {'assembly': ['stats'], 'mlst': None}. Defaults to None (everything).
+        options (dict, optional): parser options (values) passed to parse for each result type (keys),
+            e.g. {'mapping': {'stats': True}}. Defaults to None.
+        inventory (dict, optional): a pre-built inventory of the sample's files. Defaults to None.
 
     Returns:
         dict: The parsed set of results associated with the input sample
     """
     from bactopia.parsers.qc import is_paired
-    bactopia_files = get_bactopia_files(path, name)
+    inventory = inventory if inventory else get_inventory(path, name)
+    bactopia_files = get_bactopia_files(path, name, inventory=inventory, include=include)
     bactopia_results = OrderedDict((
         ('sample', name),
         ('genome_size', None),
@@ -144,11 +194,12 @@ def parse_bactopia_files(path: str, name: str) -> dict:
 
     if not bactopia_results['has_errors'] and not bactopia_results['ignored']:
         bactopia_results['genome_size'] = bactopia_files['genome_size']
+        bactopia_results['is_paired'] = is_paired(path, name, inventory=inventory)
+        pending = OrderedDict()
         for result_type, results in bactopia_files['files'].items():
-            bactopia_results['is_paired'] = is_paired(path, name)
-            bactopia_results['results'][result_type] = OrderedDict()
+            pending[result_type] = []
             result_key = result_type
-            if result_type == "-_resistance":
+            if result_type == "antimicrobial-resistance":
                 result_key = "amr"
             elif result_type == "quality-control":
                 result_key = "qc"
@@ -159,29 +210,317 @@ def parse_bactopia_files(path: str, name: str) -> dict:
                         bactopia_results['has_missing'] = True
                         bactopia_results['missing'].append([result_type, result["files"]])
                     else:
-                        bactopia_results['results'][result_type][result['result_name']] = {}
+                        pending[result_type].append([result['result_name'], result_key, None])
                 else:
-                    bactopia_results['results'][result_type][result['result_name']] = parse(result_key, *result['files'])
-            
-    return bactopia_results
-
+                    pending[result_type].append([result['result_name'], result_key, result['files']])
 
-def parse_bactopia_directory(path: str) -> list:
+        options = options if options else {}
+        if lazy:
+            bactopia_results['results'] = LazyResults(pending, parse, options=options)
+        else:
+            tasks = []
+            for result_type, results in pending.items():
+                bactopia_results['results'][result_type] = OrderedDict()
+                for result_name, result_key, files in results:
+                    if files:
+                        # Reserve the position, so the output order does not depend on threads
+                        bactopia_results['results'][result_type][result_name] = None
+                        tasks.append([result_type, result_name, result_key, files, options.get(result_type, {})])
+                    else:
+                        bactopia_results['results'][result_type][result_name] = {}
+
+            if threads > 1:
+                from concurrent.futures import ThreadPoolExecutor
+                with ThreadPoolExecutor(max_workers=threads) as executor:
+                    futures = [
+                        executor.submit(parse, result_key, *files, **result_options)
+                        for _, _, result_key, files, result_options in tasks
+                    ]
+                    for (result_type, result_name, _, _, _), future in zip(tasks, futures):
+                        bactopia_results['results'][result_type][result_name] = future.result()
+            else:
+                for result_type, result_name, result_key, files, result_options in tasks:
+                    bactopia_results['results'][result_type][result_name] = parse(result_key, *files, **result_options)
+            # Worker threads and processes may exit before their batch of cache access times is full
+            cache.flush_touched()
+
+    return SampleResult(bactopia_results) if lazy else bactopia_results
+
+
+def _parse_sample(path: str, name: str, threads: int = 1, include: dict = None, options: dict = None) -> dict:
     """
-    Scan a Bactopia directory and return parsed results.
+    Parse a sample, tagging any exception with the sample name and path.
 
     Args:
-        path (str):  a path to expected Bactopia results
+        path (str): a path to expected Bactopia results
+        name (str): the name of sample to parse
+        threads (int, optional): the number of threads used to parse result files. Defaults to 1.
+        include (dict, optional): only parse these result types and names (see parse_bactopia_files). Defaults to None.
+        options (dict, optional): parser options per result type (see parse_bactopia_files). Defaults to None.
+
+    Raises:
+        SampleParseError: parsing the sample failed
 
     Returns:
-        list: Parsed results for all samples in a Bactopia directory
+        dict: The parsed set of results associated with the input sample
+    """
+    try:
+        return parse_bactopia_files(path, name, threads=threads, include=include, options=options)
+    except Exception as e:
+        raise SampleParseError(name, f"{type(e).__name__}: {e}", path=path) from e
+
+
+def get_sample_names(path: str) -> list:
     """
-    results = []
+    Scan a Bactopia directory for possible samples.
 
+    Args:
+        path (str): a path to expected Bactopia results
+
+    Returns:
+        list: The names of all entries not on the ignore list, in scan order
+    """
+    samples = []
     with os.scandir(path) as dirs:
         for directory in dirs:
             if directory.name not in IGNORE_LIST:
-                sample = directory.name
-                results.append(parse_bactopia_files(path, sample))
+                samples.append(directory.name)
+    return samples
+
+
+def read_manifest(manifest: str, path: str = None) -> list:
+    """
+    Read the samples to parse from a manifest, instead of scanning a directory.
+
+    Accepted formats:
+        A tab-delimited file without a header: sample name and an optional Bactopia directory
+        A samplesheet (CSV or TSV) with a header containing a 'sample' column, and optionally
+        a 'path', 'outdir' or 'directory' column with the Bactopia directory of the sample
+
+    Args:
+        manifest (str): the manifest of samples
+        path (str, optional): the Bactopia directory of samples without one. Defaults to None.
+
+    Raises:
+        ValueError: a sample in the manifest does not have a name (a short row) or a Bactopia directory
+
+    Returns:
+        list: [path, name] for each sample, in manifest order
+    """
+    import csv
+    samples = []
+    with open(manifest, 'rt') as fh:
+        lines = [[i, line] for i, line in enumerate(fh, start=1) if line.strip() and not line.startswith('#')]
+
+    if not lines:
+        return samples
+
+    delimiter = ',' if manifest.endswith('.csv') else '\t'
+    rows = [[i, row] for i, line in lines for row in csv.reader([line], delimiter=delimiter)]
+    header = [column.strip().lower() for column in rows[0][1]]
+    if 'sample' in header:
+        name_column = header.index('sample')
+        path_column = None
+        for column in ['path', 'outdir', 'directory']:
+            if column in header:
+                path_column = header.index(column)
+                break
+        rows = rows[1:]
+    else:
+        # No header, the first line is a sample
+        name_column = 0
+        path_column = 1
+
+    for i, row in rows:
+        if not any(column.strip() for column in row):
+            # Only delimiters (e.g. a blank spreadsheet row)
+            continue
+        elif len(row) <= name_column or not row[name_column].strip():
+            raise ValueError(f"Line {i} of {manifest} does not have a sample name (column {name_column + 1})")
+
+        name = row[name_column].strip()
+        sample_path = path
+        if path_column is not None and len(row) > path_column and row[path_column].strip():
+            sample_path = row[path_column].strip()
+
+        if not sample_path:
+            raise ValueError(f"'{name}' (line {i}) in {manifest} does not have a path and no default path was given")
+        samples.append([sample_path, name])
+    return samples
+
+
+def find_missing_samples(samples: list) -> list:
+    """
+    Find samples that do not have a directory on disk.
+
+    Args:
+        samples (list): [path, name] for each sample
+
+    Returns:
+        list: [path, name] for each sample without a directory
+    """
+    return [[path, name] for path, name in samples if not os.path.isdir(f"{path}/{name}")]
+
+
+def iter_bactopia_samples(samples: list, jobs: int = 1, threads: int = 1, include: dict = None,
+                          options: dict = None) -> Iterator[dict]:
+    """
+    Parse samples in order, optionally spreading them across a process pool.
+
+    Args:
+        samples (list): [path, name] for each sample to parse
+        jobs (int, optional): the number of processes to use. Defaults to 1.
+        threads (int, optional): the number of threads used to parse result files of each sample. Defaults to 1.
+        include (dict, optional): only parse these result types and names (see parse_bactopia_files). Defaults to None.
+        options (dict, optional): parser options per result type (see parse_bactopia_files). Defaults to None.
+
+    Raises:
+        SampleParseError: a sample could not be parsed in a worker process (jobs > 1), serial
+            parsing raises the original exception
 
-    return results
+    Yields:
+        Iterator[dict]: The parsed results for each sample, in the order of samples
+    """
+    if jobs <= 1:
+        for path, name in samples:
+            yield parse_bactopia_files(path, name, threads=threads, include=include, options=options)
+    else:
+        yield from iter_in_order(_parse_sample, samples, jobs, threads, include, options)
+
+
+def _jsonify_sample(path: str, name: str, threads: int = 1, options: dict = None) -> list:
+    """
+    Parse a sample and encode its results as JSON, so only bytes leave a worker process.
+
+    Args:
+        path (str): a path to expected Bactopia results
+        name (str): the name of sample to parse
+        threads (int, optional): the number of threads used to parse result files. Defaults to 1.
+        options (dict, optional): parser options per result type (see parse_bactopia_files). Defaults to None.
+
+    Returns:
+        list: 0 (str): sample name, 1 (str): 'ok', 'ignored' or 'error', 2 (Union[bytes, str]): the
+              encoded results if 'ok', otherwise why the sample was skipped
+    """
+    from .json_backend import dumps
+    try:
+        results = parse_bactopia_files(path, name, threads=threads, options=options)
+    except Exception as e:
+        return [name, 'error', f"{type(e).__name__}: {e}"]
+
+    if results['ignored']:
+        return [name, 'ignored', results['message']]
+    return [name, 'ok', dumps(results)]
+
+
+def iter_bactopia_json(samples: list, jobs: int = 1, threads: int = 1, options: dict = None) -> Iterator[list]:
+    """
+    Parse samples in order and yield their results encoded as JSON, optionally using a process pool.
+
+    Unlike iter_bactopia_samples, a sample which fails to parse is reported instead of raised, and
+    directories which do not look like Bactopia samples are reported as ignored.
+
+    Args:
+        samples (list): [path, name] for each sample to parse
+        jobs (int, optional): the number of processes to use. Defaults to 1.
+        threads (int, optional): the number of threads used to parse result files of each sample. Defaults to 1.
+        options (dict, optional): parser options per result type (see parse_bactopia_files). Defaults to None.
+
+    Yields:
+        Iterator[list]: sample name, status and encoded results (or message) for each sample (see _jsonify_sample)
+    """
+    yield from iter_in_order(_jsonify_sample, samples, jobs, threads, options)
+
+
+def _init_worker(cache_settings: dict) -> None:
+    """
+    Set up a worker process to match its parent.
+
+    Args:
+        cache_settings (dict): the parent's cache settings (see cache.get_settings), None if disabled
+    """
+    if cache_settings:
+        cache.enable_cache(**cache_settings)
+    else:
+        cache.disable_cache()
+
+
+def iter_in_order(func, samples: list, jobs: int, *args) -> Iterator:
+    """
+    Call a function on each sample in order, optionally spreading them across a process pool.
+
+    Args:
+        func (Callable): a module level function, called as func(path, name, *args)
+        samples (list): [path, name] for each sample, any extra values (e.g. [path, name, value]) are
+            passed to func after the name
+        jobs (int): the number of processes to use
+        *args: additional arguments passed to func
+
+    Yields:
+        Iterator: the value returned for each sample, in the order of samples
+    """
+    if jobs <= 1:
+        for sample in samples:
+            yield func(*sample, *args)
+    else:
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Bound the samples in flight, so results are not held longer than needed
+        max_pending = jobs * 4
+        pending = deque()
+        # Workers are not guaranteed to be forked, so the cache is enabled in them explicitly
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(cache.get_settings(),)) as executor:
+            for sample in samples:
+                pending.append(executor.submit(func, *sample, *args))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+def iter_bactopia_directory(path: str, jobs: int = 1, samples: list = None, threads: int = 1,
+                            include: dict = None, options: dict = None) -> Iterator[dict]:
+    """
+    Scan a Bactopia directory and yield parsed results one sample at a time.
+
+    Args:
+        path (str):  a path to expected Bactopia results
+        jobs (int, optional): the number of processes to parse samples with. Defaults to 1.
+        samples (list, optional): only parse these samples, instead of scanning the directory. Defaults to None.
+        threads (int, optional): the number of threads used to parse result files of each sample. Defaults to 1.
+        include (dict, optional): only parse these result types and names (see parse_bactopia_files). Defaults to None.
+        options (dict, optional): parser options per result type (see parse_bactopia_files). Defaults to None.
+
+    Raises:
+        SampleParseError: a sample could not be parsed in a worker process (see iter_bactopia_samples)
+
+    Yields:
+        Iterator[dict]: Parsed results for each sample in a Bactopia directory
+    """
+    samples = samples if samples is not None else get_sample_names(path)
+    yield from iter_bactopia_samples(
+        [[path, name] for name in samples], jobs=jobs, threads=threads, include=include, options=options
+    )
+
+
+def parse_bactopia_directory(path: str, jobs: int = 1, threads: int = 1, include: dict = None,
+                             options: dict = None) -> list:
+    """
+    Scan a Bactopia directory and return parsed results.
+
+    Args:
+        path (str):  a path to expected Bactopia results
+        jobs (int, optional): the number of processes to parse samples with. Defaults to 1.
+        threads (int, optional): the number of threads used to parse result files of each sample. Defaults to 1.
+        include (dict, optional): only parse these result types and names (see parse_bactopia_files). Defaults to None.
+        options (dict, optional): parser options per result type (see parse_bactopia_files). Defaults to None.
+
+    Raises:
+        SampleParseError: a sample could not be parsed in a worker process (see iter_bactopia_samples)
+
+    Returns:
+        list: Parsed results for all samples in a Bactopia directory
+    """
+    return list(iter_bactopia_directory(path, jobs=jobs, threads=threads, include=include, options=options))
@@ -1,9 +1,35 @@
-import os
-import glob
-modules = glob.glob(os.path.join(os.path.dirname(__file__), "*.py"))
-__all__ = [os.path.basename(f)[:-3] for f in modules if os.path.isfile(f) and not f.endswith('__init__.py')]
-del modules
-del glob
-del os
-
-from . import *
+"""
+A registry of Bactopia's parsers, each parser module is only imported on first use.
+
+Example: bactopia.parsers.get_parser("assembly").parse(filename)
+"""
+import importlib
+from types import ModuleType
+from bactopia.const import RESULT_TYPES
+
+__all__ = list(RESULT_TYPES)
+
+
+def get_parser(result_type: str) -> ModuleType:
+    """
+    Import (once) the parser module of a result type.
+
+    Args:
+        result_type (str): the type of results (e.g. assembly, mlst, qc, etc...)
+
+    Raises:
+        ValueError: the result type is not an accepted type
+
+    Returns:
+        ModuleType: the parser module (e.g. bactopia.parsers.assembly)
+    """
+    if result_type not in RESULT_TYPES:
+        raise ValueError(f"'{result_type}' is not an accepted result type. Accepted types: {', '.join(RESULT_TYPES)}")
+    return importlib.import_module(f"{__name__}.{result_type}")
+
+
+def __getattr__(name: str) -> ModuleType:
+    # Keep attribute access (e.g. bactopia.parsers.blast) working without importing every parser
+    if name in RESULT_TYPES:
+        return get_parser(name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -53,35 +53,36 @@ def _parse_ariba(report_file: str, summary_file: str) -> dict:
     return {'report': parse_table(report_file), 'summary': summary}
 
 
-def get_parsable_list(path: str, name: str) -> list:
+def get_parsable_list(path: str, name: str, inventory: dict = None) -> list:
     """
     Generate a list of parsable files.
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        inventory (dict, optional): a pre-built inventory of the sample's files. Defaults to None.
 
     Returns:
         list: information about the status of parsable files
     """
-    import os
+    from bactopia.inventory import get_inventory, has_dir, has_file, list_dir
+    inventory = inventory if inventory else get_inventory(path, name)
     parsable_results = []
     
     ariba_dir = f"{path}/{name}/{RESULT_TYPE}"
-    if os.path.exists(ariba_dir):
-        with os.scandir(ariba_dir) as dirs:
-            for ariba_db in dirs:
-                missing = True
-                report = f"{ariba_dir}/{ariba_db.name}/report.tsv"
-                summary = f"{ariba_dir}/{ariba_db.name}/summary.csv"
-                if os.path.exists(report) and os.path.exists(summary):
-                    missing = False
-
-                parsable_results.append({
-                    'result_name': ariba_db.name,
-                    'files': [report, summary],
-                    'optional': True,
-                    'missing': missing
-                })
+    if has_dir(inventory, ariba_dir):
+        for ariba_db in list_dir(inventory, ariba_dir):
+            missing = True
+            report = f"{ariba_dir}/{ariba_db}/report.tsv"
+            summary = f"{ariba_dir}/{ariba_db}/summary.csv"
+            if has_file(inventory, report) and has_file(inventory, summary):
+                missing = False
+
+            parsable_results.append({
+                'result_name': ariba_db,
+                'files': [report, summary],
+                'optional': True,
+                'missing': missing
+            })
 
     return parsable_results
@@ -6,35 +6,38 @@ RESULT_TYPE = 'assembly'
 ACCEPTED_FILES = ["fna.json", "checkm-results.txt", "transposed_report.tsv"]
 
 
-def parse(filename: str) -> dict:
+def parse(filename: str, raw: bool = False) -> dict:
     """
     Check input file is an accepted file, then select the appropriate parsing method.
 
     Args:
         filename (str): input file to be parsed
+        raw (bool, optional): return fna.json undecoded, to be written as is (see parse_json). Defaults to False.
 
     Returns:
         dict: parsed results
     """
     filetype = get_file_type(ACCEPTED_FILES, filename)
     if filetype == "fna.json":
-        return parse_json(filename)
+        return parse_json(filename, raw=raw)
     elif filetype.endswith("checkm-results.txt") or filetype.endswith("transposed_report.tsv"):
-        return parse_table(filename)[0]
+        return parse_table(filename, max_rows=1)[0]
 
 
-def get_parsable_list(path: str, name: str) -> list:
+def get_parsable_list(path: str, name: str, inventory: dict = None) -> list:
     """
     Generate a list of parsable files.
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        inventory (dict, optional): a pre-built inventory of the sample's files. Defaults to None.
 
     Returns:
         list: information about the status of parsable files
     """
-    import os
+    from bactopia.inventory import get_inventory, has_file
+    inventory = inventory if inventory else get_inventory(path, name)
     parsable_results = []
     for result in ACCEPTED_FILES:
         result_name = None
@@ -55,7 +58,7 @@ def get_parsable_list(path: str, name: str) -> list:
             'result_name': result_name,
             'files': [filename],
             'optional': optional,
-            'missing': False if os.path.exists(filename) else True
+            'missing': not has_file(inventory, filename)
         })
 
     return parsable_results
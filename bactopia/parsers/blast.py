@@ -1,40 +1,65 @@
 """
 Parsers for BLAST related results.
 """
+import json
+from typing import Iterable, Iterator, Union
 from .generic import get_file_type, parse_json
 RESULT_TYPE = 'blast'
 ACCEPTED_FILES = [".json", '-plsdb.json', 'plsdb.txt']
+CHUNK_SIZE = 1048576
+MAX_CHUNK_SIZE = 67108864
+DECODER = json.JSONDecoder()
 
 
-def parse(filename: str) -> dict:
+def parse(filename: str, top_hits: int = None) -> dict:
     """
     Check input file is an accepted file, then select the appropriate parsing method.
 
     Args:
         filename (str): input file to be parsed
+        top_hits (int, optional): only keep the best N hits of each query, each summarized by
+            its best HSP (see _summarize_hit). Defaults to None (all hits, with raw HSPs).
 
     Returns:
         dict: parsed results
     """
     filetype = get_file_type(ACCEPTED_FILES, filename)
     if filetype == ".json":
-        return _parse_blast(parse_json(filename))
+        return _parse_blast(parse_json(filename), top_hits=top_hits)
     elif filetype == "plsdb.txt":
-        return _parse_plsdb(filename)
+        return _parse_plsdb(filename, top_hits=top_hits)
 
 
-def _parse_blast(jsondata: dict) -> dict:
+def _parse_blast(jsondata: dict, top_hits: int = None) -> dict:
     """
     Parse BLAST results and clean up final outputs.
 
     Args:
         jsondata (dict): the parsed BLAST results
+        top_hits (int, optional): only keep the best N hits of each query. Defaults to None.
 
     Returns:
         dict: BLAST results with reduced redundancy
     """
+    return _merge_reports(jsondata['BlastOutput2'], top_hits=top_hits)
+
+
+def _merge_reports(reports: Iterable, top_hits: int = None) -> dict:
+    """
+    Merge BLAST reports, one at a time, into a single set of results.
+
+    Args:
+        reports (Iterable): each member of 'BlastOutput2' (e.g. {'report': {...}})
+        top_hits (int, optional): only keep the best N hits of each query. Defaults to None.
+
+    Returns:
+        dict: BLAST results with reduced redundancy
+    """
+    import heapq
     results = {"program": None, 'queries': {}}
-    for row in jsondata['BlastOutput2']:
+    heaps = {}
+    total_hits = 0
+    for row in reports:
         report = row['report']
         if not results["program"]:
             results['program'] = report['program']
@@ -52,84 +77,310 @@ def _parse_blast(jsondata: dict) -> dict:
 
         if search['hits']:
             for hit in search['hits']:
-                results['queries'][query_id]['hits'].append({
-                    'subject_title': hit['description'][0]['title'].split()[0],
-                    'subject_len': hit['len'],
-                    'hsps': hit['hsps']
-                })
+                if top_hits is None:
+                    results['queries'][query_id]['hits'].append({
+                        'subject_title': hit['description'][0]['title'].split()[0],
+                        'subject_len': hit['len'],
+                        'hsps': hit['hsps']
+                    })
+                else:
+                    # Min-heap of the best N hits, ties are broken by keeping earlier hits
+                    summary = _summarize_hit(hit, search['query_len'])
+                    evalue = summary['evalue'] if summary['evalue'] is not None else float('inf')
+                    entry = (summary['bit_score'], -evalue, -total_hits, summary)
+                    total_hits += 1
+                    heap = heaps.setdefault(query_id, [])
+                    if len(heap) < top_hits:
+                        heapq.heappush(heap, entry)
+                    elif top_hits:
+                        heapq.heappushpop(heap, entry)
         
         if 'message' in search:
             results['queries'][query_id]['message'] = search['message']
+
+    for query_id, heap in heaps.items():
+        results['queries'][query_id]['hits'] = [entry[-1] for entry in sorted(heap, reverse=True)]
     return results
 
 
-def _parse_plsdb(filename: str) -> dict:
+def _summarize_hit(hit: dict, query_len: int) -> dict:
+    """
+    Collapse the HSPs of a BLAST hit to its best scores.
+
+    Args:
+        hit (dict): a BLAST hit, with its HSPs
+        query_len (int): the length of the query sequence
+
+    Returns:
+        dict: the subject, best bitscore, evalue and percent identity, the percent of the query
+            covered by the HSPs, and the number of HSPs
+    """
+    bit_score = 0
+    evalue = float('inf')
+    identity = 0
+    covered = []
+    for hsp in hit['hsps']:
+        bit_score = max(bit_score, hsp.get('bit_score', 0))
+        evalue = min(evalue, hsp.get('evalue', float('inf')))
+        if hsp.get('align_len'):
+            identity = max(identity, hsp.get('identity', 0) / hsp['align_len'] * 100)
+        if 'query_from' in hsp and 'query_to' in hsp:
+            covered.append(sorted([hsp['query_from'], hsp['query_to']]))
+
+    # Merge overlapping HSPs so query bases are only counted once
+    coverage = 0
+    end = 0
+    for hsp_start, hsp_end in sorted(covered):
+        if hsp_end > end:
+            coverage += hsp_end - max(hsp_start - 1, end)
+            end = hsp_end
+
+    return {
+        'subject_title': hit['description'][0]['title'].split()[0],
+        'subject_len': hit['len'],
+        'bit_score': bit_score,
+        'evalue': evalue if evalue != float('inf') else None,
+        'identity': identity,
+        'query_coverage': coverage / query_len * 100 if query_len else None,
+        'total_hsps': len(hit['hsps'])
+    }
+
+
+def _parse_plsdb(filename: str, top_hits: int = None) -> dict:
     """
     Correct PLSDB JSON format then use _parse_blast.
 
+    PLSDB results are multiple BLAST JSON documents concatenated together, each report is
+    decoded and merged one at a time.
+
     Args:
         filename (str): PLSDB BLAST results to be parsed
+        top_hits (int, optional): only keep the best N hits of each query. Defaults to None.
 
     Returns:
         dict: the results in correct format
     """
-    import json
-    merged_json = None
+    return _merge_reports(_iter_blast_reports(filename), top_hits=top_hits)
+
+
+def iter_hit_summaries(filename: str) -> Iterator[list]:
+    """
+    Stream the hits of BLAST results, each summarized by its best HSP.
+
+    Args:
+        filename (str): BLAST results (.json or PLSDB .txt) to be read
+
+    Yields:
+        Iterator[list]: 0 (str): the query_id, 1 (int): the query length, 2 (dict): the hit summary (see _summarize_hit)
+    """
+    get_file_type(ACCEPTED_FILES, filename)
+    for row in _iter_blast_reports(filename):
+        search = row['report']['results']['search']
+        for hit in search['hits'] if search['hits'] else []:
+            yield [search['query_id'], search['query_len'], _summarize_hit(hit, search['query_len'])]
+
+
+def _iter_blast_reports(filename: str, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Incrementally decode the 'BlastOutput2' reports of one or more concatenated BLAST JSON documents.
+
+    Only the report being decoded (and a chunk of unread text) is held in memory.
+
+    Args:
+        filename (str): BLAST JSON document(s) to be decoded
+        chunk_size (int, optional): number of characters to read at a time. Defaults to CHUNK_SIZE.
+
+    Raises:
+        ValueError: the file is not valid BLAST JSON
+
+    Yields:
+        Iterator[dict]: each member of 'BlastOutput2', in order
+    """
     with open(filename, 'rt') as fh:
-        entry = []
-        entries = []
-        for line in fh:
-            entry.append(line)
-            if line.startswith("}"):
-                jsondata = json.loads(''.join(entry))
-                if merged_json:
-                    merged_json['BlastOutput2'].extend(jsondata['BlastOutput2'])
+        stream = {'fh': fh, 'buffer': '', 'pos': 0, 'chunk_size': chunk_size, 'filename': filename}
+        while _next_char(stream):
+            _expect(stream, '{')
+            if _next_char(stream) == '}':
+                stream['pos'] += 1
+                continue
+
+            while True:
+                key = _decode_value(stream)
+                _expect(stream, ':')
+                if key == 'BlastOutput2' and _next_char(stream) == '[':
+                    stream['pos'] += 1
+                    if _next_char(stream) == ']':
+                        stream['pos'] += 1
+                    else:
+                        while True:
+                            yield _decode_value(stream)
+                            if _expect(stream, ',]') == ']':
+                                break
                 else:
-                    merged_json = jsondata
-                entry.clear()
-    return _parse_blast(merged_json)
+                    _decode_value(stream)
+
+                if _expect(stream, ',}') == '}':
+                    break
+
+
+def _read_chunk(stream: dict, chunk_size: int) -> bool:
+    """
+    Discard consumed text and append the next chunk of the file to a stream.
+
+    Args:
+        stream (dict): the state of the stream
+        chunk_size (int): number of characters to read
+
+    Returns:
+        bool: True if any text was read, False at the end of the file
+    """
+    chunk = stream['fh'].read(chunk_size)
+    stream['buffer'] = stream['buffer'][stream['pos']:] + chunk
+    stream['pos'] = 0
+    return True if chunk else False
+
+
+def _next_char(stream: dict) -> str:
+    """
+    Skip whitespace and peek at the next character of a stream.
+
+    Args:
+        stream (dict): the state of the stream
+
+    Returns:
+        str: the next non-whitespace character, empty at the end of the file
+    """
+    while True:
+        buffer = stream['buffer']
+        pos = stream['pos']
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+            pos += 1
+        stream['pos'] = pos
+        if pos < len(buffer):
+            return buffer[pos]
+        elif not _read_chunk(stream, stream['chunk_size']):
+            return ''
+
+
+def _expect(stream: dict, expected: str) -> str:
+    """
+    Consume the next character of a stream, which must be one of the expected characters.
+
+    Args:
+        stream (dict): the state of the stream
+        expected (str): the allowed characters
+
+    Raises:
+        ValueError: the next character was not expected
+
+    Returns:
+        str: the consumed character
+    """
+    char = _next_char(stream)
+    if not char or char not in expected:
+        raise ValueError(
+            f"Expected one of '{expected}' but found '{char}' in '{stream['filename']}'"
+        )
+    stream['pos'] += 1
+    return char
+
+
+def _decode_value(stream: dict) -> Union[dict, list, str, int, float]:
+    """
+    Decode the next JSON value of a stream, reading more of the file until it is complete.
+
+    Args:
+        stream (dict): the state of the stream
+
+    Raises:
+        json.JSONDecodeError: the value is not valid JSON
+
+    Returns:
+        Union[dict, list, str, int, float]: the decoded value
+    """
+    _next_char(stream)
+    chunk_size = stream['chunk_size']
+    while True:
+        try:
+            value, end = DECODER.raw_decode(stream['buffer'], stream['pos'])
+            if end < len(stream['buffer']) or isinstance(value, (bool, dict, list, str)) or value is None:
+                stream['pos'] = end
+                return value
+            # A number at the end of the buffer may continue in the next chunk
+            error = None
+        except json.JSONDecodeError as e:
+            if not _is_incomplete(e, stream['buffer']):
+                raise
+            error = e
+
+        # Likely an incomplete value, read more (doubling, up to a cap, to limit re-decoding large values)
+        if not _read_chunk(stream, chunk_size):
+            if error:
+                raise error
+            stream['pos'] = end
+            return value
+        chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+
+
+def _is_incomplete(error: json.JSONDecodeError, buffer: str) -> bool:
+    """
+    Check if a decoding error could be caused by the value continuing past the end of the buffer.
+
+    Args:
+        error (json.JSONDecodeError): the error raised while decoding
+        buffer (str): the text that was decoded
+
+    Returns:
+        bool: True if reading more text may complete the value, False if the text is malformed
+    """
+    if error.msg.startswith('Unterminated string'):
+        # Reported at the opening quote, which may be anywhere before the end of the buffer
+        return True
+    # Allow for a partially read literal (e.g. 'fals') or escape sequence (e.g. '\\u00')
+    return error.pos >= len(buffer) - 6
 
 
-def get_parsable_list(path: str, name: str) -> list:
+def get_parsable_list(path: str, name: str, inventory: dict = None) -> list:
     """
     Generate a list of parsable files.
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        inventory (dict, optional): a pre-built inventory of the sample's files. Defaults to None.
 
     Returns:
         list: information about the status of parsable files
     """
-    import glob
-    import os
+    from bactopia.inventory import get_inventory, has_dir, has_file, list_dir
+    inventory = inventory if inventory else get_inventory(path, name)
     parsable_results = []
     
     # Check if PLSB results exist
     blast_dir = f"{path}/{name}/{RESULT_TYPE}"
-    if os.path.exists(f"{blast_dir}/{name}-plsdb.txt"):
+    if has_file(inventory, f"{blast_dir}/{name}-plsdb.txt"):
         parsable_results.append({
             'result_name': 'plsdb',
             'files': [f"{blast_dir}/{name}-plsdb.txt"],
             'optional': True,
-            'missing': False if os.path.exists(f"{blast_dir}/{name}-plsdb.txt") else True
+            'missing': False
         })
     else:
         parsable_results.append({
             'result_name': 'plsdb',
             'files': [f"{blast_dir}/{name}-plsdb.json"],
             'optional': True,
-            'missing': False if os.path.exists(f"{blast_dir}/{name}-plsdb.json") else True
+            'missing': not has_file(inventory, f"{blast_dir}/{name}-plsdb.json")
         })
 
     for blast_type in ['genes', 'proteins', 'primers']:
         blast_dir = f"{path}/{name}/{RESULT_TYPE}/{blast_type}"
-        if os.path.exists(blast_dir):
-            for blast_result in glob.glob(f'{blast_dir}/*.json'):
-                result_name = f"{blast_type}-{os.path.basename(blast_result)}"
+        if has_dir(inventory, blast_dir):
+            for blast_result in list_dir(inventory, blast_dir, extension='.json'):
+                result_name = f"{blast_type}-{blast_result}"
                 parsable_results.append({
                     'result_name': result_name,
-                    'files': [blast_result],
+                    'files': [f"{blast_dir}/{blast_result}"],
                     'optional': True,
                     'missing': False
                 })
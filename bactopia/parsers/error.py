@@ -13,6 +13,16 @@ ERROR_TYPES = [
     "paired-end",
 ]
 
+ERROR_DESCRIPTIONS = {
+    "genome-size-error": "Poor estimate of genome size",
+    "low-read-count-error": "Low number of reads",
+    "low-sequence-depth-error": "Low depth of sequencing",
+    "paired-end-error": "Paired-end reads were not in acceptable format",
+    "different-read-count-error": "Paired-end read count mismatch",
+    "low-basepair-proportion-error": "Paired-end basepair counts are out of accesptable proportions",
+    "assembly-error": "Assembled size was not withing an acceptable range"
+}
+
 
 def parse(filename: str) -> dict:
     """
@@ -25,22 +35,9 @@ def parse(filename: str) -> dict:
         list: observed error and a brief description
     """
     filetype = get_file_type(ACCEPTED_FILES, filename)
-    error = filename
-
-    if error.endswith("genome-size-error.txt"):
-        return _format_error(["genome-size-error", "Poor estimate of genome size"])
-    elif error.endswith("low-read-count-error.txt"):
-        return _format_error(["low-read-count-error", "Low number of reads"])
-    elif error.endswith("low-sequence-depth-error.txt"):
-        return _format_error(["low-sequence-depth-error", "Low depth of sequencing"])
-    elif error.endswith("paired-end-error.txt"):
-        return _format_error(["paired-end-error", "Paired-end reads were not in acceptable format"])
-    elif error.endswith("different-read-count-error.txt"):
-        return _format_error(["different-read-count-error", "Paired-end read count mismatch"])
-    elif error.endswith("low-basepair-proportion-error.txt"):
-        return _format_error(["low-basepair-proportion-error", "Paired-end basepair counts are out of accesptable proportions"])
-    elif error.endswith("assembly-error.txt"):
-        return _format_error(["assembly-error", "Assembled size was not withing an acceptable range"])
+    for error_type, description in ERROR_DESCRIPTIONS.items():
+        if filename.endswith(f"{error_type}.txt"):
+            return _format_error([error_type, description])
     return _format_error(["unknown-error", "Unknown Error"])
 
 
@@ -1,7 +1,12 @@
 """
 Shared functions used by parsers.
 """
+import re
 from typing import Union
+NUMBERS = [
+    [int, re.compile(r'-?(0|[1-9][0-9]*)')],
+    [float, re.compile(r'-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][+-]?[0-9]+)?')]
+]
 
 
 def get_file_type(extensions: list, filename: str) -> str:
@@ -25,7 +30,7 @@ def get_file_type(extensions: list, filename: str) -> str:
     raise ValueError(f"'{filename}' is not an accepted result file. Accepted extensions: {', '.join(extensions)}")
 
 
-def parse_table(csvfile: str, delimiter: str = '\t', has_header: bool = True) -> Union[list, dict]:
+def parse_table(csvfile: str, delimiter: str = '\t', has_header: bool = True, max_rows: int = None) -> Union[list, dict]:
     """
     Parse a delimited file.
 
@@ -33,28 +38,159 @@ def parse_table(csvfile: str, delimiter: str = '\t', has_header: bool = True) ->
         csvfile (str): input delimited file to be parsed
         delimiter (str, optional): delimter used to separate column values. Defaults to '\t'.
         has_header (bool, optional): the first line should be treated as a header. Defaults to True.
+        max_rows (int, optional): stop after reading this many rows (excluding the header). Defaults to None.
 
     Returns:
         Union[list, dict]: A dict is returned if a header is present, otherwise a list is returned
     """
     import csv
-    data = []
+    from itertools import islice
     with open(csvfile, 'rt') as fh:
-        for row in csv.DictReader(fh, delimiter=delimiter) if has_header else csv.reader(fh, delimiter=delimiter):
-            data.append(row)
-    return data
+        reader = csv.DictReader(fh, delimiter=delimiter) if has_header else csv.reader(fh, delimiter=delimiter)
+        return list(islice(reader, max_rows))
 
 
-def parse_json(jsonfile: str) -> Union[list, dict]:
+def read_table(csvfile: str, delimiter: str = '\t', max_rows: int = None, typed: bool = False) -> 'Table':
+    """
+    Parse a delimited file with a header into columns.
+
+    Args:
+        csvfile (str): input delimited file to be parsed
+        delimiter (str, optional): delimter used to separate column values. Defaults to '\t'.
+        max_rows (int, optional): stop after reading this many rows (excluding the header). Defaults to None.
+        typed (bool, optional): convert numeric columns to int or float. Defaults to False.
+
+    Returns:
+        Table: the header and column values of the file
+    """
+    import csv
+    from itertools import islice
+    with open(csvfile, 'rt') as fh:
+        reader = csv.reader(fh, delimiter=delimiter)
+        header = next(reader, [])
+        # Like csv.DictReader, blank lines are not rows
+        rows = list(islice((row for row in reader if row), max_rows))
+
+    extra = {}
+    total_columns = len(header)
+    for i, row in enumerate(rows):
+        if len(row) != total_columns:
+            # Like csv.DictReader, missing values are None and additional values are kept under None
+            if len(row) > total_columns:
+                extra[i] = row[total_columns:]
+            rows[i] = row[:total_columns] + [None] * (total_columns - len(row))
+
+    columns = [list(column) for column in zip(*rows)] if rows else [[] for _ in header]
+    if typed:
+        columns = [_convert_column(column) for column in columns]
+    return Table(header, columns, extra=extra)
+
+
+def _convert_column(values: list) -> list:
+    """
+    Convert the values of a column to int, or float, if every (non-empty) value is a plain number.
+
+    Values with a leading zero (e.g. '007'), separators or surrounding whitespace are identifiers rather
+    than numbers, so their column is kept as strings.
+
+    Args:
+        values (list): the string values of a column
+
+    Returns:
+        list: the converted values (empty values become None), or the original values
+    """
+    for converter, pattern in NUMBERS:
+        if all(pattern.fullmatch(value) for value in values if value):
+            return [converter(value) if value else None for value in values]
+    return values
+
+
+class Table:
+    """
+    The column oriented contents of a delimited file, with the header stored once.
+
+    Rows are available as dicts (like csv.DictReader) for compatibility.
+    """
+    def __init__(self, header: list, columns: list, extra: dict = None):
+        """
+        Args:
+            header (list): the column names
+            columns (list): the values of each column, in the order of the header
+            extra (dict, optional): row index: values beyond the header. Defaults to None.
+        """
+        self.header = header
+        self.columns = columns
+        self._extra = extra if extra else {}
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def __getitem__(self, index: int) -> dict:
+        return self.row(index)
+
+    def __iter__(self):
+        return (self.row(i) for i in range(len(self)))
+
+    def column(self, name: str) -> list:
+        """
+        Get the values of a column.
+
+        Args:
+            name (str): the column name
+
+        Returns:
+            list: the values of the column
+        """
+        return self.columns[len(self.header) - 1 - self.header[::-1].index(name)]
+
+    def row(self, index: int) -> dict:
+        """
+        Get a row of the table.
+
+        Args:
+            index (int): the position of the row
+
+        Raises:
+            IndexError: the row does not exist
+
+        Returns:
+            dict: column name: value
+        """
+        total = len(self)
+        if index < 0:
+            index += total
+        if not 0 <= index < total:
+            raise IndexError("Table row index out of range")
+
+        row = dict(zip(self.header, [column[index] for column in self.columns]))
+        if index in self._extra:
+            row[None] = self._extra[index]
+        return row
+
+    def to_rows(self) -> list:
+        """
+        Convert the table to a list of row dicts.
+
+        Returns:
+            list: a dict (column name: value) for each row
+        """
+        return [self.row(i) for i in range(len(self))]
+
+
+def parse_json(jsonfile: str, raw: bool = False) -> Union[list, dict, bytes]:
     """
     Parse a JSON file.
 
     Args:
         jsonfile (str): input JSON file to be read
+        raw (bool, optional): return the undecoded JSON (a RawJSON), which json_backend.dumps
+            writes as is. Defaults to False.
 
     Returns:
-        Union[list, dict]: the values oarsed from the JSON file
+        Union[list, dict, bytes]: the values oarsed from the JSON file
     """
-    import json
-    with open(jsonfile, 'rt') as fh:
-        return json.load(fh)
+    if raw:
+        from bactopia.json_backend import read_raw
+        return read_raw(jsonfile)
+    from bactopia.json_backend import loads_file
+    return loads_file(jsonfile)
@@ -1,24 +1,44 @@
 """
 Parsers for Mapping related results.
 """
+from typing import Iterator
 from .generic import get_file_type
 RESULT_TYPE = 'mapping'
 ACCEPTED_FILES = [".txt"]
+SIDECAR_EXTENSION = ".bcov"
+SIDECAR_MAGIC = b"BCOV\x00\x01\x00\x00"
+CHUNK_SIZE = 65536
+SIDECAR_CHUNK = 262144
 
 
-def parse(filename: str) -> list:
+def parse(filename: str, compact: bool = False, stats: bool = False, window: int = 1000,
+          sidecar: bool = False) -> list:
     """
     Check input file is an accepted file, then select the appropriate parsing method.
 
     Args:
         filename (str): input file to be parsed
+        compact (bool, optional): store per-base coverage as array('I') instead of a list. Defaults to False.
+        stats (bool, optional): only return coverage statistics, not per-base coverage. Defaults to False.
+        window (int, optional): window size (bp) of the windowed depth statistics. Defaults to 1000.
+        sidecar (bool, optional): read per-base coverage from a binary sidecar, writing it if it
+            is missing or stale. Implies compact. Defaults to False.
 
     Returns:
         list: parsed results
     """
     filetype = get_file_type(ACCEPTED_FILES, filename)
     if filetype == ".txt":
-        return _parse_mapping(filename)
+        if sidecar:
+            coverage = open_sidecar(filename)
+            if coverage:
+                with coverage:
+                    if stats:
+                        return _parse_sidecar_stats(coverage, window=window)
+                    return coverage.to_list()
+        if stats:
+            return _parse_mapping_stats(filename, window=window)
+        return _parse_mapping_compact(filename) if compact else _parse_mapping(filename)
 
 
 def _parse_mapping(filename: str) -> list:
@@ -44,7 +64,6 @@ def _parse_mapping(filename: str) -> list:
     with open(filename, 'rt') as fh:
         per_base_coverage = []
         name = None
-        current_results = {}
         for line in fh:
             line = line.rstrip()
             if line:
@@ -54,7 +73,7 @@ def _parse_mapping(filename: str) -> list:
                     if name:
                         # This is not the first time
                         results.append({"name": name, "per_base_coverage": per_base_coverage})
-                        per_base_coverage.clear()
+                        per_base_coverage = []
                         name = None
                     name = line.replace("##", '')
                 else:
@@ -65,28 +84,535 @@ def _parse_mapping(filename: str) -> list:
     return results
 
 
-def get_parsable_list(path: str, name: str) -> list:
+def _iter_coverage(filename: str, chunk_size: int = CHUNK_SIZE) -> Iterator[list]:
+    """
+    Stream a per-base mapping summary as contig headers and bounded batches of depths.
+
+    The file is read chunk_size bytes at a time (cut at line ends), so no more than a
+    chunk of text, and its depths, is held at once.
+
+    Args:
+        filename (str): input file to be parsed
+        chunk_size (int, optional): bytes of text converted at a time. Defaults to CHUNK_SIZE.
+
+    Yields:
+        Iterator[list]: ['contig', name] at the start of each contig, and ['depths', array('I')]
+            for each batch of consecutive depths of the current contig
+    """
+    from array import array
+    with open(filename, 'rb') as fh:
+        pending = b''
+        while True:
+            data = fh.read(chunk_size)
+            if data:
+                buffer = pending + data if pending else data
+                cut = buffer.rfind(b'\n') + 1
+                if not cut:
+                    # No complete line yet
+                    pending = buffer
+                    continue
+                buffer, pending = buffer[:cut], buffer[cut:]
+            elif pending:
+                buffer, pending = pending, b''
+            else:
+                break
+
+            position = 0
+            while position < len(buffer):
+                header = buffer.find(b'##', position)
+                end = len(buffer) if header == -1 else header
+                if end > position:
+                    depths = array('I', map(int, buffer[position:end].split()))
+                    if depths:
+                        yield ['depths', depths]
+                if header == -1:
+                    break
+
+                header_end = buffer.find(b'\n', header)
+                header_end = len(buffer) if header_end == -1 else header_end
+                line = buffer[header:header_end].decode().rstrip()
+                if line.startswith('##contig'):
+                    yield ['contig', line.replace("##", '')]
+                position = header_end + 1
+
+
+def _parse_mapping_compact(filename: str) -> list:
+    """
+    Parse per-base mapping summary text file, storing coverages in unsigned int arrays.
+
+    Args:
+        filename (str): input file to be parsed
+
+    Returns:
+        list: the per-base coverage (array('I')) results per reference
+    """
+    from array import array
+    results = []
+    for kind, value in _iter_coverage(filename):
+        if kind == 'contig':
+            results.append({"name": value, "per_base_coverage": array('I')})
+        else:
+            if not results:
+                results.append({"name": None, "per_base_coverage": array('I')})
+            results[-1]["per_base_coverage"].extend(value)
+
+    if not results:
+        results.append({"name": None, "per_base_coverage": array('I')})
+    return results
+
+
+def _parse_mapping_stats(filename: str, window: int = 1000) -> list:
+    """
+    Calculate coverage statistics for each reference, without keeping per-base coverage.
+
+    The file is streamed in bounded batches of depths (see _iter_coverage), NumPy is used
+    to reduce each batch if it is available.
+
+    Args:
+        filename (str): input file to be parsed
+        window (int, optional): window size (bp) of the windowed depth. Defaults to 1000.
+
+    Returns:
+        list: the coverage statistics per reference (length, mean_depth, median_depth,
+            breadth_1x, breadth_10x and windowed_depth)
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    results = []
+    current = None
+    for kind, value in _iter_coverage(filename):
+        if kind == 'contig':
+            if current:
+                results.append(_finish_stats(current, window))
+            current = _new_stats(value)
+        else:
+            if not current:
+                current = _new_stats(None)
+            _add_depths(current, value, window, np=np)
+    results.append(_finish_stats(current if current else _new_stats(None), window))
+    return results
+
+
+def _parse_sidecar_stats(coverage: 'CoverageSidecar', window: int = 1000) -> list:
+    """
+    Calculate coverage statistics for each reference, directly from a binary sidecar.
+
+    Args:
+        coverage (CoverageSidecar): an open sidecar of the per-base coverages
+        window (int, optional): window size (bp) of the windowed depth. Defaults to 1000.
+
+    Returns:
+        list: the coverage statistics per reference (see _parse_mapping_stats)
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    results = []
+    for i, name in enumerate(coverage.names):
+        current = _new_stats(name)
+        for start in range(0, coverage.lengths[i], SIDECAR_CHUNK):
+            with coverage.coverage(i, start, start + SIDECAR_CHUNK) as depths:
+                _add_depths(current, depths, window, np=np)
+        results.append(_finish_stats(current, window))
+    return results
+
+
+def _add_depths(current: dict, depths, window: int, np=None) -> None:
+    """
+    Add the depths of consecutive bases to the running totals of a reference.
+
+    Args:
+        current (dict): the running totals of the reference
+        depths (Union[array, memoryview]): unsigned int depths of consecutive bases
+        window (int): window size (bp) of the windowed depth
+        np (module, optional): the numpy module, to reduce the depths in bulk. Defaults to None.
+    """
+    if np is None:
+        for depth in depths:
+            _add_depth(current, depth, window)
+        return None
+
+    values = np.frombuffer(depths, dtype=np.uint32)
+    if not values.size:
+        return None
+    current['total'] += int(values.sum(dtype=np.uint64))
+    current['covered_1x'] += int(np.count_nonzero(values))
+    current['covered_10x'] += int(np.count_nonzero(values >= 10))
+    histogram = current['histogram']
+    for depth, count in zip(*(counts.tolist() for counts in np.unique(values, return_counts=True))):
+        histogram[depth] = histogram.get(depth, 0) + count
+
+    # Complete the open window, then whole windows, then start the next one
+    position = 0
+    filled = current['length'] % window
+    if filled:
+        position = min(window - filled, values.size)
+        current['window_total'] += int(values[:position].sum(dtype=np.uint64))
+        if filled + position == window:
+            current['windows'].append(current['window_total'] / window)
+            current['window_total'] = 0
+    whole = (values.size - position) // window
+    if whole:
+        sums = values[position:position + whole * window].reshape(whole, window).sum(axis=1, dtype=np.uint64)
+        current['windows'].extend((sums / window).tolist())
+        position += whole * window
+    if position < values.size:
+        current['window_total'] += int(values[position:].sum(dtype=np.uint64))
+    current['length'] += int(values.size)
+
+
+def _add_depth(current: dict, depth: int, window: int) -> None:
+    """
+    Add the depth of a single base to the running totals of a reference.
+
+    Args:
+        current (dict): the running totals of the reference
+        depth (int): the depth of the base
+        window (int): window size (bp) of the windowed depth
+    """
+    current['length'] += 1
+    current['total'] += depth
+    current['covered_1x'] += 1 if depth >= 1 else 0
+    current['covered_10x'] += 1 if depth >= 10 else 0
+    current['histogram'][depth] = current['histogram'].get(depth, 0) + 1
+    current['window_total'] += depth
+    if current['length'] % window == 0:
+        current['windows'].append(current['window_total'] / window)
+        current['window_total'] = 0
+
+
+def _new_stats(name: str) -> dict:
+    """
+    Start the running totals of a reference.
+
+    Args:
+        name (str): the name of the reference
+
+    Returns:
+        dict: empty running totals
+    """
+    return {
+        'name': name, 'length': 0, 'total': 0, 'covered_1x': 0, 'covered_10x': 0,
+        'histogram': {}, 'window_total': 0, 'windows': []
+    }
+
+
+def _finish_stats(current: dict, window: int) -> dict:
+    """
+    Convert the running totals of a reference to coverage statistics.
+
+    Args:
+        current (dict): the running totals of the reference
+        window (int): window size (bp) of the windowed depth
+
+    Returns:
+        dict: the coverage statistics of the reference
+    """
+    if current['length'] % window:
+        current['windows'].append(current['window_total'] / (current['length'] % window))
+    return _format_stats(
+        current['name'], current['length'], current['total'], current['covered_1x'],
+        current['covered_10x'], current['histogram'], current['windows']
+    )
+
+
+def _format_stats(name: str, length: int, total: int, covered_1x: int, covered_10x: int,
+                  histogram: dict, windows: list) -> dict:
+    """
+    Build the coverage statistics of a reference.
+
+    Args:
+        name (str): the name of the reference
+        length (int): total number of bases
+        total (int): sum of the per-base depths
+        covered_1x (int): number of bases with at least 1x depth
+        covered_10x (int): number of bases with at least 10x depth
+        histogram (dict): depth: number of bases with that depth
+        windows (list): the mean depth of each window
+
+    Returns:
+        dict: the coverage statistics of the reference
+    """
+    median = None
+    if length:
+        # Median from the depth histogram, the mean of the middle values for even lengths
+        middle = [(length - 1) // 2, length // 2]
+        values = []
+        seen = 0
+        for depth in sorted(histogram):
+            seen += histogram[depth]
+            while middle and middle[0] < seen:
+                values.append(depth)
+                middle.pop(0)
+        median = (values[0] + values[1]) / 2
+
+    return {
+        "name": name,
+        "length": length,
+        "mean_depth": total / length if length else None,
+        "median_depth": median,
+        "breadth_1x": covered_1x / length if length else None,
+        "breadth_10x": covered_10x / length if length else None,
+        "windowed_depth": windows
+    }
+
+
+class CoverageSidecar:
+    """
+    A memory-mapped binary copy of a per-base mapping summary.
+
+    Format (all integers little-endian, except depths which use the byte order in the header):
+        8 bytes: SIDECAR_MAGIC
+        uint64, uint64: size and mtime (ns) of the text file the sidecar was built from
+        uint32: length of the header
+        header: JSON with the byte order and a [name, length] pair for each contig
+        padding: to a multiple of 4 bytes
+        uint32 * total length: the depth of each base, contigs in order
+
+    Example: with CoverageSidecar(sidecar) as coverage: region = coverage.coverage(0, 100, 200)
+    """
+    def __init__(self, sidecar: str):
+        """
+        Args:
+            sidecar (str): the binary sidecar to open
+
+        Raises:
+            ValueError: the file is not a coverage sidecar, uses a different byte order, or is truncated
+        """
+        import json
+        import mmap
+        import struct
+        import sys
+        self.sidecar = sidecar
+        with open(sidecar, 'rb') as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(SIDECAR_MAGIC)] != SIDECAR_MAGIC:
+            self._mm.close()
+            raise ValueError(f"'{sidecar}' is not a coverage sidecar")
+        offset = len(SIDECAR_MAGIC)
+        self.source_size, self.source_mtime, header_size = struct.unpack_from('<QQI', self._mm, offset)
+        offset += struct.calcsize('<QQI')
+        header = json.loads(self._mm[offset:offset + header_size].decode())
+        if header['byteorder'] != sys.byteorder:
+            self._mm.close()
+            raise ValueError(f"'{sidecar}' was written with a different byte order ({header['byteorder']})")
+
+        offset += header_size
+        offset += -offset % 4
+        self.names = []
+        self.lengths = []
+        self._offsets = []
+        for name, length in header['contigs']:
+            self.names.append(name)
+            self.lengths.append(length)
+            self._offsets.append(offset)
+            offset += length * 4
+        if self._mm.size() != offset:
+            self._mm.close()
+            raise ValueError(
+                f"'{sidecar}' is truncated or corrupt, expected {offset} bytes but found {self._mm.size()}"
+            )
+        self._depths = memoryview(self._mm).cast('I')
+
+    def _index(self, contig) -> int:
+        """
+        Get the position of a contig, by its name or position.
+
+        Args:
+            contig (Union[int, str]): the name or position of the contig
+
+        Returns:
+            int: the position of the contig
+        """
+        return contig if isinstance(contig, int) else self.names.index(contig)
+
+    def coverage(self, contig, start: int = 0, end: int = None) -> memoryview:
+        """
+        Get the per-base coverage of a contig or region, without copying it.
+
+        Args:
+            contig (Union[int, str]): the name or position of the contig
+            start (int, optional): 0-based start of the region. Defaults to 0.
+            end (int, optional): 0-based, exclusive, end of the region. Defaults to None (end of the contig).
+
+        Returns:
+            memoryview: the depths (unsigned int) of each base, release it before closing the sidecar
+        """
+        i = self._index(contig)
+        length = self.lengths[i]
+        start, end, _ = slice(start, end).indices(length)
+        first = self._offsets[i] // 4
+        return self._depths[first + start:first + max(start, end)]
+
+    def to_list(self) -> list:
+        """
+        Copy all per-base coverages out of the sidecar.
+
+        Returns:
+            list: the per-base coverage (array('I')) results per reference
+        """
+        from array import array
+        results = []
+        for i, name in enumerate(self.names):
+            with self.coverage(i) as depths, depths.cast('B') as raw:
+                per_base_coverage = array('I')
+                per_base_coverage.frombytes(raw)
+            results.append({"name": name, "per_base_coverage": per_base_coverage})
+        return results
+
+    def close(self) -> None:
+        """
+        Close the memory-mapped sidecar.
+        """
+        self._depths.release()
+        self._mm.close()
+
+    def __enter__(self) -> 'CoverageSidecar':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def get_sidecar_name(filename: str) -> str:
+    """
+    Get the binary sidecar associated with a per-base mapping summary.
+
+    Args:
+        filename (str): the per-base mapping summary
+
+    Returns:
+        str: the path to the sidecar
+    """
+    return f"{filename}{SIDECAR_EXTENSION}"
+
+
+def write_sidecar(filename: str, sidecar: str = None) -> str:
+    """
+    Convert a per-base mapping summary to a binary sidecar.
+
+    Args:
+        filename (str): input file to be converted
+        sidecar (str, optional): the sidecar to write. Defaults to None (see get_sidecar_name).
+
+    Returns:
+        str: the path to the sidecar
+    """
+    import json
+    import os
+    import shutil
+    import struct
+    import sys
+    sidecar = sidecar if sidecar else get_sidecar_name(filename)
+    stat = os.stat(filename)
+    tmp_sidecar = f"{sidecar}.{os.getpid()}.tmp"
+    tmp_depths = f"{sidecar}.{os.getpid()}.depths.tmp"
+    try:
+        # The header needs every contig length, so depths are streamed to a separate file first
+        contigs = []
+        with open(tmp_depths, 'wb') as fh:
+            for kind, value in _iter_coverage(filename):
+                if kind == 'contig':
+                    contigs.append([value, 0])
+                else:
+                    if not contigs:
+                        contigs.append([None, 0])
+                    contigs[-1][1] += len(value)
+                    value.tofile(fh)
+        if not contigs:
+            contigs.append([None, 0])
+
+        header = json.dumps({'byteorder': sys.byteorder, 'contigs': contigs}).encode()
+        offset = len(SIDECAR_MAGIC) + struct.calcsize('<QQI') + len(header)
+        with open(tmp_sidecar, 'wb') as fh, open(tmp_depths, 'rb') as depths_fh:
+            fh.write(SIDECAR_MAGIC)
+            fh.write(struct.pack('<QQI', stat.st_size, stat.st_mtime_ns, len(header)))
+            fh.write(header)
+            fh.write(b'\x00' * (-offset % 4))
+            shutil.copyfileobj(depths_fh, fh)
+        os.replace(tmp_sidecar, sidecar)
+    finally:
+        for tmp_file in [tmp_depths, tmp_sidecar]:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+    return sidecar
+
+
+def open_sidecar(filename: str) -> 'CoverageSidecar':
+    """
+    Open the binary sidecar of a per-base mapping summary, writing it first if it is missing or stale.
+
+    Args:
+        filename (str): the per-base mapping summary
+
+    Returns:
+        CoverageSidecar: the open sidecar, None if it could not be written (e.g. a read-only directory)
+    """
+    import os
+    from array import array
+    if array('I').itemsize != 4:
+        return None
+
+    sidecar = get_sidecar_name(filename)
+    stat = os.stat(filename)
+    if os.path.exists(sidecar):
+        try:
+            coverage = CoverageSidecar(sidecar)
+            if coverage.source_size == stat.st_size and coverage.source_mtime == stat.st_mtime_ns:
+                return coverage
+            coverage.close()
+        except (ValueError, OSError):
+            pass
+
+    try:
+        return CoverageSidecar(write_sidecar(filename, sidecar=sidecar))
+    except OSError:
+        return None
+
+
+def coverage_to_list(results: list) -> list:
+    """
+    Convert compact per-base coverages to lists (e.g. for JSON output).
+
+    Args:
+        results (list): the per-base coverage results per reference
+
+    Returns:
+        list: the per-base coverage results with coverages as lists
+    """
+    return [
+        {**result, "per_base_coverage": list(result["per_base_coverage"])} for result in results
+    ]
+
+
+def get_parsable_list(path: str, name: str, inventory: dict = None) -> list:
     """
     Generate a list of parsable files.
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        inventory (dict, optional): a pre-built inventory of the sample's files. Defaults to None.
 
     Returns:
         list: information about the status of parsable files
     """
-    import glob
-    import os
+    from bactopia.inventory import get_inventory, has_dir, list_dir
+    inventory = inventory if inventory else get_inventory(path, name)
     parsable_results = []
 
     mapping_dir = f"{path}/{name}/{RESULT_TYPE}"
-    if os.path.exists(mapping_dir):
-        for mapping_stats in glob.glob(f'{mapping_dir}/*.txt'):
-            result_name = f"{os.path.basename(mapping_stats)}"
+    if has_dir(inventory, mapping_dir):
+        for mapping_stats in list_dir(inventory, mapping_dir, extension='.txt'):
             parsable_results.append({
-                'result_name': result_name,
-                'files': [mapping_stats],
+                'result_name': mapping_stats,
+                'files': [f"{mapping_dir}/{mapping_stats}"],
                 'optional': True,
                 'missing': False
             })
@@ -75,18 +75,20 @@ def _parse_sourmash(filename: str) -> dict:
     return data
 
 
-def get_parsable_list(path: str, name: str) -> list:
+def get_parsable_list(path: str, name: str, inventory: dict = None) -> list:
     """
     Generate a list of parsable files.
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        inventory (dict, optional): a pre-built inventory of the sample's files. Defaults to None.
 
     Returns:
         list: information about the status of parsable files
     """
-    import os
+    from bactopia.inventory import get_inventory, has_file
+    inventory = inventory if inventory else get_inventory(path, name)
     parsable_results = []
     for result in ACCEPTED_FILES:
         result_name = None
@@ -101,7 +103,7 @@ def get_parsable_list(path: str, name: str) -> list:
             'result_name': result_name,
             'files': [filename],
             'optional': True,
-            'missing': False if os.path.exists(filename) else True
+            'missing': not has_file(inventory, filename)
         })
 
     return parsable_results
@@ -6,56 +6,56 @@ RESULT_TYPE = 'mlst'
 ACCEPTED_FILES = ["blast.json", "mlst_report.tsv"]
 
 
-def parse(filename: str) -> dict:
+def parse(filename: str, raw: bool = False) -> dict:
     """
     Check input file is an accepted file, then select the appropriate parsing method.
 
     Args:
         filename (str): input file to be parsed
+        raw (bool, optional): return blast.json undecoded, to be written as is (see parse_json). Defaults to False.
 
     Returns:
         dict: parsed results
     """
     filetype = get_file_type(ACCEPTED_FILES, filename)
     if filetype == "blast.json":
-        return parse_json(filename)
+        return parse_json(filename, raw=raw)
     elif filetype == "mlst_report.tsv":
-        return parse_table(filename)[0]
+        return parse_table(filename, max_rows=1)[0]
 
 
-def get_parsable_list(path: str, name: str) -> list:
+def get_parsable_list(path: str, name: str, inventory: dict = None) -> list:
     """
     Generate a list of parsable files.
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        inventory (dict, optional): a pre-built inventory of the sample's files. Defaults to None.
 
     Returns:
         list: information about the status of parsable files
     """
-    import os
+    from bactopia.inventory import get_inventory, has_dir, has_file, list_dir
+    inventory = inventory if inventory else get_inventory(path, name)
     parsable_results = []
     mlst_dir = f"{path}/{name}/{RESULT_TYPE}"
-    if os.path.exists(mlst_dir):
-        with os.scandir(mlst_dir) as dirs:
-            for schema_dir in dirs:
-                schema = schema_dir.name
-                missing = True
-                blast = f"{mlst_dir}/{schema}/blast/{name}-blast.json"
-                parsable_results.append({
-                    'result_name': f"{schema}-blast",
-                    'files': [blast],
-                    'optional': True,
-                    'missing': False if os.path.exists(blast) else True
-                })
-
-                ariba = f"{mlst_dir}/{schema}/ariba/mlst_report.tsv"
-                parsable_results.append({
-                    'result_name': f"{schema}-ariba",
-                    'files': [ariba],
-                    'optional': True,
-                    'missing': False if os.path.exists(ariba) else True
-                })
+    if has_dir(inventory, mlst_dir):
+        for schema in list_dir(inventory, mlst_dir):
+            blast = f"{mlst_dir}/{schema}/blast/{name}-blast.json"
+            parsable_results.append({
+                'result_name': f"{schema}-blast",
+                'files': [blast],
+                'optional': True,
+                'missing': not has_file(inventory, blast)
+            })
+
+            ariba = f"{mlst_dir}/{schema}/ariba/mlst_report.tsv"
+            parsable_results.append({
+                'result_name': f"{schema}-ariba",
+                'files': [ariba],
+                'optional': True,
+                'missing': not has_file(inventory, ariba)
+            })
 
     return parsable_results
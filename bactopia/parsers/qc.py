@@ -1,19 +1,20 @@
 """
 Parsers for QC (FASTQ) related results.
 """
-import os
 from .generic import get_file_type, parse_json
 RESULT_TYPE = 'quality-control'
 ACCEPTED_FILES = ["final.json", "original.json"]
 
 
-def parse(r1: str, r2: str = None) -> dict:
+def parse(r1: str, r2: str = None, raw: bool = False) -> dict:
     """
     Check input file is an accepted file, then select the appropriate parsing method.
 
     Args:
         r1 (str): input file associated with R1 or SE FASTQ
         r2 (str, optional): input file associated with R2 FASTQ. Defaults to None.
+        raw (bool, optional): return single-end results undecoded, to be written as is (see
+            parse_json). Paired-end results are always decoded to be merged. Defaults to False.
 
     Raises:
         ValueError: summary results to not have a matching origin (e.g. original vs final FASTQ)
@@ -29,7 +30,7 @@ def parse(r1: str, r2: str = None) -> dict:
     if r1.endswith(".json"):
         if r2 and filetype != filetype2:
             raise ValueError(f"Original and Final QC files were mixed. R1: {filetype}, R2: {filetype2}")
-        return _merge_qc_stats(parse_json(r1), parse_json(r2)) if r2 else parse_json(r1)
+        return _merge_qc_stats(parse_json(r1), parse_json(r2)) if r2 else parse_json(r1, raw=raw)
 
 
 def _merge_qc_stats(r1: dict, r2: dict) -> dict:
@@ -61,13 +62,14 @@ def _merge_qc_stats(r1: dict, r2: dict) -> dict:
     return merged
 
 
-def is_paired(path: str, name: str) -> bool:
+def is_paired(path: str, name: str, inventory: dict = None) -> bool:
     """
     Check if in input sample had paired-end or single-end reads
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        inventory (dict, optional): a pre-built inventory of the sample's files. Defaults to None.
 
     Raises:
         ValueError: Processed FASTQ(s) could not be found.
@@ -75,29 +77,33 @@ def is_paired(path: str, name: str) -> bool:
     Returns:
         bool: True: reads are paired, False: reads are single-end
     """
+    from bactopia.inventory import get_inventory, has_file
+    inventory = inventory if inventory else get_inventory(path, name)
     r1 = f"{path}/{name}/quality-control/{name}_R1.fastq.gz"
     r2 = f"{path}/{name}/quality-control/{name}_R2.fastq.gz"
     se = f"{path}/{name}/quality-control/{name}.fastq.gz"
-    if os.path.exists(r1) and os.path.exists(r2):
+    if has_file(inventory, r1) and has_file(inventory, r2):
         return True
-    elif os.path.exists(se):
+    elif has_file(inventory, se):
         return False
     else:
         raise ValueError(f"Processed FASTQs not found in {path}/{name}/quality-control/")
  
 
-def get_parsable_list(path: str, name: str) -> list:
+def get_parsable_list(path: str, name: str, inventory: dict = None) -> list:
     """
     Generate a list of parsable files.
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        inventory (dict, optional): a pre-built inventory of the sample's files. Defaults to None.
 
     Returns:
         list: information about the status of parsable files
     """
-    import os
+    from bactopia.inventory import get_inventory, has_file
+    inventory = inventory if inventory else get_inventory(path, name)
     parsable_results = []
     for result in ACCEPTED_FILES:
         result_name = None
@@ -118,7 +124,7 @@ def get_parsable_list(path: str, name: str) -> list:
             se = f"{path}/{name}/{RESULT_TYPE}/summary-final/{name}-{result}"
 
         if (se):
-            if os.path.exists(se):
+            if has_file(inventory, se):
                 parsable_results.append({
                     'result_name': result_name,
                     'files': [se],
@@ -127,7 +133,7 @@ def get_parsable_list(path: str, name: str) -> list:
                 })
             else:
                 missing = True
-                if os.path.exists(r1) and os.path.exists(r2):
+                if has_file(inventory, r1) and has_file(inventory, r2):
                     missing = False
                 parsable_results.append({
                     'result_name': result_name,
@@ -45,39 +45,40 @@ def _parse_variants(filename: str) -> dict:
     return results
 
 
-def get_parsable_list(path: str, name: str) -> list:
+def get_parsable_list(path: str, name: str, inventory: dict = None) -> list:
     """
     Generate a list of parsable files.
 
     Args:
         path (str): a path to expected Bactopia results
         name (str): the name of sample to test
+        inventory (dict, optional): a pre-built inventory of the sample's files. Defaults to None.
 
     Returns:
         list: information about the status of parsable files
     """
-    import os
+    from bactopia.inventory import get_inventory, has_dir, has_file, list_dir
+    inventory = inventory if inventory else get_inventory(path, name)
     parsable_results = []
     for variant_source in ['auto', 'user']:
         variant_dir = f"{path}/{name}/{RESULT_TYPE}/{variant_source}"
-        if os.path.exists(variant_dir):
-            with os.scandir(variant_dir) as dirs:
-                for reference in dirs:
-                    reference_dir = f"{variant_dir}/{reference}"
-                    for result in ACCEPTED_FILES:
-                        result_name = None
-                        optional = True
-                        filename = None
+        if has_dir(inventory, variant_dir):
+            for reference in list_dir(inventory, variant_dir):
+                reference_dir = f"{variant_dir}/{reference}"
+                for result in ACCEPTED_FILES:
+                    result_name = None
+                    optional = True
+                    filename = None
 
-                        if result.endswith('txt'):
-                            result_name = 'stats'
-                            filename = f"{reference_dir}/{name}.{result}"
+                    if result.endswith('txt'):
+                        result_name = 'stats'
+                        filename = f"{reference_dir}/{name}.{result}"
 
-                        parsable_results.append({
-                            'result_name': result_name,
-                            'files': [filename],
-                            'optional': optional,
-                            'missing': False if os.path.exists(filename) else True
-                        })
+                    parsable_results.append({
+                        'result_name': result_name,
+                        'files': [filename],
+                        'optional': optional,
+                        'missing': not has_file(inventory, filename)
+                    })
 
     return parsable_results
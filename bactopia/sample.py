@@ -0,0 +1,110 @@
+"""
+Lazily parsed results of a sample.
+
+Example: sample = parse_bactopia_files(path, name, lazy=True)
+"""
+from collections import OrderedDict
+from typing import Callable
+
+
+class LazyResults(OrderedDict):
+    """
+    Results of a sample, each result type is parsed on first access and then kept.
+    """
+    def __init__(self, pending: OrderedDict, loader: Callable, options: dict = None):
+        """
+        Args:
+            pending (OrderedDict): result type: list of [result_name, result_key, files] to parse,
+                files is None for optional results which are missing
+            loader (Callable): the function used to parse files (e.g. bactopia.parse.parse)
+            options (dict, optional): result type: keyword arguments passed to the loader. Defaults to None.
+        """
+        super().__init__()
+        self._pending = OrderedDict()
+        self._loader = loader
+        self._options = options if options else {}
+        for result_type, results in pending.items():
+            super().__setitem__(result_type, None)
+            self._pending[result_type] = results
+
+    def _load(self, result_type: str) -> OrderedDict:
+        """
+        Parse all results of a result type.
+
+        Args:
+            result_type (str): the result type to parse
+
+        Returns:
+            OrderedDict: the parsed results of the result type
+        """
+        parsed = OrderedDict()
+        options = self._options.get(result_type, {})
+        for result_name, result_key, files in self._pending[result_type]:
+            parsed[result_name] = self._loader(result_key, *files, **options) if files else {}
+        del self._pending[result_type]
+        super().__setitem__(result_type, parsed)
+        return parsed
+
+    def is_loaded(self, result_type: str) -> bool:
+        """
+        Check if a result type has been parsed.
+
+        Args:
+            result_type (str): the result type to check
+
+        Returns:
+            bool: True if the result type is parsed, otherwise False
+        """
+        return result_type in self and result_type not in self._pending
+
+    def __getitem__(self, result_type: str) -> OrderedDict:
+        if result_type in self._pending:
+            return self._load(result_type)
+        return super().__getitem__(result_type)
+
+    def __setitem__(self, result_type: str, value: OrderedDict) -> None:
+        if result_type in self.__dict__.get('_pending', {}):
+            del self._pending[result_type]
+        super().__setitem__(result_type, value)
+
+    def __eq__(self, other) -> bool:
+        return OrderedDict(self.items()) == other
+
+    def __ne__(self, other) -> bool:
+        return not self == other
+
+    def __reduce__(self):
+        return (OrderedDict, (self.items(),))
+
+    def get(self, result_type: str, default=None):
+        return self[result_type] if result_type in self else default
+
+    def pop(self, result_type: str, *default):
+        if result_type in self._pending:
+            self._load(result_type)
+        return super().pop(result_type, *default)
+
+    def items(self) -> list:
+        return [(result_type, self[result_type]) for result_type in self]
+
+    def values(self) -> list:
+        return [self[result_type] for result_type in self]
+
+    def copy(self) -> OrderedDict:
+        return OrderedDict(self.items())
+
+
+class SampleResult(OrderedDict):
+    """
+    The results of a sample, compatible with bactopia.parse.parse_bactopia_files, but with
+    each result type parsed only when it is first accessed.
+    """
+    def load(self) -> 'SampleResult':
+        """
+        Parse every remaining result type.
+
+        Returns:
+            SampleResult: the sample with all results parsed
+        """
+        self['results'].values()
+        return self
@@ -0,0 +1,118 @@
+"""
+A resident parser which answers requests over a Unix domain socket (see bactopia.client).
+
+Example: bactopia.server.serve()
+"""
+import os
+import socketserver
+from bactopia.client import get_socket, is_running
+
+
+def _handle_request(request: dict) -> dict:
+    """
+    Run a single request in the daemon.
+
+    Args:
+        request (dict): the command ('ping', 'parse', 'jsonify' or 'shutdown') and its arguments
+
+    Raises:
+        ValueError: the command is unknown
+
+    Returns:
+        dict: the result of the command
+    """
+    from bactopia import __version__
+    from bactopia.json_backend import write_file
+    from bactopia.parse import parse, parse_bactopia_files
+    command = request.get('command')
+    if command == 'ping':
+        return {'pid': os.getpid(), 'version': __version__}
+    elif command == 'parse':
+        return {'result': parse(request['result_type'], *request['files'], **request.get('options', {}))}
+    elif command == 'jsonify':
+        write_file(request['outfile'], parse_bactopia_files(
+            request['path'], request['name'], threads=request.get('threads', 1), options=request.get('options')
+        ))
+        return {'outfile': request['outfile']}
+    raise ValueError(f"Unknown command '{command}'")
+
+
+class ParserRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Read a JSON request (one line), and reply with a JSON response (one line).
+    """
+    def handle(self):
+        import threading
+        from bactopia.json_backend import dumps, loads
+        line = self.rfile.readline()
+        if not line:
+            return None
+
+        shutdown = False
+        try:
+            request = loads(line)
+            shutdown = request.get('command') == 'shutdown'
+            response = {'status': 'ok'} if shutdown else {'status': 'ok', **_handle_request(request)}
+        except Exception as e:
+            response = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+        self.wfile.write(dumps(response) + b'\n')
+
+        if shutdown:
+            # shutdown() waits for serve_forever to return, so it can not run in the serving thread
+            threading.Thread(target=self.server.shutdown).start()
+
+
+class ParserServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    A threaded Unix socket server, each request is answered in its own thread.
+    """
+    daemon_threads = True
+
+
+def serve(socket_path: str = None, cache: str = None, cache_size: int = None) -> None:
+    """
+    Import every parser, then answer requests until a shutdown request is received.
+
+    Args:
+        socket_path (str, optional): the socket to listen on. Defaults to None (see get_socket).
+        cache (str, optional): enable the persistent parse cache at this path. Defaults to None.
+        cache_size (int, optional): maximum size (in MB) of the cache. Defaults to None (DEFAULT_CACHE_SIZE).
+
+    Raises:
+        OSError: another daemon is already listening on the socket
+    """
+    import logging
+    from bactopia import cache as parse_cache, json_backend, parsers
+    from bactopia.const import RESULT_TYPES
+
+    socket_path = get_socket(socket_path)
+    if os.path.exists(socket_path):
+        if is_running(socket_path):
+            raise OSError(f"A daemon is already listening on {socket_path}")
+        # Left behind by a daemon which did not exit cleanly
+        os.remove(socket_path)
+
+    # Warm up everything a request would otherwise import
+    for result_type in RESULT_TYPES:
+        parsers.get_parser(result_type)
+    json_backend.get_backend()
+    if cache:
+        parse_cache.enable_cache(
+            cache, max_size=cache_size if cache_size else parse_cache.DEFAULT_CACHE_SIZE
+        )
+
+    old_umask = os.umask(0o177)
+    try:
+        server = ParserServer(socket_path, ParserRequestHandler)
+    finally:
+        os.umask(old_umask)
+
+    logging.info(f"Listening on {socket_path} (pid {os.getpid()})")
+    try:
+        with server:
+            server.serve_forever(poll_interval=0.5)
+    finally:
+        parse_cache.disable_cache()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        logging.info(f"Stopped listening on {socket_path}")
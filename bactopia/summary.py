@@ -1,6 +1,135 @@
 from collections import OrderedDict
 from bactopia.parse import parse_bactopia_directory
 
+# The result types (and result names) used by gather_results, None includes all result names
+SUMMARY_RESULTS = OrderedDict((
+    ('annotation', ['stats']),
+    ('assembly', ['stats', 'checkm']),
+    ('minmers', ['refseq-k21', 'genbank-k21', 'genbank-k31', 'genbank-k51']),
+    ('mlst', None),
+    ('quality-control', ['original', 'final'])
+))
+
+
+class ReportWriter:
+    """
+    Spill report rows to a temporary file as samples finish, then write the tab-delimited report
+    in a final pass, so memory does not grow with the number of samples.
+
+    Example: report = ReportWriter(); report.add(row); report.write("bactopia-report.txt")
+    """
+    def __init__(self, tmpdir: str = None):
+        """
+        Args:
+            tmpdir (str, optional): directory for the temporary row store. Defaults to None (system default).
+        """
+        import tempfile
+        self.fields = OrderedDict()
+        self.total = 0
+        self._rows = tempfile.TemporaryFile(mode='w+b', dir=tmpdir)
+
+    def add(self, row: dict) -> None:
+        """
+        Add a row to the report, floats are formatted to 3 decimals.
+
+        Args:
+            row (dict): the unnested results of a sample
+        """
+        import pickle
+        for field in row:
+            if field not in self.fields:
+                self.fields[field] = None
+        pickle.dump(
+            [[field, f"{value:.3f}" if isinstance(value, float) else value] for field, value in row.items()],
+            self._rows, protocol=pickle.HIGHEST_PROTOCOL
+        )
+        self.total += 1
+
+    def __iter__(self):
+        import pickle
+        self._rows.seek(0)
+        for _ in range(self.total):
+            yield dict(pickle.load(self._rows))
+        self._rows.seek(0, 2)
+
+    def write(self, report_file: str) -> None:
+        """
+        Write the report, with a column for every field seen in any row.
+
+        Args:
+            report_file (str): the tab-delimited report to write
+        """
+        import csv
+        with open(report_file, 'w') as fh:
+            if self.total:
+                writer = csv.writer(fh, delimiter='\t', lineterminator='\r\n')
+                writer.writerow(self.fields)
+                for row in self:
+                    writer.writerow([row.get(field, "") for field in self.fields])
+
+    def close(self) -> None:
+        """
+        Remove the temporary row store.
+        """
+        self._rows.close()
+
+
+def write_sqlite(db_file: str, report: ReportWriter, exclusions: list, counts: dict, failed: dict) -> None:
+    """
+    Write the report rows, exclusions and failure categories to an indexed SQLite database.
+
+    Tables:
+        results: one row per processed sample, a column per report field
+        exclusions: sample, status (exclude, qc-fail or missing) and reason
+        failures: category (e.g. failed-cutoff, low-read-count-error) and sample
+        counts: category and total
+
+    Args:
+        db_file (str): the SQLite database to write, replaced if it exists
+        report (ReportWriter): the rows of the report
+        exclusions (list): [sample, status, reason] for each excluded sample
+        counts (dict): category: total number of samples
+        failed (dict): category: samples which failed for that reason
+    """
+    import os
+    import sqlite3
+    if os.path.exists(db_file):
+        os.remove(db_file)
+
+    connection = sqlite3.connect(db_file)
+    fields = list(report.fields)
+    # NUMERIC affinity stores numeric values as numbers, and everything else as text
+    columns = [f'"{field}" {"TEXT" if field in ["sample", "rank", "reason"] else "NUMERIC"}' for field in fields]
+    with connection:
+        connection.execute("CREATE TABLE exclusions (sample TEXT, status TEXT, reason TEXT)")
+        connection.execute("CREATE TABLE failures (category TEXT, sample TEXT)")
+        connection.execute("CREATE TABLE counts (category TEXT PRIMARY KEY, total INTEGER)")
+        connection.executemany("INSERT INTO exclusions VALUES (?, ?, ?)", exclusions)
+        connection.executemany(
+            "INSERT INTO failures VALUES (?, ?)",
+            ([category, sample] for category, samples in sorted(failed.items()) for sample in samples)
+        )
+        connection.executemany("INSERT INTO counts VALUES (?, ?)", sorted(counts.items()))
+        connection.execute("CREATE INDEX exclusions_sample ON exclusions (sample)")
+        connection.execute("CREATE INDEX failures_category ON failures (category)")
+
+        if fields:
+            connection.execute(f"CREATE TABLE results ({', '.join(columns)})")
+            connection.executemany(
+                f"INSERT INTO results VALUES ({', '.join(['?'] * len(fields))})",
+                ([row.get(field) for field in fields] for row in report)
+            )
+            indexed = [
+                field for field in fields
+                if field in ['sample', 'rank', 'checkm_completeness'] or
+                (field.startswith('mlst_') and field.endswith('_st')) or
+                (field.startswith('refseq_') and field.endswith(('_id', '_comment'))) or
+                (field.startswith('genbank_') and field.endswith('_match'))
+            ]
+            for field in indexed:
+                connection.execute(f'CREATE INDEX "results_{field}" ON results ("{field}")')
+    connection.close()
+
 
 def summarize(path: str) -> dict:
     """
@@ -15,6 +144,15 @@ def summarize(path: str) -> dict:
     results = parse_bactopia_directory(path)
 
 
+RANKS = ['gold', 'silver', 'bronze', 'exclude']
+REASONS = [
+    'passed', 'gold-coverage', 'gold-quality', 'gold-length', 'gold-contigs', 'silver-coverage', 'silver-quality',
+    'silver-length', 'silver-contigs', 'single-end', 'bronze-coverage', 'bronze-quality', 'bronze-length',
+    'bronze-contigs', 'min-assembled-size', 'max-assembled-size'
+]
+REASON_BITS = OrderedDict((reason, 1 << i) for i, reason in enumerate(REASONS))
+
+
 def get_rank(cutoff: dict, coverage: float, quality: float, length: int, contigs: int, genome_size: int, is_paired: bool) -> list:
     """
     Determine the rank (gold, silver, bronze, fail) based on user cutoffs.
@@ -31,65 +169,203 @@ def get_rank(cutoff: dict, coverage: float, quality: float, length: int, contigs
     Returns:
         list: the rank and reason for the ranking
     """
-    rank = None
-    reason = []
-    coverage = float(f'{float(coverage):.2f}')
-    quality = float(f'{float(quality):.2f}')
-    length = round(float(f'{float(length):.2f}'))
+    coverage = round(float(coverage), 2)
+    quality = round(float(quality), 2)
+    length = round(round(float(length), 2))
     contigs = int(contigs)
     genome_size = int(genome_size)
-    gold = cutoff['gold']
-    silver = cutoff['silver']
-    bronze = cutoff['bronze']
-
-    if coverage >= gold['coverage'] and quality >= gold['quality'] and length >= gold['length'] and contigs <= gold['contigs'] and is_paired:
-        reason.append('passed all cutoffs')
-        rank = 'gold'
-    elif coverage >= silver['coverage'] and quality >= silver['quality'] and length >= silver['length'] and contigs <= silver['contigs'] and is_paired:
-        if coverage < gold['coverage']:
-            reason.append(f"Low coverage ({coverage:.2f}x, expect >= {gold['coverage']}x)")
-        if quality < gold['quality']:
-            reason.append(f"Poor read quality (Q{quality:.2f}, expect >= Q{gold['quality']})")
-        if length < gold['length']:
-            reason.append(f"Short read length ({length}bp, expect >= {gold['length']} bp)")
-        if contigs > gold['contigs']:
-            reason.append(f"Too many contigs ({contigs}, expect <= {gold['contigs']})")
-        rank = 'silver'
-    elif coverage >= bronze['coverage'] and quality >= bronze['quality'] and length >= bronze['length'] and contigs <= bronze['contigs']:
-        if coverage < silver['coverage']:
-            reason.append(f"Low coverage ({coverage:.2f}x, expect >= {silver['coverage']}x)")
-        if quality < silver['quality']:
-            reason.append(f"Poor read quality (Q{quality:.2f}, expect >= Q{silver['quality']})")
-        if length < silver['length']:
-            reason.append(f"Short read length ({length}bp, expect >= {silver['length']} bp)")
-        if contigs > silver['contigs']:
-            reason.append(f"Too many contigs ({contigs}, expect <= {silver['contigs']})")
-        if not is_paired:
-            reason.append(f"Single-end reads")
-        rank = 'bronze'
-
-    if not rank:
-        rank = 'exclude'
-
-    if coverage < bronze['coverage']:
-        reason.append(f"Low coverage ({coverage:.2f}x, expect >= {bronze['coverage']}x)")
-    if quality < bronze['quality']:
-        reason.append(f"Poor read quality (Q{quality:.2f}, expect >= Q{bronze['quality']})")
-    if length < bronze['length']:
-        reason.append(f"Short read length ({length:.2f}bp, expect >= {bronze['length']} bp)")
-    if contigs > bronze['contigs']:
-        reason.append(f"Too many contigs ({contigs}, expect <= {bronze['contigs']})")
+    rank, reasons = _rank_sample(cutoff, coverage, quality, length, contigs, genome_size, is_paired)
+    return [RANKS[rank], format_reasons(cutoff, reasons, coverage, quality, length, contigs, genome_size)]
 
-    if cutoff['min-assembled-size']:
-        if genome_size < cutoff['min-assembled-size']:
-            reason.append(f"Assembled size is too small ({genome_size} bp, expect <= {cutoff['min-assembled-size']})")
 
+def _rank_sample(cutoff: dict, coverage: float, quality: float, length: int, contigs: int, genome_size: int,
+                 is_paired: bool) -> list:
+    """
+    Determine the rank code and reason bitmask of a single sample, values must already be rounded.
+
+    Args:
+        cutoff (dict): Cutoffs set by users to determine rank
+        coverage (float): Estimated coverage of the sample
+        quality (float): Per-read average quality
+        length (int): Median length of reads
+        contigs (int): Total number of contigs
+        genome_size (int): Genome size of sample used in analysis
+        is_paired (bool): Sample used paired-end reads
+
+    Returns:
+        list: 0 (int): the rank code (see RANKS), 1 (int): the reason bitmask (see REASON_BITS)
+    """
+    reasons = 0
+    tiers = {}
+    for tier in ['gold', 'silver', 'bronze']:
+        tiers[tier] = {
+            'coverage': coverage < cutoff[tier]['coverage'], 'quality': quality < cutoff[tier]['quality'],
+            'length': length < cutoff[tier]['length'], 'contigs': contigs > cutoff[tier]['contigs']
+        }
+
+    if not any(tiers['gold'].values()) and is_paired:
+        rank = 0
+        reasons |= REASON_BITS['passed']
+    elif not any(tiers['silver'].values()) and is_paired:
+        rank = 1
+        for check, failed in tiers['gold'].items():
+            reasons |= REASON_BITS[f'gold-{check}'] if failed else 0
+    elif not any(tiers['bronze'].values()):
+        rank = 2
+        for check, failed in tiers['silver'].items():
+            reasons |= REASON_BITS[f'silver-{check}'] if failed else 0
+        reasons |= REASON_BITS['single-end'] if not is_paired else 0
+    else:
+        rank = 3
+
+    for check, failed in tiers['bronze'].items():
+        reasons |= REASON_BITS[f'bronze-{check}'] if failed else 0
+    if cutoff['min-assembled-size'] and genome_size < cutoff['min-assembled-size']:
+        reasons |= REASON_BITS['min-assembled-size']
+    if cutoff['max-assembled-size'] and genome_size < cutoff['max-assembled-size']:
+        reasons |= REASON_BITS['max-assembled-size']
+    return [rank, reasons]
+
+
+def get_ranks(cutoff: dict, coverage: list, quality: list, length: list, contigs: list, genome_size: list,
+              is_paired: list) -> list:
+    """
+    Determine the rank of many samples at once, from columns of values.
+
+    NumPy is used to compare all samples against each tier at once if it is available, otherwise
+    each sample is ranked in turn. Reasons are kept as bitmasks, use format_reasons to render them.
+
+    Args:
+        cutoff (dict): Cutoffs set by users to determine rank
+        coverage (list): Estimated coverage of each sample
+        quality (list): Per-read average quality of each sample
+        length (list): Median length of reads of each sample
+        contigs (list): Total number of contigs of each sample
+        genome_size (list): Genome size of each sample used in analysis
+        is_paired (list): Each sample used paired-end reads
+
+    Returns:
+        list: 0 (list): the rank code (see RANKS) of each sample, 1 (list): the reason bitmask (see REASON_BITS)
+            of each sample, 2 (dict): the rounded values (coverage, quality, length, contigs, genome_size)
+            used by format_reasons
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    if not np:
+        values = {
+            'coverage': [round(float(v), 2) for v in coverage], 'quality': [round(float(v), 2) for v in quality],
+            'length': [round(round(float(v), 2)) for v in length], 'contigs': [int(v) for v in contigs],
+            'genome_size': [int(v) for v in genome_size]
+        }
+        ranks = []
+        reasons = []
+        for i, paired in enumerate(is_paired):
+            rank, reason = _rank_sample(
+                cutoff, values['coverage'][i], values['quality'][i], values['length'][i], values['contigs'][i],
+                values['genome_size'][i], paired
+            )
+            ranks.append(rank)
+            reasons.append(reason)
+        return [ranks, reasons, values]
+
+    values = {
+        'coverage': _round_column(np, coverage),
+        'quality': _round_column(np, quality),
+        'length': np.round(_round_column(np, length)).astype(np.int64),
+        'contigs': np.asarray(contigs, dtype=np.float64).astype(np.int64),
+        'genome_size': np.asarray(genome_size, dtype=np.float64).astype(np.int64)
+    }
+    is_paired = np.asarray(is_paired, dtype=bool)
+    failed = {}
+    for tier in ['gold', 'silver', 'bronze']:
+        failed[tier] = {
+            'coverage': values['coverage'] < cutoff[tier]['coverage'],
+            'quality': values['quality'] < cutoff[tier]['quality'],
+            'length': values['length'] < cutoff[tier]['length'],
+            'contigs': values['contigs'] > cutoff[tier]['contigs']
+        }
+    passed = {tier: ~np.logical_or.reduce(list(checks.values())) for tier, checks in failed.items()}
+    gold = passed['gold'] & is_paired
+    silver = ~gold & passed['silver'] & is_paired
+    bronze = ~gold & ~silver & passed['bronze']
+    ranks = np.full(is_paired.shape, 3, dtype=np.int8)
+    ranks[bronze] = 2
+    ranks[silver] = 1
+    ranks[gold] = 0
+
+    reasons = np.where(gold, REASON_BITS['passed'], 0).astype(np.int64)
+    for check in ['coverage', 'quality', 'length', 'contigs']:
+        reasons |= np.where(silver & failed['gold'][check], REASON_BITS[f'gold-{check}'], 0)
+        reasons |= np.where(bronze & failed['silver'][check], REASON_BITS[f'silver-{check}'], 0)
+        reasons |= np.where(failed['bronze'][check], REASON_BITS[f'bronze-{check}'], 0)
+    reasons |= np.where(bronze & ~is_paired, REASON_BITS['single-end'], 0)
+    if cutoff['min-assembled-size']:
+        reasons |= np.where(values['genome_size'] < cutoff['min-assembled-size'], REASON_BITS['min-assembled-size'], 0)
     if cutoff['max-assembled-size']:
-        if genome_size < cutoff['max-assembled-size']:
-            reason.append(f"Assembled size is too large ({genome_size} bp, expect <= {cutoff['max-assembled-size']})")
+        reasons |= np.where(values['genome_size'] < cutoff['max-assembled-size'], REASON_BITS['max-assembled-size'], 0)
+    return [ranks.tolist(), reasons.tolist(), {key: value.tolist() for key, value in values.items()}]
+
+
+def _round_column(np, values: list):
+    """
+    Round a column to 2 decimals, exactly like round(value, 2).
+
+    Args:
+        np (module): the numpy module
+        values (list): the values to round
+
+    Returns:
+        numpy.ndarray: the rounded values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, 2)
+    # np.round scales by 100 first, values close to a half may round differently, so redo them exactly
+    scaled = values * 100
+    for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+def format_reasons(cutoff: dict, reasons: int, coverage: float, quality: float, length: int, contigs: int,
+                   genome_size: int) -> str:
+    """
+    Render the reason bitmask of a sample as the reason written to reports.
+
+    Args:
+        cutoff (dict): Cutoffs set by users to determine rank
+        reasons (int): the reason bitmask (see REASON_BITS)
+        coverage (float): Estimated coverage of the sample (rounded to 2 decimals)
+        quality (float): Per-read average quality (rounded to 2 decimals)
+        length (int): Median length of reads (rounded)
+        contigs (int): Total number of contigs
+        genome_size (int): Genome size of sample used in analysis
 
-    reason = ";".join(sorted(reason))
-    return [rank, reason]
+    Returns:
+        str: the reasons, sorted and separated by ';'
+    """
+    messages = []
+    for tier in ['gold', 'silver', 'bronze']:
+        if reasons & REASON_BITS[f'{tier}-coverage']:
+            messages.append(f"Low coverage ({coverage:.2f}x, expect >= {cutoff[tier]['coverage']}x)")
+        if reasons & REASON_BITS[f'{tier}-quality']:
+            messages.append(f"Poor read quality (Q{quality:.2f}, expect >= Q{cutoff[tier]['quality']})")
+        if reasons & REASON_BITS[f'{tier}-length']:
+            read_length = f"{length:.2f}" if tier == 'bronze' else length
+            messages.append(f"Short read length ({read_length}bp, expect >= {cutoff[tier]['length']} bp)")
+        if reasons & REASON_BITS[f'{tier}-contigs']:
+            messages.append(f"Too many contigs ({contigs}, expect <= {cutoff[tier]['contigs']})")
+    if reasons & REASON_BITS['passed']:
+        messages.append('passed all cutoffs')
+    if reasons & REASON_BITS['single-end']:
+        messages.append("Single-end reads")
+    if reasons & REASON_BITS['min-assembled-size']:
+        messages.append(f"Assembled size is too small ({genome_size} bp, expect <= {cutoff['min-assembled-size']})")
+    if reasons & REASON_BITS['max-assembled-size']:
+        messages.append(f"Assembled size is too large ({genome_size} bp, expect <= {cutoff['max-assembled-size']})")
+    return ";".join(sorted(messages))
 
 
 def print_failed(failed: list, spaces: int = 8) -> str:
@@ -156,6 +432,32 @@ def gather_results(sample: dict, rank: str, reason: str) -> dict:
     results.update(_remove_keys(sample['results']['annotation']['stats'], ['organism', 'contigs', 'bases']))
     results.update(_add_minmers(sample['results']['minmers']))
     results.update(_add_mlst(sample['results']['mlst']))
+    if 'mapping' in sample['results']:
+        results.update(_add_mapping(sample['results']['mapping']))
+    return results
+
+
+def _add_mapping(mappings: dict) -> dict:
+    """
+    Read through mapping coverage statistics and create columns for each reference.
+
+    Args:
+        mappings (dict): The mapping results (parsed with stats=True) associated with a sample
+
+    Returns:
+        dict: Per reference length, mean depth and breadth of coverage
+    """
+    results = OrderedDict()
+    for key, contigs in mappings.items():
+        if not contigs or 'mean_depth' not in contigs[0]:
+            continue
+        prefix = f"mapping_{key.replace('.txt', '')}"
+        length = sum(contig['length'] for contig in contigs)
+        results[f'{prefix}_length'] = length
+        for stat in ['mean_depth', 'breadth_1x', 'breadth_10x']:
+            # Weight each contig by its length
+            total = sum(contig[stat] * contig['length'] for contig in contigs if contig['length'])
+            results[f'{prefix}_{stat}'] = total / length if length else None
     return results
 
 
@@ -35,6 +35,9 @@ setup(
         'console_scripts': [
             'bactopia-summary=bactopia.cli.summary:main',
             'bactopia-jsonify=bactopia.cli.jsonify:main',
+            'bactopia-blast-index=bactopia.cli.blast_index:main',
+            'bactopia-json-benchmark=bactopia.cli.json_benchmark:main',
+            'bactopia-parser=bactopia.cli.parser:main',
         ],
     },
     install_requires=requirements,
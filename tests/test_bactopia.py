@@ -3,10 +3,79 @@
 """Tests for `bactopia` package."""
 
 
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
+from unittest import mock
 
 from bactopia import bactopia
 
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COVERAGE = "##total=2\n##contig=<ID=c1,length=5>\n19\n0\n18\n30\n17\n##contig=<ID=c2,length=4>\n30\n2\n16\n27\n"
+
+
+def _write(filename: str, contents: str) -> None:
+    """Write a fixture file, creating its directory."""
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'wt') as fh:
+        fh.write(contents)
+
+
+def blast_report(query_id: str, bit_scores: list) -> dict:
+    """Build a BLAST JSON report of a query, with a hit (of one HSP) per bit score."""
+    hits = [
+        {"num": i + 1, "description": [{"title": f"subject{i + 1}"}], "len": 1000 + i,
+         "hsps": [{"bit_score": score, "evalue": 1e-5, "identity": 90, "align_len": 100, "query_from": 1,
+                   "query_to": 100}]}
+        for i, score in enumerate(bit_scores)
+    ]
+    return {"report": {
+        "program": "blastn", "version": "2.10", "search_target": {"db": "db"}, "params": {"expect": 10},
+        "results": {"search": {"query_id": query_id, "query_title": "title", "query_len": 500, "hits": hits}}
+    }}
+
+
+def make_sample(path: str, name: str, paired: bool = True, coverage: float = 60.0, contigs: int = 50) -> None:
+    """Create a small Bactopia sample directory, with the results bactopia-summary and bactopia-jsonify read."""
+    import json
+    sample = f"{path}/{name}"
+    _write(f"{sample}/{name}-genome-size.txt", "2800000\n")
+    for step in ["original", "final"]:
+        for read in (["R1", "R2"] if paired else [None]):
+            qc = {
+                "qc_stats": {"total_bp": 1000, "coverage": coverage / (2 if paired else 1), "read_total": 10,
+                             "qual_mean": 33.5, "read_mean": 150.2, "read_median": 150},
+                "per_base_quality": {"1": 30}, "read_lengths": {"150": 10}
+            }
+            prefix = f"{name}_{read}" if read else name
+            _write(f"{sample}/quality-control/summary-{step}/{prefix}-{step}.json", json.dumps(qc, indent=2))
+    for read in (["_R1", "_R2"] if paired else [""]):
+        _write(f"{sample}/quality-control/{name}{read}.fastq.gz", "")
+    _write(f"{sample}/assembly/{name}.fna.json",
+           json.dumps({"total_contig": contigs, "total_contig_length": 2800000, "n50_contig_length": 100000}))
+    _write(f"{sample}/assembly/checkm/checkm-results.txt",
+           "Bin Id\tMarker lineage\tCompleteness\tContamination\tStrain heterogeneity\n"
+           "b\tk__Bacteria\t99.1\t0.5\t0.0\n")
+    _write(f"{sample}/assembly/quast/transposed_report.tsv", "Assembly\t# contigs\tN50\nx\t50\t1000\n")
+    _write(f"{sample}/annotation/{name}.txt",
+           "organism: Genus species\ncontigs: 50\nbases: 2800000\nCDS: 2600\nrRNA: 6\n")
+    _write(f"{sample}/minmers/{name}-refseq-k21.txt",
+           "identity\tshared-hashes\tmedian-multiplicity\tp-value\tquery-ID\tquery-comment\n"
+           "0.99\t900/1000\t5\t0\tGCF_1\tStaphylococcus aureus\n")
+    _write(f"{sample}/minmers/{name}-genbank-k21.txt",
+           "overlap     p_query p_match\n---------   ------- --------\n"
+           "2.7 Mbp       7.3%   99.3%      Staphylococcus aureus\n\n74.6% (28.0 Mbp) of hashes have no assignment.\n")
+    _write(f"{sample}/mlst/default/blast/{name}-blast.json",
+           json.dumps({"arcC": {"allele": 1}, "ST": {"st": "5", "perfect_matches": 7}}, indent=2))
+    _write(f"{sample}/mlst/default/ariba/mlst_report.tsv", "ST\tarcC\n5\t1\n")
+    _write(f"{sample}/blast/genes/g1.json", json.dumps({"BlastOutput2": [blast_report("gene1", [50, 70, 60])]}))
+    with open(f"{sample}/blast/{name}-plsdb.txt", 'wt') as fh:
+        for contig in range(3):
+            fh.write(json.dumps({"BlastOutput2": [blast_report(f"contig{contig}", [10, 20])]}, indent=2) + "\n")
+    _write(f"{sample}/mapping/ref1.txt", COVERAGE)
+
 
 class TestBactopia_parser(unittest.TestCase):
     """Tests for `bactopia` package."""
@@ -19,3 +88,985 @@ class TestBactopia_parser(unittest.TestCase):
 
     def test_000_something(self):
         """Test something."""
+
+    def _run_python(self, code: str) -> tuple:
+        """Run Python code in a fresh interpreter, returning its exit code and output."""
+        env = dict(os.environ, PYTHONPATH=PACKAGE_DIR)
+        process = subprocess.run([sys.executable, '-c', code], env=env, stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT, universal_newlines=True)
+        return process.returncode, process.stdout
+
+    def test_001_jsonify_version_imports(self):
+        """`bactopia-jsonify --version` imports no parsers or heavy modules."""
+        returncode, output = self._run_python(
+            "import sys\n"
+            "sys.argv = ['bactopia-jsonify', '--version']\n"
+            "from bactopia.cli.jsonify import main\n"
+            "try:\n"
+            "    main()\n"
+            "except SystemExit:\n"
+            "    pass\n"
+            "heavy = ['concurrent.futures', 'csv', 'json', 'multiprocessing', 'numpy', 'orjson', 'sqlite3']\n"
+            "print('loaded:' + ','.join(sorted(\n"
+            "    m for m in sys.modules if m.startswith('bactopia.parsers.') or m in heavy\n"
+            ")))\n"
+        )
+        self.assertEqual(returncode, 0, output)
+        self.assertTrue(output.startswith('bactopia jsonify'))
+        self.assertEqual(output.strip().split('\n')[-1], 'loaded:')
+
+
+class TestBactopia_cache(unittest.TestCase):
+    """Tests for `bactopia.cache`."""
+
+    def setUp(self):
+        """Enable a cache in a temporary directory, with a result file to parse."""
+        from bactopia import cache
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.result_file = f'{self.tmpdir.name}/sample.fna.json'
+        with open(self.result_file, 'wt') as fh:
+            fh.write('{"total_contig": 10}')
+        cache.enable_cache(f'{self.tmpdir.name}/cache.db')
+
+    def tearDown(self):
+        """Disable the cache and remove the temporary directory."""
+        from bactopia import cache
+        cache.disable_cache()
+        self.tmpdir.cleanup()
+
+    def _parse(self) -> tuple:
+        """Parse the result file through bactopia.parse, returning the result and the number of parser calls."""
+        from bactopia.parse import parse
+        parser = mock.Mock()
+        parser.parse.side_effect = lambda filename: {'parsed': open(filename).read()}
+        with mock.patch('bactopia.parsers.get_parser', return_value=parser):
+            result = parse('assembly', self.result_file)
+        return result, parser.parse.call_count
+
+    def test_000_cache_hit(self):
+        """Unchanged inputs are parsed once, then read from the cache."""
+        first, calls = self._parse()
+        self.assertEqual(calls, 1)
+        second, calls = self._parse()
+        self.assertEqual(calls, 0)
+        self.assertEqual(first, second)
+
+    def test_001_cache_invalidated_by_size_and_mtime(self):
+        """Changing the size or the mtime of an input invalidates its cached result."""
+        self._parse()
+        with open(self.result_file, 'wt') as fh:
+            fh.write('{"total_contig": 100}')
+        result, calls = self._parse()
+        self.assertEqual(calls, 1)
+        self.assertEqual(result, {'parsed': '{"total_contig": 100}'})
+
+        stat = os.stat(self.result_file)
+        os.utime(self.result_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        _, calls = self._parse()
+        self.assertEqual(calls, 1)
+        _, calls = self._parse()
+        self.assertEqual(calls, 0)
+
+    def test_002_cache_invalidated_by_parser_version(self):
+        """Results cached by another parser version are not reused."""
+        from bactopia import cache, const
+        _, fingerprint = cache.get_cache_keys('assembly', self.result_file)
+        self.assertIn(f":{const.PARSER_VERSION}", fingerprint)
+
+        self._parse()
+        with mock.patch.object(const, 'PARSER_VERSION', const.PARSER_VERSION + 1):
+            _, calls = self._parse()
+        self.assertEqual(calls, 1)
+
+    def test_003_cache_settings(self):
+        """The settings of an enabled cache can re-enable it (e.g. in a worker process)."""
+        from bactopia import cache
+        settings = cache.get_settings()
+        self.assertEqual(settings['path'], f'{self.tmpdir.name}/cache.db')
+        cache.disable_cache()
+        self.assertIsNone(cache.get_settings())
+        cache.enable_cache(**settings)
+        self.assertTrue(cache.is_enabled())
+
+
+    def test_004_access_times_from_threads(self):
+        """Access times queued by threads which have exited are written on flush and when the cache is disabled."""
+        import sqlite3
+        import threading
+        from bactopia import cache
+        self._parse()
+        key, _ = cache.get_cache_keys('assembly', self.result_file)
+
+        def accessed():
+            connection = sqlite3.connect(f'{self.tmpdir.name}/cache.db')
+            value = connection.execute("SELECT accessed FROM cache WHERE key = ?", (key,)).fetchone()[0]
+            connection.close()
+            return value
+
+        for flush in [cache.flush_touched, cache.disable_cache]:
+            before = accessed()
+            thread = threading.Thread(target=self._parse)
+            thread.start()
+            thread.join()
+            self.assertEqual(accessed(), before)
+            flush()
+            self.assertGreater(accessed(), before)
+
+
+class TestBactopia_lazy(unittest.TestCase):
+    """Tests for `bactopia.sample`."""
+
+    def _lazy(self) -> tuple:
+        """Build LazyResults of two result types, returning them and the mocked loader."""
+        from collections import OrderedDict
+        from bactopia.sample import LazyResults
+        loader = mock.Mock(side_effect=lambda result_key, filename: {'parsed': filename})
+        pending = OrderedDict([
+            ('assembly', [['stats', 'assembly', ['a.json']], ['checkm', 'assembly', None]]),
+            ('mlst', [['blast', 'mlst', ['m.json']]])
+        ])
+        return LazyResults(pending, loader), loader
+
+    def _expected(self) -> dict:
+        """The eagerly parsed equivalent of _lazy."""
+        from collections import OrderedDict
+        return OrderedDict([
+            ('assembly', OrderedDict([('stats', {'parsed': 'a.json'}), ('checkm', {})])),
+            ('mlst', OrderedDict([('blast', {'parsed': 'm.json'})]))
+        ])
+
+    def test_000_loads_on_access(self):
+        """Result types are parsed on get, pop and items, and only once."""
+        results, loader = self._lazy()
+        self.assertEqual(loader.call_count, 0)
+        self.assertEqual(list(results.keys()), ['assembly', 'mlst'])
+
+        self.assertEqual(results.get('mlst'), self._expected()['mlst'])
+        self.assertTrue(results.is_loaded('mlst'))
+        self.assertFalse(results.is_loaded('assembly'))
+        self.assertEqual(loader.call_count, 1)
+        self.assertIsNone(results.get('missing'))
+
+        self.assertEqual(results.pop('assembly'), self._expected()['assembly'])
+        self.assertNotIn('assembly', results)
+        self.assertEqual(loader.call_count, 2)
+
+        results, loader = self._lazy()
+        self.assertEqual(results.items(), list(self._expected().items()))
+        self.assertEqual(loader.call_count, 2)
+        results.items()
+        self.assertEqual(loader.call_count, 2)
+
+    def test_001_pickle(self):
+        """Pickling loads every result type, and unpickles as a plain OrderedDict."""
+        import pickle
+        from collections import OrderedDict
+        results, _ = self._lazy()
+        unpickled = pickle.loads(pickle.dumps(results))
+        self.assertIs(type(unpickled), OrderedDict)
+        self.assertEqual(unpickled, self._expected())
+
+    def test_002_equal_to_eager(self):
+        """A lazily parsed sample is equal to the eagerly parsed sample."""
+        from bactopia.parse import parse_bactopia_files
+        with tempfile.TemporaryDirectory() as tmpdir:
+            make_sample(tmpdir, 'S1')
+            eager = parse_bactopia_files(tmpdir, 'S1')
+            lazy = parse_bactopia_files(tmpdir, 'S1', lazy=True)
+            self.assertFalse(lazy['results'].is_loaded('assembly'))
+            self.assertEqual(lazy, eager)
+            self.assertEqual(eager, lazy)
+            self.assertTrue(eager['results']['assembly']['stats'])
+
+
+class TestBactopia_mapping(unittest.TestCase):
+    """Tests for `bactopia.parsers.mapping`."""
+
+    def setUp(self):
+        """Write a small per-base coverage file."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.coverage_file = f'{self.tmpdir.name}/ref1.txt'
+        _write(self.coverage_file, COVERAGE)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def _expected_stats(self, window: int) -> list:
+        """Coverage statistics of the list parser's output, one base at a time."""
+        from bactopia.parsers import mapping
+        results = []
+        for result in mapping.parse(self.coverage_file):
+            current = mapping._new_stats(result['name'])
+            for depth in result['per_base_coverage']:
+                mapping._add_depth(current, depth, window)
+            results.append(mapping._finish_stats(current, window))
+        return results
+
+    def test_000_compact_matches_list(self):
+        """Compact and sidecar coverages are the same as the list parser's, at any chunk size."""
+        from bactopia.parsers import mapping
+        expected = mapping.parse(self.coverage_file)
+        self.assertEqual([len(r['per_base_coverage']) for r in expected], [5, 4])
+        self.assertEqual(mapping.coverage_to_list(mapping.parse(self.coverage_file, compact=True)), expected)
+        self.assertEqual(mapping.coverage_to_list(mapping.parse(self.coverage_file, sidecar=True)), expected)
+        for chunk_size in [1, 3, 7]:
+            batches = list(mapping._iter_coverage(self.coverage_file, chunk_size=chunk_size))
+            self.assertEqual([value for kind, value in batches if kind == 'contig'], [r['name'] for r in expected])
+            depths = [list(value) for kind, value in batches if kind == 'depths']
+            self.assertEqual(sum(depths, []), sum((r['per_base_coverage'] for r in expected), []))
+
+    def test_001_stats_match_list(self):
+        """Statistics from text and sidecar, with and without NumPy, match the list parser's coverage."""
+        from bactopia.parsers import mapping
+        for window in [1, 2, 1000]:
+            expected = self._expected_stats(window)
+            self.assertEqual(mapping.parse(self.coverage_file, stats=True, window=window), expected)
+            self.assertEqual(mapping.parse(self.coverage_file, stats=True, window=window, sidecar=True), expected)
+            with mock.patch.dict(sys.modules, {'numpy': None}):
+                self.assertEqual(mapping.parse(self.coverage_file, stats=True, window=window), expected)
+                self.assertEqual(
+                    mapping.parse(self.coverage_file, stats=True, window=window, sidecar=True), expected
+                )
+        self.assertEqual(self._expected_stats(1000)[0]['median_depth'], 18)
+
+    def test_002_truncated_sidecar(self):
+        """A truncated sidecar raises a ValueError when opened, and is rebuilt by open_sidecar."""
+        from bactopia.parsers import mapping
+        sidecar = mapping.write_sidecar(self.coverage_file)
+        with open(sidecar, 'r+b') as fh:
+            fh.truncate(os.path.getsize(sidecar) - 2)
+        with self.assertRaises(ValueError):
+            mapping.CoverageSidecar(sidecar)
+        with mapping.open_sidecar(self.coverage_file) as coverage:
+            self.assertEqual(coverage.lengths, [5, 4])
+            with coverage.coverage(0, 1, 3) as depths:
+                self.assertEqual(list(depths), [0, 18])
+
+
+class TestBactopia_blast(unittest.TestCase):
+    """Tests for `bactopia.parsers.blast`."""
+
+    def setUp(self):
+        """Create a sample with BLAST results."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        make_sample(self.tmpdir.name, 'sample1')
+        self.plsdb = f'{self.tmpdir.name}/sample1/blast/sample1-plsdb.txt'
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def test_000_stream_reports(self):
+        """Concatenated BLAST documents are streamed in order, at any chunk size."""
+        import json
+        from bactopia.parsers import blast
+        decoder = json.JSONDecoder()
+        expected = []
+        with open(self.plsdb, 'rt') as fh:
+            text = fh.read()
+        pos = 0
+        while text[pos:].strip():
+            document, pos = decoder.raw_decode(text, len(text) - len(text[pos:].lstrip()))
+            expected.extend(document['BlastOutput2'])
+        self.assertEqual(len(expected), 3)
+        for chunk_size in [1, 7, 64, blast.CHUNK_SIZE]:
+            self.assertEqual(list(blast._iter_blast_reports(self.plsdb, chunk_size=chunk_size)), expected)
+
+        results = blast.parse(self.plsdb)
+        self.assertEqual(list(results['queries']), ['contig0', 'contig1', 'contig2'])
+        self.assertEqual([hit['subject_title'] for hit in results['queries']['contig0']['hits']],
+                         ['subject1', 'subject2'])
+
+    def test_001_stream_numbers_and_errors(self):
+        """Numbers split across chunks are decoded whole, malformed JSON raises without reading to the end."""
+        import json
+        from bactopia.parsers import blast
+        numbers = f'{self.tmpdir.name}/numbers.json'
+        _write(numbers, '{"total": 123456789, "BlastOutput2": [{"score": 1.5e10}], "count": 98765}')
+        for chunk_size in range(1, 12):
+            self.assertEqual(list(blast._iter_blast_reports(numbers, chunk_size=chunk_size)), [{"score": 1.5e10}])
+
+        malformed = f'{self.tmpdir.name}/malformed.json'
+        _write(malformed, '{"BlastOutput2": [{"score": 1,, "count": 2}]}' + ' ' * 100000)
+        with mock.patch.object(blast, '_read_chunk', wraps=blast._read_chunk) as read_chunk:
+            with self.assertRaises(json.JSONDecodeError):
+                list(blast._iter_blast_reports(malformed, chunk_size=4))
+        self.assertLess(sum(call.args[1] for call in read_chunk.call_args_list), 100)
+
+    def test_002_top_hits(self):
+        """Only the best N hits are kept, ties keep the earlier hit."""
+        import json
+        from bactopia.parsers import blast
+        genes = f'{self.tmpdir.name}/genes.json'
+        _write(genes, json.dumps({"BlastOutput2": [blast_report("gene1", [50, 70, 60, 70, 50])]}))
+        results = blast.parse(genes, top_hits=3)
+        hits = results['queries']['gene1']['hits']
+        self.assertEqual([hit['subject_title'] for hit in hits], ['subject2', 'subject4', 'subject3'])
+        self.assertEqual([hit['bit_score'] for hit in hits], [70, 70, 60])
+        self.assertEqual(hits[0]['query_coverage'], 20.0)
+        self.assertEqual(blast.parse(genes, top_hits=0)['queries']['gene1']['hits'], [])
+
+        all_hits = blast.parse(genes, top_hits=10)['queries']['gene1']['hits']
+        self.assertEqual([hit['subject_title'] for hit in all_hits],
+                         ['subject2', 'subject4', 'subject3', 'subject1', 'subject5'])
+
+    def test_003_blast_index(self):
+        """Samples with the same name in different runs are indexed separately."""
+        from bactopia.blast_index import find_hits, update_blast_index
+        index = f'{self.tmpdir.name}/blast-index.db'
+        for run in ['run1', 'run2']:
+            make_sample(f'{self.tmpdir.name}/{run}', 'sample1')
+        make_sample(f'{self.tmpdir.name}/run1', 'sample10')
+        samples = [[f'{self.tmpdir.name}/run1', 'sample1'], [f'{self.tmpdir.name}/run1', 'sample10']]
+        self.assertEqual(update_blast_index(index, samples), {'added': 4, 'updated': 0, 'unchanged': 0, 'removed': 0})
+        self.assertEqual(update_blast_index(index, [[f'{self.tmpdir.name}/run2', 'sample1']])['added'], 2)
+
+        os.remove(f'{self.tmpdir.name}/run1/sample1/blast/genes/g1.json')
+        self.assertEqual(update_blast_index(index, samples), {'added': 0, 'updated': 0, 'unchanged': 3, 'removed': 1})
+        hits = find_hits(index, query='gene1')
+        self.assertEqual(sorted(set(hit['sample'] for hit in hits)), ['sample1', 'sample10'])
+        self.assertEqual(len(hits), 6)
+
+
+class TestBactopia_table(unittest.TestCase):
+    """Tests for `bactopia.parsers.generic`."""
+
+    def setUp(self):
+        """Write a small delimited file, with ragged rows and identifiers with leading zeros."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.table = f'{self.tmpdir.name}/table.tsv'
+        _write(self.table, "ST\tallele\tdepth\tname\n5\t007\t1.5\tx\n\n12\t010\t20\n3\t1\t2\ty\textra\n")
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def test_000_parse_table(self):
+        """parse_table matches csv.DictReader, and read_table rows match parse_table."""
+        import csv
+        from bactopia.parsers.generic import parse_table, read_table
+        with open(self.table, 'rt') as fh:
+            expected = list(csv.DictReader(fh, delimiter='\t'))
+        self.assertEqual(parse_table(self.table), expected)
+        self.assertEqual(parse_table(self.table, max_rows=1), expected[:1])
+        self.assertEqual(read_table(self.table).to_rows(), expected)
+
+    def test_001_typed_columns(self):
+        """Only plain numbers are converted, leading zeros are kept as strings."""
+        from bactopia.parsers.generic import read_table
+        table = read_table(self.table, typed=True)
+        self.assertEqual(table.column('ST'), [5, 12, 3])
+        self.assertEqual(table.column('allele'), ['007', '010', '1'])
+        self.assertEqual(table.column('depth'), [1.5, 20.0, 2.0])
+        self.assertEqual(table.column('name'), ['x', None, 'y'])
+
+
+class TestBactopia_json(unittest.TestCase):
+    """Tests for `bactopia.json_backend`."""
+
+    def test_000_same_output(self):
+        """Every installed backend decodes NaN and encodes arrays, lazy results and RawJSON the same."""
+        import json
+        from array import array
+        from collections import OrderedDict
+        from bactopia import json_backend
+        from bactopia.sample import LazyResults
+        lazy = LazyResults(OrderedDict([('qc', [['final', 'qc', ['a.json']]])]), lambda key, path: {'path': path})
+        data = OrderedDict([
+            ('depths', array('I', [1, 2, 3])), ('pair', (1, 'a')), ('raw', json_backend.RawJSON(b'{"a":[1,2]}')),
+            ('results', [lazy])
+        ])
+        expected = {
+            'depths': [1, 2, 3], 'pair': [1, 'a'], 'raw': {'a': [1, 2]}, 'results': [{'qc': {'final': {'path': 'a.json'}}}]
+        }
+        for name in json_backend.BACKENDS:
+            backend = json_backend._import_backend(name)
+            if not backend:
+                continue
+            with self.subTest(backend=name), mock.patch.dict(json_backend.BACKEND, backend, clear=True):
+                self.assertEqual(json.loads(json_backend.dumps(data)), expected)
+                value = json_backend.loads(b'{"depth": NaN, "max": Infinity}')
+                self.assertNotEqual(value['depth'], value['depth'])
+                self.assertEqual(value['max'], float('inf'))
+                with self.assertRaises(ValueError):
+                    json_backend.loads(b'{"depth": }')
+
+
+class TestBactopia_client(unittest.TestCase):
+    """Tests for `bactopia.client` and `bactopia.server`."""
+
+    def setUp(self):
+        """Create a socket in a temporary directory."""
+        import socket
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = f'{self.tmpdir.name}/parser.sock'
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+
+    def tearDown(self):
+        """Close the socket and remove the temporary directory."""
+        self.socket.close()
+        self.tmpdir.cleanup()
+
+    def test_000_check_socket(self):
+        """Only sockets owned by, and private to, the current user are trusted."""
+        from bactopia.client import check_socket, is_running
+        check_socket(self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        with self.assertRaises(PermissionError):
+            check_socket(self.socket_path)
+        self.assertFalse(is_running(self.socket_path))
+
+        not_socket = f'{self.tmpdir.name}/not.sock'
+        _write(not_socket, '')
+        os.chmod(not_socket, 0o600)
+        with self.assertRaises(PermissionError):
+            check_socket(not_socket)
+        with mock.patch('os.getuid', return_value=os.getuid() + 1):
+            with self.assertRaises(PermissionError):
+                check_socket(self.socket_path)
+
+    def test_001_ping_version(self):
+        """The daemon reports its version, a client of another version parses locally."""
+        import json
+        from bactopia import __version__
+        from bactopia.client import jsonify
+        from bactopia.server import _handle_request
+        self.assertEqual(_handle_request({'command': 'ping'})['version'], __version__)
+
+        make_sample(self.tmpdir.name, 'sample1')
+        outfile = f'{self.tmpdir.name}/sample1.json'
+        with mock.patch('bactopia.client.request', return_value={'status': 'ok', 'version': 'other'}) as request:
+            self.assertEqual(jsonify(self.tmpdir.name, 'sample1', outfile, socket_path=self.socket_path), 'local')
+        self.assertEqual([call.args[0]['command'] for call in request.call_args_list], ['ping'])
+        with open(outfile, 'rt') as fh:
+            self.assertEqual(json.load(fh)['sample'], 'sample1')
+
+
+    def test_002_unresponsive_daemon(self):
+        """A daemon which times out or drops the connection is skipped, the sample is parsed locally."""
+        import json
+        from bactopia import __version__
+        from bactopia.client import jsonify
+        make_sample(self.tmpdir.name, 'sample1')
+        outfile = f'{self.tmpdir.name}/sample1.json'
+        # Listening, but never accepting or answering
+        self.socket.listen(1)
+        with mock.patch('bactopia.client.PING_TIMEOUT', 0.1), self.assertLogs(level='WARNING'):
+            self.assertEqual(jsonify(self.tmpdir.name, 'sample1', outfile, socket_path=self.socket_path), 'local')
+        with open(outfile, 'rt') as fh:
+            self.assertEqual(json.load(fh)['sample'], 'sample1')
+
+        os.remove(outfile)
+        responses = [{'status': 'ok', 'version': __version__}, ConnectionResetError(104, 'Connection reset by peer')]
+        with mock.patch('bactopia.client.request', side_effect=responses) as request, self.assertLogs(level='WARNING'):
+            self.assertEqual(jsonify(self.tmpdir.name, 'sample1', outfile, socket_path=self.socket_path), 'local')
+        self.assertEqual([call.args[0]['command'] for call in request.call_args_list], ['ping', 'jsonify'])
+        with open(outfile, 'rt') as fh:
+            self.assertEqual(json.load(fh)['sample'], 'sample1')
+
+class TestBactopia_summary(unittest.TestCase):
+    """Tests for `bactopia-summary`."""
+
+    def setUp(self):
+        """Create samples of each rank, and one which failed QC."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bactopia = f'{self.tmpdir.name}/bactopia'
+        for name, coverage, contigs, paired in [
+            ['gold', 120.0, 50, True], ['silver', 70.0, 150, True], ['bronze', 30.0, 300, True],
+            ['exclude', 10.0, 600, True], ['single', 120.0, 50, False]
+        ]:
+            make_sample(self.bactopia, name, paired=paired, coverage=coverage, contigs=contigs)
+        _write(f'{self.bactopia}/failed/failed-low-read-count-error.txt', 'error')
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def _run_summary(self, outdir: str, *args: str, log: list = None) -> dict:
+        """
+        Run bactopia-summary in a fresh interpreter (its counts are module globals), returning its reports.
+
+        If log is given, the run is not silent and its log messages are added to it.
+        """
+        env = dict(os.environ, PYTHONPATH=PACKAGE_DIR)
+        command = [sys.executable, '-m', 'bactopia.cli.summary', '--outdir', outdir, *args]
+        process = subprocess.run(command if log is not None else command + ['--silent'], env=env, check=True,
+                                 stderr=subprocess.PIPE, universal_newlines=True)
+        if log is not None:
+            log.extend(process.stderr.splitlines())
+        reports = {}
+        for report in ['report', 'exclude', 'summary']:
+            with open(f'{outdir}/bactopia-{report}.txt', 'rt') as fh:
+                reports[report] = fh.read().replace(outdir, 'OUTDIR')
+        # QC failures are listed after re-ranked samples, rather than in the order samples were found
+        reports['exclude'] = sorted(reports['exclude'].splitlines())
+        return reports
+
+    def test_000_rerank_from(self):
+        """Re-ranking a report reproduces the ranks of a full run, with the same or new cutoffs."""
+        import csv
+        original = self._run_summary(f'{self.tmpdir.name}/original', self.bactopia)
+        with open(f'{self.tmpdir.name}/original/bactopia-report.txt', 'rt') as fh:
+            ranks = {row['sample']: row['rank'] for row in csv.DictReader(fh, delimiter='\t')}
+        self.assertEqual(ranks, {'gold': 'gold', 'silver': 'silver', 'bronze': 'bronze', 'exclude': 'exclude',
+                                 'single': 'bronze'})
+        self.assertTrue(any(line.startswith('failed\tqc-fail\t') for line in original['exclude']))
+
+        rerank = self._run_summary(
+            f'{self.tmpdir.name}/rerank', '--rerank-from', f'{self.tmpdir.name}/original/bactopia-report.txt'
+        )
+        self.assertEqual(rerank, original)
+
+        cutoffs = ['--gold_coverage', '50', '--max_contigs', '1000']
+        rerank = self._run_summary(
+            f'{self.tmpdir.name}/rerank-cutoffs', '--rerank-from', f'{self.tmpdir.name}/original/bactopia-report.txt',
+            *cutoffs
+        )
+        self.assertEqual(rerank, self._run_summary(f'{self.tmpdir.name}/cutoffs', self.bactopia, *cutoffs))
+        self.assertNotEqual(rerank['report'], original['report'])
+
+    def test_001_report_writer(self):
+        """The spilled report is byte-identical to the report csv.DictWriter wrote from rows in memory."""
+        import csv
+        from collections import OrderedDict
+        from bactopia.summary import ReportWriter
+        rows = [
+            OrderedDict([('sample', 'a'), ('rank', 'gold'), ('coverage', 101.23456), ('contigs', 50)]),
+            OrderedDict([('sample', 'b'), ('rank', 'silver'), ('coverage', 70.0), ('reason', 'Low "coverage"\ttab')]),
+            OrderedDict([('sample', 'c'), ('contigs', 300), ('mlst_default_st', None)])
+        ]
+        report = ReportWriter(tmpdir=self.tmpdir.name)
+        for row in rows:
+            report.add(row)
+        report.write(f'{self.tmpdir.name}/report.txt')
+        report.close()
+
+        # The report writer before rows were spilled to disk
+        fields = OrderedDict((field, None) for row in rows for field in row)
+        with open(f'{self.tmpdir.name}/expected.txt', 'w') as fh:
+            writer = csv.DictWriter(fh, fieldnames=fields.keys(), delimiter='\t')
+            writer.writeheader()
+            for row in rows:
+                output = {}
+                for field in fields:
+                    if field in row:
+                        output[field] = f"{row[field]:.3f}" if isinstance(row[field], float) else row[field]
+                    else:
+                        output[field] = ""
+                writer.writerow(output)
+
+        with open(f'{self.tmpdir.name}/report.txt', 'rb') as fh:
+            with open(f'{self.tmpdir.name}/expected.txt', 'rb') as expected:
+                self.assertEqual(fh.read(), expected.read())
+
+    def test_002_sqlite(self):
+        """--sqlite writes the report, exclusions and counts to indexed tables."""
+        import csv
+        import sqlite3
+        outdir = f'{self.tmpdir.name}/sqlite'
+        self._run_summary(outdir, '--sqlite', self.bactopia)
+        with open(f'{outdir}/bactopia-report.txt', 'rt') as fh:
+            expected = list(csv.DictReader(fh, delimiter='\t'))
+
+        connection = sqlite3.connect(f'{outdir}/bactopia-report.db')
+        connection.row_factory = sqlite3.Row
+        rows = [dict(row) for row in connection.execute("SELECT * FROM results ORDER BY rowid")]
+        self.assertEqual([row['sample'] for row in rows], [row['sample'] for row in expected])
+        self.assertEqual([row['rank'] for row in rows], [row['rank'] for row in expected])
+        self.assertEqual(list(rows[0]), list(expected[0]))
+        self.assertIsInstance(rows[0]['total_contig'], int)
+        self.assertEqual(
+            {row['sample']: row['status'] for row in connection.execute("SELECT * FROM exclusions")},
+            {'exclude': 'exclude', 'failed': 'qc-fail'}
+        )
+        counts = dict(connection.execute("SELECT category, total FROM counts").fetchall())
+        self.assertEqual([counts['total'], counts['pass'], counts['total-excluded']], [6, 4, 2])
+        failures = connection.execute("SELECT sample FROM failures WHERE category = 'failed-cutoff'").fetchall()
+        self.assertEqual([row['sample'] for row in failures], ['exclude'])
+        indexes = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+        for index in ['results_sample', 'results_rank', 'results_checkm_completeness', 'exclusions_sample',
+                      'failures_category']:
+            self.assertIn(index, indexes)
+        self.assertTrue(any(index.startswith('results_mlst_') for index in indexes))
+        connection.close()
+
+
+    def _run_incremental(self, outdir: str, *args: str) -> tuple:
+        """Run an incremental bactopia-summary, returning its reports and the number of reused samples."""
+        import re
+        log = []
+        reports = self._run_summary(outdir, '--incremental', *args, log=log)
+        reused = [int(match.group(1)) for match in map(re.compile(r'Reused ([0-9]+) unchanged').search, log) if match]
+        self.assertEqual(len(reused), 1, log)
+        return reports, reused[0]
+
+    def test_003_incremental(self):
+        """A second incremental run reuses unchanged samples, re-parses changed ones and matches a full run."""
+        import shutil
+        outdir = f'{self.tmpdir.name}/incremental'
+        first, reused = self._run_incremental(outdir, self.bactopia)
+        self.assertEqual(reused, 0)
+        self.assertEqual(first, self._run_summary(f'{self.tmpdir.name}/full', self.bactopia))
+        for report in ['report', 'exclude']:
+            with open(f'{outdir}/bactopia-{report}.txt', 'rb') as fh:
+                with open(f'{self.tmpdir.name}/full/bactopia-{report}.txt', 'rb') as full:
+                    self.assertEqual(fh.read(), full.read())
+        self.assertEqual(sorted(os.listdir(outdir)), [
+            'bactopia-exclude.txt', 'bactopia-incremental.json', 'bactopia-report.txt', 'bactopia-summary.txt'
+        ])
+
+        # Rank cutoffs are applied after records are stored, so records are reused with new cutoffs
+        second, reused = self._run_incremental(outdir, self.bactopia, '--gold_coverage', '50')
+        self.assertEqual(reused, 6)
+        self.assertEqual(second, self._run_summary(f'{self.tmpdir.name}/full-cutoffs', self.bactopia,
+                                                   '--gold_coverage', '50'))
+
+        # A changed sample is parsed again
+        make_sample(self.bactopia, 'exclude', coverage=120.0, contigs=50)
+        third, reused = self._run_incremental(outdir, self.bactopia)
+        self.assertEqual(reused, 5)
+        self.assertEqual(third, self._run_summary(f'{self.tmpdir.name}/full-changed', self.bactopia))
+        self.assertNotEqual(third['report'], first['report'])
+        self.assertNotIn('bactopia-incremental.json.tmp', os.listdir(outdir))
+
+        # Records stored for another directory or other settings are not reused
+        copy = f'{self.tmpdir.name}/copy'
+        shutil.copytree(self.bactopia, copy)
+        _, reused = self._run_incremental(outdir, copy)
+        self.assertEqual(reused, 0)
+        _, reused = self._run_incremental(outdir, copy)
+        self.assertEqual(reused, 6)
+        _, reused = self._run_incremental(outdir, copy, '--mapping_stats')
+        self.assertEqual(reused, 0)
+        self.assertNotIn('bactopia-incremental.json.tmp', os.listdir(outdir))
+
+
+    def test_004_rerank_boundary(self):
+        """Re-ranking a sample at a cutoff needs the stored records, the report only keeps 3 decimals."""
+        import csv
+        import shutil
+        boundary = f'{self.tmpdir.name}/boundary'
+        make_sample(boundary, 'boundary', coverage=49.9951, contigs=150)
+
+        def get_ranks(outdir):
+            with open(f'{outdir}/bactopia-report.txt', 'rt') as fh:
+                return {row['sample']: row['rank'] for row in csv.DictReader(fh, delimiter='\t')}
+
+        original = self._run_summary(f'{self.tmpdir.name}/original', boundary, '--incremental')
+        self.assertEqual(get_ranks(f'{self.tmpdir.name}/original'), {'boundary': 'silver'})
+        self.assertIn('49.995', original['report'])
+
+        rerank = self._run_summary(
+            f'{self.tmpdir.name}/rerank', '--rerank-from', f'{self.tmpdir.name}/original/bactopia-report.txt'
+        )
+        self.assertEqual(rerank, original)
+
+        # Without the stored records, 49.995x rounds to 49.99x and falls below the silver cutoff
+        os.makedirs(f'{self.tmpdir.name}/report-only')
+        for report in ['report', 'exclude']:
+            shutil.copy(f'{self.tmpdir.name}/original/bactopia-{report}.txt', f'{self.tmpdir.name}/report-only')
+        self._run_summary(
+            f'{self.tmpdir.name}/rerank-report-only', '--rerank-from',
+            f'{self.tmpdir.name}/report-only/bactopia-report.txt'
+        )
+        self.assertEqual(get_ranks(f'{self.tmpdir.name}/rerank-report-only'), {'boundary': 'bronze'})
+
+class TestBactopia_jsonify(unittest.TestCase):
+    """Tests for `bactopia-jsonify` in batch mode."""
+
+    def setUp(self):
+        """Create a few samples, a directory which is not a sample, and one which failed QC."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bactopia = f'{self.tmpdir.name}/bactopia'
+        for i in range(3):
+            make_sample(self.bactopia, f'sample{i}', paired=i != 1, coverage=40.0 + i * 30, contigs=50 + i * 100)
+        _write(f'{self.bactopia}/failed/failed-low-read-count-error.txt', 'error')
+        os.makedirs(f'{self.bactopia}/work')
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def _run_jsonify(self, outdir: str, *args: str) -> None:
+        """Run bactopia-jsonify on every sample, in a fresh interpreter."""
+        env = dict(os.environ, PYTHONPATH=PACKAGE_DIR)
+        subprocess.run([sys.executable, '-m', 'bactopia.cli.jsonify', '--batch', self.bactopia, '--outdir', outdir,
+                        '--silent', *args], env=env, check=True)
+
+    def _read_samples(self, outdir: str) -> dict:
+        """Decode the JSON file of each sample."""
+        import json
+        samples = {}
+        for filename in sorted(os.listdir(outdir)):
+            with open(f'{outdir}/{filename}', 'rt') as fh:
+                samples[filename[:-len('.json')]] = json.load(fh)
+        return samples
+
+    def test_000_ndjson(self):
+        """NDJSON output has one object per line, matching the per-sample files, and replaces a .tmp file."""
+        import gzip
+        import json
+        from bactopia.parse import get_sample_names
+        outdir = f'{self.tmpdir.name}/json'
+        self._run_jsonify(outdir)
+        expected = self._read_samples(outdir)
+        self.assertEqual(list(expected), ['failed', 'sample0', 'sample1', 'sample2'])
+
+        for extra, opener in [[[], open], [['--gzip'], gzip.open]]:
+            ndjson_dir = f'{self.tmpdir.name}/ndjson{"".join(extra)}'
+            self._run_jsonify(ndjson_dir, '--ndjson', '--jobs', '2', *extra)
+            ndjson_file = f'{ndjson_dir}/bactopia.ndjson{".gz" if extra else ""}'
+            self.assertEqual(os.listdir(ndjson_dir), [os.path.basename(ndjson_file)])
+            with opener(ndjson_file, 'rt') as fh:
+                lines = fh.read().split('\n')
+            self.assertEqual(lines[-1], '')
+            samples = [json.loads(line) for line in lines[:-1]]
+            self.assertEqual({sample['sample']: sample for sample in samples}, expected)
+            # Samples are written in the order they were found, whichever worker finishes first
+            self.assertEqual([sample['sample'] for sample in samples],
+                             [name for name in get_sample_names(self.bactopia) if name in expected])
+
+    def test_001_passthrough(self):
+        """Passthrough output decodes to the same results as normal output."""
+        self._run_jsonify(f'{self.tmpdir.name}/json')
+        self._run_jsonify(f'{self.tmpdir.name}/passthrough', '--passthrough', '--jobs', '2')
+        expected = self._read_samples(f'{self.tmpdir.name}/json')
+        self.assertEqual(self._read_samples(f'{self.tmpdir.name}/passthrough'), expected)
+        self.assertEqual(expected['sample0']['results']['mlst']['default-blast']['ST']['st'], '5')
+
+
+class TestBactopia_inventory(unittest.TestCase):
+    """Tests for `bactopia.inventory`."""
+
+    def setUp(self):
+        """Create a sample directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        make_sample(self.tmpdir.name, 'sample1')
+        self.sample = f'{self.tmpdir.name}/sample1'
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def test_000_lookups(self):
+        """Files and directories are found by absolute, relative and unnormalized paths."""
+        from bactopia.inventory import get_file_stats, get_inventory, has_dir, has_file, list_dir
+        _write(f'{self.sample}/blast/genes/.hidden.json', '{}')
+        os.makedirs(f'{self.sample}/blast/genes/nested.json')
+        inventory = get_inventory(self.tmpdir.name, 'sample1')
+        self.assertEqual(inventory['root'], self.sample)
+
+        genes = f'{self.sample}/blast/genes/g1.json'
+        self.assertTrue(has_file(inventory, genes))
+        self.assertTrue(has_file(inventory, f'{self.sample}/blast/../blast/genes/g1.json'))
+        self.assertFalse(has_file(inventory, f'{self.sample}/blast/genes'))
+        self.assertFalse(has_file(inventory, f'{self.sample}/blast/genes/g2.json'))
+        self.assertTrue(has_dir(inventory, f'{self.sample}/blast/genes/'))
+        self.assertTrue(has_dir(inventory, self.sample))
+        self.assertFalse(has_dir(inventory, genes))
+
+        self.assertEqual(list_dir(inventory, f'{self.sample}/blast/genes', extension='.json'), ['g1.json'])
+        self.assertEqual(sorted(list_dir(inventory, f'{self.sample}/blast/genes')),
+                         ['.hidden.json', 'g1.json', 'nested.json'])
+        self.assertEqual(list_dir(inventory, f'{self.sample}/missing'), [])
+        self.assertEqual(get_file_stats(inventory, genes)['size'], os.path.getsize(genes))
+        self.assertIsNone(get_file_stats(inventory, f'{self.sample}/blast/genes/g2.json'))
+
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        try:
+            relative = get_inventory('.', 'sample1')
+            self.assertTrue(has_file(relative, 'sample1/blast/genes/g1.json'))
+            self.assertEqual(relative['files'], inventory['files'])
+        finally:
+            os.chdir(cwd)
+
+    def test_001_symlink_loop(self):
+        """Directory symlinks to a parent are listed, but not followed again."""
+        from bactopia.inventory import get_inventory, has_dir, has_file
+        os.symlink('..', f'{self.sample}/blast/genes/loop')
+        os.symlink('../..', f'{self.sample}/mapping/run')
+        os.symlink('missing', f'{self.sample}/broken.json')
+        inventory = get_inventory(self.tmpdir.name, 'sample1')
+        self.assertIn('loop', inventory['dirs']['blast/genes'])
+        self.assertFalse(has_dir(inventory, f'{self.sample}/blast/genes/loop'))
+        self.assertFalse(has_file(inventory, f'{self.sample}/broken.json'))
+        self.assertTrue(all(len(path.split('/')) < 6 for path in inventory['files']))
+
+
+class TestBactopia_parse(unittest.TestCase):
+    """Tests for `bactopia.parse`."""
+
+    def setUp(self):
+        """Create a few samples, and one which failed QC."""
+        from bactopia.parse import get_sample_names
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bactopia = f'{self.tmpdir.name}/bactopia'
+        for i in range(5):
+            make_sample(self.bactopia, f'sample{i}', paired=i % 2 == 0, coverage=30.0 + i * 20, contigs=50 + i * 100)
+        _write(f'{self.bactopia}/failed/failed-low-read-count-error.txt', 'error')
+        self.samples = [[self.bactopia, name] for name in get_sample_names(self.bactopia)]
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def test_000_jobs_order(self):
+        """Samples parsed by a process pool are returned in the same order as serially."""
+        from bactopia.parse import iter_bactopia_samples
+        expected = list(iter_bactopia_samples(self.samples))
+        self.assertEqual([sample['sample'] for sample in expected], [name for _, name in self.samples])
+        for jobs in [2, 3]:
+            self.assertEqual(list(iter_bactopia_samples(self.samples, jobs=jobs)), expected)
+
+    def test_001_sample_parse_error(self):
+        """A failing sample raises its original exception serially, and SampleParseError from a worker."""
+        import json
+        import pickle
+        from bactopia.parse import SampleParseError, iter_bactopia_samples
+        _write(f'{self.bactopia}/sample3/assembly/sample3.fna.json', '{"total_contig": ')
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_bactopia_samples(self.samples))
+        with self.assertRaises(SampleParseError) as context:
+            list(iter_bactopia_samples(self.samples, jobs=2))
+        self.assertEqual([context.exception.sample, context.exception.path], ['sample3', self.bactopia])
+        self.assertIn(f"'{self.bactopia}/sample3'", str(context.exception))
+        self.assertIn('JSONDecodeError', str(context.exception))
+        self.assertEqual(str(pickle.loads(pickle.dumps(context.exception))), str(context.exception))
+
+    def test_002_iter_matches_list(self):
+        """Iterating a directory yields the same records, in order, as parsing each sample into a list."""
+        import importlib
+        parse = importlib.import_module('bactopia.parse')
+        expected = [parse.parse_bactopia_files(path, name) for path, name in self.samples]
+        self.assertEqual(list(parse.iter_bactopia_directory(self.bactopia)), expected)
+        self.assertEqual(parse.parse_bactopia_directory(self.bactopia), expected)
+        self.assertEqual(list(parse.iter_bactopia_samples(self.samples)), expected)
+        by_name = {sample['sample']: sample for sample in expected}
+        self.assertEqual(list(parse.iter_bactopia_directory(self.bactopia, samples=['sample2', 'failed'])),
+                         [by_name['sample2'], by_name['failed']])
+
+        # Samples are only parsed as they are requested
+        with mock.patch.object(parse, 'parse_bactopia_files', wraps=parse.parse_bactopia_files) as parse_files:
+            samples = parse.iter_bactopia_directory(self.bactopia)
+            self.assertEqual(next(samples), expected[0])
+            self.assertEqual(parse_files.call_count, 1)
+            self.assertEqual(list(samples), expected[1:])
+            self.assertEqual(parse_files.call_count, len(expected))
+
+    def test_003_threads_match_serial(self):
+        """Parsing result files with threads gives the same output, in the same order, as serially."""
+        import json
+        from bactopia.parse import parse_bactopia_files
+        for path, name in self.samples:
+            expected = parse_bactopia_files(path, name)
+            for threads in [2, 8]:
+                threaded = parse_bactopia_files(path, name, threads=threads)
+                self.assertEqual(threaded, expected)
+                self.assertEqual(json.dumps(threaded), json.dumps(expected))
+        self.assertTrue(parse_bactopia_files(self.bactopia, 'failed', threads=2)['has_errors'])
+
+        _write(f'{self.bactopia}/sample3/blast/genes/g1.json', '{"BlastOutput2": [')
+        for threads in [1, 2, 8]:
+            with self.assertRaises(json.JSONDecodeError):
+                parse_bactopia_files(self.bactopia, 'sample3', threads=threads)
+
+
+    def test_004_include(self):
+        """include limits the result files collected and parsed, without changing the summary rows."""
+        import importlib
+        from bactopia.cli.summary import get_sample_record
+        from bactopia.summary import SUMMARY_RESULTS
+        parse = importlib.import_module('bactopia.parse')
+        files = parse.get_bactopia_files(self.bactopia, 'sample0', include=SUMMARY_RESULTS)['files']
+        self.assertEqual(sorted(files), sorted(result_type for result_type in SUMMARY_RESULTS))
+        for result_type, names in SUMMARY_RESULTS.items():
+            if names is not None:
+                self.assertTrue(set(result['result_name'] for result in files[result_type]) <= set(names))
+        all_files = parse.get_bactopia_files(self.bactopia, 'sample0')['files']
+        self.assertIn('blast', all_files)
+        self.assertEqual(len(all_files['mlst']), len(files['mlst']))
+
+        with mock.patch.object(parse, 'parse', wraps=parse.parse) as parse_result:
+            parse.parse_bactopia_files(self.bactopia, 'sample0', include=SUMMARY_RESULTS)
+        parsed = set(call.args[0] for call in parse_result.call_args_list)
+        self.assertEqual(parsed, {'annotation', 'assembly', 'minmers', 'mlst', 'qc'})
+
+        for path, name in self.samples:
+            self.assertEqual(
+                get_sample_record(parse.parse_bactopia_files(path, name, include=SUMMARY_RESULTS)),
+                get_sample_record(parse.parse_bactopia_files(path, name))
+            )
+
+
+class TestBactopia_manifest(unittest.TestCase):
+    """Tests for `bactopia.parse.read_manifest` and `find_missing_samples`."""
+
+    def setUp(self):
+        """Create two runs with a sample of the same name."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.run1 = f'{self.tmpdir.name}/run1'
+        self.run2 = f'{self.tmpdir.name}/run2'
+        for run, names in [[self.run1, ['sample1', 'sample2']], [self.run2, ['sample1']]]:
+            for name in names:
+                make_sample(run, name)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmpdir.cleanup()
+
+    def _manifest(self, filename: str, contents: str) -> str:
+        """Write a manifest, returning its path."""
+        manifest = f'{self.tmpdir.name}/{filename}'
+        _write(manifest, contents)
+        return manifest
+
+    def test_000_no_header(self):
+        """Without a header, each line is a sample name and an optional path, comments and blank lines are skipped."""
+        from bactopia.parse import read_manifest
+        manifest = self._manifest('samples.txt', f"# samples\nsample1\n\n  \nsample1\t{self.run2}\n\t\nsample2\n")
+        self.assertEqual(read_manifest(manifest, path=self.run1),
+                         [[self.run1, 'sample1'], [self.run2, 'sample1'], [self.run1, 'sample2']])
+        with self.assertRaisesRegex(ValueError, r"'sample1' \(line 2\).*no default path"):
+            read_manifest(manifest)
+
+    def test_001_header(self):
+        """A samplesheet header selects the sample and path columns, as TSV or CSV."""
+        from bactopia.parse import read_manifest
+        expected = [[self.run2, 'sample1'], [self.run1, 'sample2']]
+        tsv = self._manifest('samples.tsv', f"R1\tSample\toutdir\nx\tsample1\t{self.run2}\ny\tsample2\n")
+        self.assertEqual(read_manifest(tsv, path=self.run1), expected)
+        csv = self._manifest('samples.csv', f"# samplesheet\npath,sample\n{self.run2},sample1\n,,\n,sample2\n")
+        self.assertEqual(read_manifest(csv, path=self.run1), expected)
+        self.assertEqual(read_manifest(self._manifest('empty.csv', "# nothing\n\n")), [])
+
+    def test_002_short_row(self):
+        """A row without a sample name raises a ValueError with its line number."""
+        from bactopia.parse import read_manifest
+        manifest = self._manifest('samples.csv', f"path,sample\n{self.run2},sample1\n\n{self.run1}\n")
+        with self.assertRaisesRegex(ValueError, r"Line 4 of .* does not have a sample name \(column 2\)"):
+            read_manifest(manifest)
+        manifest = self._manifest('samples.tsv', "sample\tpath\n\tpath\n")
+        with self.assertRaisesRegex(ValueError, r"Line 2 of .* does not have a sample name \(column 1\)"):
+            read_manifest(manifest)
+
+    def test_003_missing_samples(self):
+        """Missing samples are reported by path and name, same-named samples of other runs are kept."""
+        from bactopia.parse import find_missing_samples, read_manifest
+        manifest = self._manifest('samples.txt', f"sample1\nsample2\nsample2\t{self.run2}\nsample3\n")
+        samples = read_manifest(manifest, path=self.run1)
+        self.assertEqual(find_missing_samples(samples), [[self.run2, 'sample2'], [self.run1, 'sample3']])
+
+        outdir = f'{self.tmpdir.name}/summary'
+        env = dict(os.environ, PYTHONPATH=PACKAGE_DIR)
+        subprocess.run([sys.executable, '-m', 'bactopia.cli.summary', self.run1, '--manifest', manifest,
+                        '--outdir', outdir, '--silent'], env=env, check=True)
+        with open(f'{outdir}/bactopia-report.txt', 'rt') as fh:
+            self.assertEqual([line.split('\t')[0] for line in fh.read().splitlines()], ['sample', 'sample1', 'sample2'])
+        with open(f'{outdir}/bactopia-exclude.txt', 'rt') as fh:
+            self.assertEqual(fh.read().splitlines()[1:], [
+                f'sample2\tmissing\tNot found in {self.run2}', f'sample3\tmissing\tNot found in {self.run1}'
+            ])